@@ -1,6 +1,7 @@
 import json
 import os
 import sys
+from pandas import to_datetime
 
 from scripts.examples.adx_macd import AdxMacdStrategy
 from scripts.examples.divergences import DivergencesStrategy
@@ -10,9 +11,12 @@ from scripts.examples.macd_rsi import MacdRsiStrategy
 from scripts.examples.macd_stoch_rsi import MacdStochRsiStrategy
 from scripts.examples.stochastic_ma import StochasticMaStrategy
 from scripts.exchange import ExchangeInterface
+from scripts.exchanges.backtest import BacktestExchange
 from scripts.exchanges.binance_futures import BinanceFutures
 from scripts.exchanges.binance_spot import BinanceSpot
 from scripts.console import C, I
+from scripts.markets.backtest import Backtest
+from scripts.markets.sweep import ParameterSweep
 from scripts.strategy import StrategyInterface
 
 settings_path = "bot-config.json"
@@ -41,12 +45,18 @@ def load_bot_config():
     api_key = keys.get(f"api-{market}" if test_mode else "api")
     secret_key = keys.get(f"secret-{market}" if test_mode else "secret")
     quote_asset = exchange.get("quote-asset", "BUSD")
-    if api_key is None or secret_key is None:
+    # Backtests only read the stored candles
+    backtest = bot_config.get("backtest", {})
+    if (api_key is None or secret_key is None) and not backtest.get("enabled"):
         print(C.Style(I.CROSS + " Error @ load_bot_config ::", C.BOLD, C.RED), C.Style("API keys not provided", C.RED))
         return
     return {
         "market": market,
         "exchange": [test_mode, api_key, secret_key, quote_asset],
+        "candle_store": bot_config.get("candle-store", "candles"),
+        "user_stream": bot_config.get("user-data-stream", False),
+        "base_timeframe": bot_config.get("base-timeframe"),
+        "backtest": backtest if backtest.get("enabled") else None,
     }
 
 
@@ -90,15 +100,97 @@ def select_strategy(exchange: ExchangeInterface, market: str) -> StrategyInterfa
     return strategies[strategy_index - 1]
 
 
+def run_backtest(settings: dict) -> None:
+    """Replays the stored candles of the selected strategy's timeframe"""
+    test_mode, _, _, quote_asset = settings["exchange"]
+    config = settings["backtest"]
+    strategy = select_strategy(None, settings["market"])
+    strategy.exchange = BacktestExchange(
+        candle_store=os.path.join(settings["candle_store"], "test" if test_mode else "live", settings["market"]),
+        quote_asset=quote_asset,
+        timeframe=strategy.timeframe,
+        balance=config.get("balance", 1000),
+        fee=config.get("fee", 0.04),
+        market=settings["market"],
+    )
+    if not strategy.exchange.symbols:
+        print(
+            C.Style(I.CROSS + " Error @ run_backtest ::", C.BOLD, C.RED),
+            C.Style(f"No {strategy.timeframe} candles stored", C.RED),
+        )
+        return
+    # Dates of the first and last candle closes to trade
+    start, end = (
+        int(to_datetime(config[date], utc=True).timestamp() * 1000) if config.get(date) else None
+        for date in ("start", "end")
+    )
+    if config.get("sweep"):
+        run_sweep(settings, strategy, start, end)
+        return
+    print(
+        I.CHECK,
+        "Backtesting {} @ {}".format(C.Style(strategy.name, C.DARKCYAN), C.Style(settings["market"], C.DARKCYAN)),
+    )
+    result = Backtest(strategy.market_strategy(), start=start, end=end).run()
+    result.print_summary()
+    path = os.path.join(config.get("results", "backtests"), strategy.name)
+    result.save(path)
+    print(I.CHECK, f"Trades and equity curve saved to {path}")
+
+
+def run_sweep(settings: dict, strategy: StrategyInterface, start: "int | None", end: "int | None") -> None:
+    """Backtests the selected strategy with each point of the parameters space"""
+    config = settings["backtest"]
+    try:
+        sweep = ParameterSweep(
+            strategy_class=type(strategy),
+            space=config["sweep"],
+            candle_store=strategy.exchange.store.path,
+            quote_asset=strategy.exchange.quote_asset,
+            market=settings["market"],
+            balance=config.get("balance", 1000),
+            fee=config.get("fee", 0.04),
+            start=start,
+            end=end,
+            samples=config.get("samples"),
+            workers=config.get("workers"),
+            rank_by=config.get("rank-by", "return"),
+        )
+    except ValueError as ex:
+        print(C.Style(I.CROSS + " Error @ run_sweep ::", C.BOLD, C.RED), C.Style(str(ex), C.RED))
+        return
+    print(
+        I.CHECK,
+        "Sweeping {} @ {}".format(C.Style(strategy.name, C.DARKCYAN), C.Style(settings["market"], C.DARKCYAN)),
+    )
+    sweep.run()
+    sweep.print_results()
+    path = os.path.join(config.get("results", "backtests"), strategy.name, "sweep.csv")
+    sweep.save(path)
+    print(I.CHECK, f"Ranked results saved to {path}")
+
+
 def main():
     # Load bot-config
     settings = load_bot_config()
-    if settings:
+    if settings and settings["backtest"]:
+        run_backtest(settings)
+    elif settings:
         # Retrieve account information
         if settings["market"] == "futures":
-            bn = BinanceFutures(*settings["exchange"])
+            bn = BinanceFutures(
+                *settings["exchange"],
+                candle_store=settings["candle_store"],
+                user_stream=settings["user_stream"],
+                base_timeframe=settings["base_timeframe"],
+            )
         elif settings["market"] == "spot":
-            bn = BinanceSpot(*settings["exchange"])
+            bn = BinanceSpot(
+                *settings["exchange"],
+                candle_store=settings["candle_store"],
+                user_stream=settings["user_stream"],
+                base_timeframe=settings["base_timeframe"],
+            )
         else:
             print(
                 C.Style(I.CROSS + " Error @ load_bot_config ::", C.BOLD, C.RED),
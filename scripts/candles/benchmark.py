@@ -0,0 +1,105 @@
+"""Parity, speed and peak memory of klines_to_dataframe against converting the klines into a list of dicts and
+building the DataFrame from it, as get_candlestick_data did before
+
+Run with: python -m scripts.candles.benchmark"""
+
+import time
+import tracemalloc
+import numpy as np
+from pandas import DataFrame
+from scripts.candles.klines import klines_to_dataframe
+
+
+def reference_klines_to_dataframe(raw_data: "list[list[str | int]]") -> DataFrame:
+    converted_data = []
+    for candle in raw_data:
+        converted_candle = {
+            "time": int(candle[0]),
+            "open": float(candle[1]),
+            "high": float(candle[2]),
+            "low": float(candle[3]),
+            "close": float(candle[4]),
+            "volume": float(candle[5]),
+            "close_time": int(candle[6]),
+            "quote_asset_volume": float(candle[7]),
+            "number_of_trades": int(candle[8]),
+            "taker_buy_base_asset_volume": float(candle[9]),
+            "taker_buy_quote_asset_volume": float(candle[10]),
+        }
+        converted_data.append(converted_candle)
+    return DataFrame(converted_data)
+
+
+def random_klines(count: int, seed: int = 0) -> "list[list[str | int]]":
+    """Klines as the exchange sends them, with times as ints and the rest as strings"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    open = np.concatenate(([100], close[:-1]))
+    high = np.maximum(open, close) * (1 + rng.uniform(0, 0.005, count))
+    low = np.minimum(open, close) * (1 - rng.uniform(0, 0.005, count))
+    volume = rng.uniform(1, 1000, count)
+    trades = rng.integers(1, 5000, count)
+    return [
+        [
+            1_600_000_000_000 + i * 60_000,
+            f"{open[i]:.8f}",
+            f"{high[i]:.8f}",
+            f"{low[i]:.8f}",
+            f"{close[i]:.8f}",
+            f"{volume[i]:.8f}",
+            1_600_000_000_000 + i * 60_000 + 59_999,
+            f"{volume[i] * close[i]:.8f}",
+            int(trades[i]),
+            f"{volume[i] / 2:.8f}",
+            f"{volume[i] * close[i] / 2:.8f}",
+            "0",
+        ]
+        for i in range(count)
+    ]
+
+
+def timed(f, repeat: int) -> float:
+    """Best time of `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(f) -> int:
+    """Peak of the memory allocated while running `f`, in bytes"""
+    tracemalloc.start()
+    f()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    print(
+        f"{'Klines':>10}{'dicts':>12}{'columns':>12}{'Speedup':>10}"
+        f"{'dicts peak':>14}{'columns peak':>14}{'Memory':>10}"
+    )
+    for count in (500, 1_000, 10_000, 100_000):
+        raw_data = random_klines(count)
+        expected = reference_klines_to_dataframe(raw_data)
+        data = klines_to_dataframe(raw_data)
+        assert list(data.columns) == list(expected.columns), "Columns differ"
+        for header in expected.columns:
+            assert data[header].dtype == expected[header].dtype, f"{header}: dtypes differ"
+            assert np.array_equal(data[header].to_numpy(), expected[header].to_numpy()), f"{header}: values differ"
+        repeat = 20 if count < 100_000 else 3
+        dicts_time = timed(lambda: reference_klines_to_dataframe(raw_data), repeat)
+        columns_time = timed(lambda: klines_to_dataframe(raw_data), repeat)
+        dicts_peak = peak_memory(lambda: reference_klines_to_dataframe(raw_data))
+        columns_peak = peak_memory(lambda: klines_to_dataframe(raw_data))
+        print(
+            f"{count:>10}{dicts_time * 1000:>10.2f}ms{columns_time * 1000:>10.2f}ms{dicts_time / columns_time:>9.1f}x"
+            f"{dicts_peak / 1024:>10.0f}KiB{columns_peak / 1024:>10.0f}KiB{dicts_peak / columns_peak:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import time
+from pandas import DataFrame, concat
+from scripts.candles.store import CandleStore
+from scripts.common import timeframe_to_ms
+
+
+class CandleCache:
+    """Keeps the last candlesticks of each symbol so only the new ones are requested
+
+    Parameters
+    ----------
+    `candle_count`: max number of candles kept for each symbol
+
+    `store`: optional on-disk store, read when a symbol isn't cached and updated with the closed candles"""
+
+    def __init__(self, candle_count: int, store: "CandleStore | None" = None) -> None:
+        self.candle_count = candle_count
+        self.candles: dict[str, DataFrame] = {}
+        self.store = store
+
+    def missing_candles(self, key: str, timeframe: str) -> "tuple[int | None, int]":
+        """Start time and number of candles to request to bring `key` up to date
+
+        Returns
+        -------
+        >>> tuple:
+        (start_time, limit) -> start_time is None if the whole history has to be requested"""
+        cached = self.candles.get(key)
+        if cached is None and self.store:
+            # Warm start from the candles stored on disk
+            cached = self.store.read(key, self.candle_count)
+            self.candles[key] = cached
+        if cached is None or cached.empty:
+            return None, self.candle_count
+        # Last cached candle may have been still open, so request it again
+        last_time = int(cached["time"].iloc[-1])
+        # Candles opened since then, plus a margin for the clock offset with the server
+        missing = (int(time.time() * 1000) - last_time) // timeframe_to_ms(timeframe) + 2
+        if missing >= self.candle_count:
+            return None, self.candle_count
+        return last_time, missing
+
+    def update(self, key: str, data: DataFrame) -> DataFrame:
+        """Merges the received candles into the cache
+
+        Returns
+        -------
+        Copy of the last `candle_count` candles for `key`"""
+        cached = self.candles.get(key)
+        if cached is not None:
+            if data.empty:
+                data = cached
+            else:
+                # Received candles replace the cached ones with the same open time
+                data = concat([cached[cached["time"] < data["time"].iloc[0]], data], ignore_index=True)
+        # Trim to the window
+        data = data.tail(self.candle_count).reset_index(drop=True)
+        self.candles[key] = data
+        # Persist closed candles
+        if self.store and not data.empty:
+            self.store.append(key, data[data["close_time"] < time.time() * 1000])
+        return data.copy()
+
+    def append(self, key: str, timeframe: str, candle: "dict[str, float | int]") -> "DataFrame | None":
+        """Adds a single closed candle if it follows the cached ones
+
+        Returns
+        -------
+        Copy of the updated candles or None if the candle would leave a gap in the cache"""
+        cached = self.candles.get(key)
+        if cached is None or cached.empty:
+            return None
+        # Candle must replace the last cached one or be the next one
+        if candle["time"] - int(cached["time"].iloc[-1]) not in (0, timeframe_to_ms(timeframe)):
+            return None
+        return self.update(key, DataFrame([candle]))
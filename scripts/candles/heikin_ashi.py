@@ -10,3 +10,5 @@ def data_to_heikin_ashi(data: DataFrame) -> None:
     data["open"] = data.loc[:, ["open", "close"]].mean(axis=1)
     # Update close price: average of open, close, high and low
     data["close"] = data.loc[:, ["open", "close", "high", "low"]].mean(axis=1)
+    # Indicators computed on candles don't apply anymore
+    data.attrs["chart"] = "heikin_ashi"
@@ -0,0 +1,29 @@
+import numpy as np
+from pandas import DataFrame
+
+# Columns of the exchange's klines, in the same order
+KLINE_COLUMNS = {
+    "time": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+    "close_time": np.int64,
+    "quote_asset_volume": np.float64,
+    "number_of_trades": np.int64,
+    "taker_buy_base_asset_volume": np.float64,
+    "taker_buy_quote_asset_volume": np.float64,
+}
+
+
+def klines_to_dataframe(raw_data: "list[list[str | int]]") -> DataFrame:
+    """Converts raw klines into a DataFrame
+
+    Each column is parsed at once into a typed NumPy array, which the DataFrame uses without copying"""
+    # Transpose candles into columns
+    columns = list(zip(*raw_data)) if len(raw_data) else [()] * len(KLINE_COLUMNS)
+    return DataFrame(
+        {name: np.array(columns[i], dtype=dtype) for i, (name, dtype) in enumerate(KLINE_COLUMNS.items())},
+        copy=False,
+    )
@@ -0,0 +1,195 @@
+import threading
+import time
+import numpy as np
+from pandas import DataFrame, concat
+from scripts.candles.cache import CandleCache
+from scripts.candles.klines import KLINE_COLUMNS
+from scripts.candles.store import CandleStore
+from scripts.common import timeframe_to_ms
+
+
+def candle_open_times(times: np.ndarray, timeframe: str) -> np.ndarray:
+    """Open time of the candle of timeframe containing each timestamp in ms"""
+    if timeframe.endswith("M"):
+        # Months don't have a fixed length, candles open on the 1st of the month
+        months = times.astype("datetime64[ms]").astype("datetime64[M]").astype(np.int64)
+        months -= months % int(timeframe[:-1])
+        return months.astype("datetime64[M]").astype("datetime64[ms]").astype(np.int64)
+    # Weekly candles open on Mondays, epoch was a Thursday
+    origin = timeframe_to_ms("4d") if timeframe.endswith("w") else 0
+    return times - (times - origin) % timeframe_to_ms(timeframe)
+
+
+def candle_close_times(open_times: np.ndarray, timeframe: str) -> np.ndarray:
+    """Close time of the candles of timeframe opened at open_times, i.e. 1 ms before the next one opens"""
+    if timeframe.endswith("M"):
+        months = open_times.astype("datetime64[ms]").astype("datetime64[M]") + int(timeframe[:-1])
+        return months.astype("datetime64[ms]").astype(np.int64) - 1
+    return open_times + timeframe_to_ms(timeframe) - 1
+
+
+def resample_candles(data: DataFrame, timeframe: str, complete_first: bool = True) -> DataFrame:
+    """Aggregates candles into candles of a higher timeframe
+
+    Last candle is still open if the base candles don't reach its close time
+
+    Parameters
+    ----------
+    `data`: candles of the base timeframe, with numeric times
+
+    `timeframe`: timeframe of the resulting candles
+
+    `complete_first`: whether to drop the first candle when the base candles start after it opened"""
+    if data.empty:
+        return DataFrame({name: np.empty(0, dtype=dtype) for name, dtype in KLINE_COLUMNS.items()})
+    times = data["time"].to_numpy()
+    open_times = candle_open_times(times, timeframe)
+    # First base candle of each resampled candle
+    first = np.flatnonzero(np.r_[True, open_times[1:] != open_times[:-1]])
+    last = np.r_[first[1:] - 1, len(times) - 1]
+    columns = {
+        "time": open_times[first],
+        "open": data["open"].to_numpy()[first],
+        "high": np.maximum.reduceat(data["high"].to_numpy(), first),
+        "low": np.minimum.reduceat(data["low"].to_numpy(), first),
+        "close": data["close"].to_numpy()[last],
+        "volume": np.add.reduceat(data["volume"].to_numpy(), first),
+        "close_time": candle_close_times(open_times[first], timeframe),
+    }
+    for name in KLINE_COLUMNS:
+        if name not in columns:
+            # Remaining columns are volumes and counts
+            columns[name] = np.add.reduceat(data[name].to_numpy(), first)
+    resampled = DataFrame(columns, copy=False)
+    if complete_first and times[0] != open_times[0]:
+        resampled = resampled.iloc[1:].reset_index(drop=True)
+    return resampled
+
+
+class CandleResampler:
+    """Builds the candlesticks of higher timeframes locally from the candles of a single base timeframe
+
+    Only the base timeframe is requested to the exchange, once per base candle close, whatever the number of
+    timeframes used
+
+    Parameters
+    ----------
+    `exchange`: exchange whose get_candlestick_data is used for the base candles
+
+    `base_timeframe`: timeframe requested to the exchange (e.g. "1m", "5m")
+
+    `candle_count`: number of candles of each resampled timeframe
+
+    `store`: optional on-disk store for the base candles
+
+    `page_size`: max number of candles of each request
+
+    `max_pages`: max number of requests to download the base window of a symbol, timeframes needing more base
+    candles aren't resampled, i.e. they're requested to the exchange"""
+
+    def __init__(
+        self,
+        exchange,
+        base_timeframe: str,
+        candle_count: int,
+        store: "CandleStore | None" = None,
+        page_size: int = 1000,
+        max_pages: int = 20,
+    ) -> None:
+        self.exchange = exchange
+        self.base_timeframe = base_timeframe
+        self.base_interval = timeframe_to_ms(base_timeframe)
+        self.candle_count = candle_count
+        self.page_size = page_size
+        self.max_pages = max_pages
+        # Window is the base candles needed by the highest timeframe requested, changed under the lock while other
+        # symbols are updated
+        self.base_cache = CandleCache(candle_count=candle_count, store=store)
+        self.ratios: dict[str, int] = {}
+        self.lock = threading.Lock()
+        # Base candle that was open and base window when each symbol was last requested
+        self.requested: dict[str, tuple[int, int]] = {}
+        self.resampled: dict[str, DataFrame] = {}
+        self.locks: dict[str, threading.Lock] = {}
+
+    def ratio(self, timeframe: str) -> int:
+        """Base candles in a candle of timeframe"""
+        return -(-timeframe_to_ms(timeframe) // self.base_interval)
+
+    def resamples(self, timeframe: str) -> bool:
+        """Whether candles of timeframe can be built from the base timeframe within `max_pages` requests"""
+        interval = timeframe_to_ms(timeframe)
+        if interval <= self.base_interval or interval % self.base_interval:
+            return False
+        if self.candle_count * self.ratio(timeframe) > self.page_size * self.max_pages:
+            return False
+        # Weeks don't divide months
+        return not (timeframe.endswith("M") and self.base_timeframe.endswith("w"))
+
+    def set_candle_count(self, candle_count: int) -> None:
+        """Number of candles of each resampled timeframe, the base window follows it"""
+        with self.lock:
+            self.candle_count = candle_count
+            self.base_cache.candle_count = candle_count * max(self.ratios.values(), default=1)
+
+    def update_base(self, symbol: str) -> DataFrame:
+        """Requests the base candles closed since the last request of symbol"""
+        key = f"{symbol}-{self.base_timeframe}"
+        now = int(time.time() * 1000)
+        open_time = now - now % self.base_interval
+        window = self.base_cache.candle_count
+        if self.requested.get(key) == (open_time, window):
+            # No base candle has closed since, i.e. already requested for another timeframe
+            return self.base_cache.candles[key]
+        start_time, limit = self.base_cache.missing_candles(key, self.base_timeframe)
+        if self.requested.get(key, (0, 0))[1] < window and len(self.base_cache.candles.get(key, ())) < window:
+            # Window grew for a higher timeframe, so the older candles are needed too
+            start_time = None
+        if start_time is None:
+            # Whole window, requested in pages from its first candle
+            start_time = open_time - (window - 1) * self.base_interval
+            limit = window
+        pages = []
+        while limit > 0:
+            page = self.exchange.get_candlestick_data(
+                symbol, self.base_timeframe, min(limit, self.page_size), start_time
+            )
+            pages.append(page)
+            if len(page) < min(limit, self.page_size):
+                break
+            limit -= len(page)
+            start_time = int(page["time"].iloc[-1]) + self.base_interval
+        self.base_cache.update(key, concat(pages, ignore_index=True) if len(pages) > 1 else pages[0])
+        self.requested[key] = (open_time, window)
+        return self.base_cache.candles[key]
+
+    def candles(self, symbol: str, timeframe: str) -> DataFrame:
+        """Candles of symbol in timeframe, updated from the base timeframe
+
+        Returns
+        -------
+        Copy of the last `candle_count` candles, the last one is still open"""
+        # Base candles needed to build the window of the highest timeframe
+        with self.lock:
+            self.ratios[timeframe] = self.ratio(timeframe)
+            self.base_cache.candle_count = self.candle_count * max(self.ratios.values())
+        with self.locks.setdefault(symbol, threading.Lock()):
+            base = self.update_base(symbol)
+            key = f"{symbol}-{timeframe}"
+            resampled = self.resampled.get(key)
+            if resampled is None or len(resampled) < self.candle_count:
+                # Short windows are built again, the base window may have grown since
+                resampled = resample_candles(base, timeframe)
+            else:
+                # Only the candles from the last one (maybe open when it was built) are aggregated again
+                last_time = resampled["time"].iloc[-1]
+                resampled = concat(
+                    [
+                        resampled[resampled["time"] < last_time],
+                        resample_candles(base[base["time"] >= last_time], timeframe, complete_first=False),
+                    ],
+                    ignore_index=True,
+                )
+            resampled = resampled.tail(self.candle_count).reset_index(drop=True)
+            self.resampled[key] = resampled
+        return resampled.copy()
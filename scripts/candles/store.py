@@ -0,0 +1,61 @@
+import os
+import numpy as np
+from pandas import DataFrame
+from scripts.candles.klines import KLINE_COLUMNS
+
+# Fixed size record for each candle, so files can be appended and memory-mapped
+CANDLE_DTYPE = np.dtype(list(KLINE_COLUMNS.items()))
+
+
+class CandleStore:
+    """Append-only files with the closed candlesticks of each symbol and timeframe
+
+    Each file is an array of CANDLE_DTYPE records, readers only map the complete records so they can read
+    while a candle is being appended
+
+    Parameters
+    ----------
+    `path`: folder for the files"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def file_path(self, key: str) -> str:
+        """Path of the file for `key` (i.e. symbol-timeframe)"""
+        return os.path.join(self.path, f"{key}.candles")
+
+    def records(self, key: str) -> np.memmap:
+        """Read-only map of the complete records stored for `key`"""
+        path = self.file_path(key)
+        count = os.path.getsize(path) // CANDLE_DTYPE.itemsize if os.path.exists(path) else 0
+        if not count:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        return np.memmap(path, dtype=CANDLE_DTYPE, mode="r", shape=(count,))
+
+    def last_time(self, key: str) -> "int | None":
+        """Open time of the last stored candle"""
+        records = self.records(key)
+        return int(records["time"][-1]) if len(records) else None
+
+    def read(self, key: str, count: "int | None" = None) -> DataFrame:
+        """Last `count` stored candles of `key`, or all of them if count is None"""
+        records = self.records(key)
+        if count is not None:
+            records = records[-count:]
+        # Copy out of the map so the file isn't kept open
+        return DataFrame(np.array(records))
+
+    def append(self, key: str, data: DataFrame) -> None:
+        """Appends the closed candles newer than the stored ones"""
+        last_time = self.last_time(key)
+        if last_time is not None:
+            data = data[data["time"] > last_time]
+        if data.empty:
+            return
+        records = np.empty(len(data), dtype=CANDLE_DTYPE)
+        for name in CANDLE_DTYPE.names:
+            records[name] = data[name].to_numpy()
+        # Whole records are written at once at the end of the file
+        with open(self.file_path(key), "ab") as f:
+            f.write(records.tobytes())
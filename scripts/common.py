@@ -15,15 +15,12 @@ def round_float_to_str(number: float, decimal_places: int, signed: bool = False)
     return f"{number:+.{decimal_places}f}" if signed else f"{number:.{decimal_places}f}"
 
 
-def str_to_decimal_places(value: str) -> int:
-    """Gets number of decimal places from a string number"""
-    values = value.split(".")
-    if len(values) == 2:
-        # Has decimal places
-        return values[1].find("1") + 1
-    else:
-        # It's an integer!
-        return 0
+def timeframe_to_ms(timeframe: str) -> int:
+    """Length of a candlestick timeframe (e.g. "15m", "4h") in milliseconds
+
+    Months are counted as 28 days, i.e. the shortest possible month"""
+    units = {"m": 60, "h": 60 * 60, "d": 24 * 60 * 60, "w": 7 * 24 * 60 * 60, "M": 28 * 24 * 60 * 60}
+    return int(timeframe[:-1]) * units[timeframe[-1]] * 1000
 
 
 def determine_percent_rise(open: float, close: float) -> float:
@@ -31,37 +28,75 @@ def determine_percent_rise(open: float, close: float) -> float:
     return (close - open) * 100 / open
 
 
+def volatility_percent(high: float, low: float) -> float:
+    """Range between high and low as a percentage of low"""
+    return (high - low) * 100 / low if low else 0.0
+
+
+def spread_percent(bid: float, ask: float) -> float:
+    """Spread between the best bid and ask as a percentage of ask"""
+    return (ask - bid) * 100 / ask if ask else 0.0
+
+
+def estimate_clock_offset(exchange: ExchangeInterface, samples: int = 5) -> "tuple[float, float]":
+    """Estimates server's clock offset like NTP does, using the sample with the shortest round trip
+
+    Returns
+    -------
+    >>> tuple:
+    (offset_ms, latency_ms) -> server time = local time + offset, latency is half the round trip"""
+    best = None
+    for _ in range(samples):
+        sent = time.time() * 1000
+        server_time = exchange.get_server_time()
+        received = time.time() * 1000
+        round_trip = received - sent
+        # Server answered halfway through the round trip
+        offset = server_time - (sent + received) / 2
+        if best is None or round_trip < best[1] * 2:
+            best = (offset, round_trip / 2)
+    return best
+
+
+def next_candle_close(server_time: float, timeframe: str) -> int:
+    """Timestamp in ms at which the current candle of timeframe closes"""
+    if timeframe.endswith("M"):
+        # Months don't have a fixed length, candles open on the 1st of the month
+        now = datetime.datetime.fromtimestamp(server_time / 1000, tz=datetime.timezone.utc)
+        months = now.year * 12 + now.month - 1
+        months += int(timeframe[:-1]) - months % int(timeframe[:-1])
+        close = datetime.datetime(months // 12, months % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+        return int(close.timestamp() * 1000)
+    # Weekly candles open on Mondays, epoch was a Thursday
+    origin = timeframe_to_ms("4d") if timeframe.endswith("w") else 0
+    interval = timeframe_to_ms(timeframe)
+    return int((server_time - origin) // interval + 1) * interval + origin
+
+
 def sleep_till_next_candle(exchange: ExchangeInterface, timeframe: str) -> None:
     """Sleep until candle close time"""
-    remaining = ""
-    # Sync time with server every 5 minutes
+    print(C.Style(f"\r{I.CLOCK} Waiting for {timeframe} candle to close ...", C.YELLOW), end=" ")
+    # Sync clock with server
+    offset, latency = estimate_clock_offset(exchange)
+    close_time = next_candle_close(time.time() * 1000 + offset, timeframe)
+    # Wake up once the server has closed the candle, plus the time a request takes to reach it
+    wake_time = (close_time - offset + latency) / 1000
     while True:
-        # Update console
-        if not remaining:
-            print(C.Style(f"\r{I.CLOCK} Waiting for {timeframe} candle to close ...", C.YELLOW), end=" ")
-        # Any symbol will do, in this case BTCUSDT
-        close_time = exchange.get_candlestick_data(_symbol="BTCUSDT", _timeframe=timeframe, _qty=1)[0]["close_time"]
-        # Get servers current time
-        current_time = exchange.get_server_time()
-        # Remaining ms = next close ms + 1.5 extra second to allow new candle to open
-        remaining_ms = close_time - current_time + 1500
-        step_ms = 330
-        # Sleep over five minutes
-        for _ in range(int(5 * 60 * 1000 / step_ms)):
-            if remaining_ms > step_ms:
-                remaining_ms -= step_ms
-                remaining = str(datetime.timedelta(seconds=int(remaining_ms / 1000)))
-                print(
-                    C.Style(
-                        f"\r{'':<100}\r{I.CLOCK} Waiting for {timeframe} candle to close @ {remaining} ...", C.YELLOW
-                    ),
-                    end=" ",
-                )
-                time.sleep(step_ms / 1000)
-            else:
-                # Clear console and exit iteration
-                print(f"\r{'':<100}", end="\r")
-                return
+        remaining = wake_time - time.time()
+        if remaining <= 0:
+            # Clear console and exit
+            print(f"\r{'':<100}", end="\r")
+            return
+        print(
+            C.Style(
+                f"\r{'':<100}\r{I.CLOCK} Waiting for {timeframe} candle to close @ "
+                f"{datetime.timedelta(seconds=int(remaining))} ...",
+                C.YELLOW,
+            ),
+            end=" ",
+        )
+        # Update console every second
+        time.sleep(min(remaining, 1))
 
 
 def side_from_direction(direction: Direction) -> str:
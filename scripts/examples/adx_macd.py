@@ -6,18 +6,22 @@ from scripts.strategy import StrategyInterface
 class AdxMacdStrategy(StrategyInterface):
     leverage = 10
     order_value = 5
+    macd_ind = Indicator(Indicator.TYPE_MACD, {"short_term": 12, "long_term": 26, "signal": 9})
+    adx_ind = Indicator(Indicator.TYPE_ADX, {"periods": 14})
     risk_reward_ind = Indicator(Indicator.TYPE_ATR, {"periods": 14})
     risk_reward_ratio = 2
     timeframe = "2h"
     trailing_stop = True
 
-    def strategy(self) -> None:
-        """Overrides StrategyInterface.strategy(self)"""
+    def market_strategy(self) -> FuturesStrategy:
+        """Overrides StrategyInterface.market_strategy(self)"""
+        macd = "{short_term}/{long_term}/{signal}".format(**self.macd_ind.function_kwargs)
+        adx = self.adx_ind.function_kwargs["periods"]
         signals = [
             ### MACD Histogram crosses 0
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_MACD),
-                signal_header="macd-h(12/26/9)",
+                signal_ind=self.macd_ind,
+                signal_header=f"macd-h({macd})",
                 cross_limit=0,
             ),
             ### D+ is greater or lower than D-
@@ -25,17 +29,17 @@ class AdxMacdStrategy(StrategyInterface):
             ### D+ < D-: Diff < 0 => BEARISH
             ### Only trade if there is a trend: ADX > 20
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_ADX),
-                signal_header="adx-diff(14)",
+                signal_ind=self.adx_ind,
+                signal_header=f"adx-diff({adx})",
                 buy_limit=0,
                 sell_limit=0,
                 reverse=True,
-                consolidation_header="adx(14)",
+                consolidation_header=f"adx({adx})",
                 consolidation_limit=20,
             ),
         ]
         if self.market == "futures":
-            ta = FuturesStrategy(
+            return FuturesStrategy(
                 name=self.name,
                 exchange=self.exchange,
                 leverage=self.leverage,
@@ -46,5 +50,9 @@ class AdxMacdStrategy(StrategyInterface):
                 risk_reward_ratio=self.risk_reward_ratio,
                 trailing_stop=self.trailing_stop,
             )
+
+    def strategy(self) -> None:
+        """Overrides StrategyInterface.strategy(self)"""
+        ta = self.market_strategy()
         while True:
             ta.check_signals()
@@ -8,29 +8,32 @@ from scripts.strategy import StrategyInterface
 class DivergencesStrategy(StrategyInterface):
     leverage = 10
     order_value = 5
+    rsi_ind = Indicator(Indicator.TYPE_RSI, {"periods": 14})
     risk_reward_ind = Indicator(Indicator.TYPE_ATR, {"periods": 14})
     risk_reward_ratio = 2
     timeframe = "15m"
     trailing_stop=True
 
 
-    def strategy(self) -> None:
+    def market_strategy(self) -> "FuturesStrategy | SpotStrategy":
+        """Overrides StrategyInterface.market_strategy(self)"""
+        rsi = f"rsi({self.rsi_ind.function_kwargs['periods']})"
         signals = [
             ### Check divergence between price and RSI
             DivergenceSignal(
-                indicator=Indicator(Indicator.TYPE_RSI, {"periods": 14}),
-                indicator_header="rsi(14)",
+                indicator=self.rsi_ind,
+                indicator_header=rsi,
             ),
             ### RSI is < 40 or > than 60
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_RSI, {"periods": 14}),
-                signal_header="rsi(14)",
+                signal_ind=self.rsi_ind,
+                signal_header=rsi,
                 buy_limit=40,
                 sell_limit=60,
             ),
         ]
         if self.market == "futures":
-            strategy = FuturesStrategy(
+            return FuturesStrategy(
                 name=self.name,
                 exchange=self.exchange,
                 leverage=self.leverage,
@@ -42,7 +45,7 @@ class DivergencesStrategy(StrategyInterface):
                 trailing_stop=self.trailing_stop,
             )
         elif self.market == "spot":
-            strategy = SpotStrategy(
+            return SpotStrategy(
                 name=self.name,
                 exchange=self.exchange,
                 order_value=self.order_value,
@@ -52,5 +55,9 @@ class DivergencesStrategy(StrategyInterface):
                 risk_reward_ind=self.risk_reward_ind,
                 risk_reward_ratio=self.risk_reward_ratio,
             )
+
+    def strategy(self) -> None:
+        """Overrides StrategyInterface.strategy(self)"""
+        strategy = self.market_strategy()
         while True:
             strategy.check_signals()
@@ -6,31 +6,33 @@ from scripts.strategy import StrategyInterface
 class MacdStrategy(StrategyInterface):
     leverage = 10
     order_value = 5
+    macd_ind = Indicator(Indicator.TYPE_MACD, {"short_term": 12, "long_term": 26, "signal": 9})
     risk_reward_ind = Indicator(Indicator.TYPE_ATR, {"periods": 14})
     risk_reward_ratio = 2
     timeframe = "2h"
     trailing_stop = False
 
-    def strategy(self) -> None:
-        """Overrides StrategyInterface.strategy(self)"""
+    def market_strategy(self) -> FuturesStrategy:
+        """Overrides StrategyInterface.market_strategy(self)"""
+        macd = "{short_term}/{long_term}/{signal}".format(**self.macd_ind.function_kwargs)
         signals = [
             ### MACD Histogram crosses 0
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_MACD),
-                signal_header="macd-h(12/26/9)",
+                signal_ind=self.macd_ind,
+                signal_header=f"macd-h({macd})",
                 cross_limit=0,
             ),
             ### MACD signal is < Histogram's MA for longs and > Histogram's MA for shorts
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_MACD),
-                signal_header="macd-s(12/26/9)",
-                base_ind=Indicator(Indicator.TYPE_MACD),
-                base_header="macd-ma(12/26/9)",
+                signal_ind=self.macd_ind,
+                signal_header=f"macd-s({macd})",
+                base_ind=self.macd_ind,
+                base_header=f"macd-ma({macd})",
                 base_limit=True,
             ),
         ]
         if self.market == "futures":
-            ta = FuturesStrategy(
+            return FuturesStrategy(
                 name=self.name,
                 exchange=self.exchange,
                 leverage=self.leverage,
@@ -41,5 +43,9 @@ class MacdStrategy(StrategyInterface):
                 risk_reward_ratio=self.risk_reward_ratio,
                 trailing_stop=self.trailing_stop,
             )
+
+    def strategy(self) -> None:
+        """Overrides StrategyInterface.strategy(self)"""
+        ta = self.market_strategy()
         while True:
             ta.check_signals()
@@ -6,32 +6,36 @@ from scripts.strategy import StrategyInterface
 class MacdMaStrategy(StrategyInterface):
     leverage = 10
     order_value = 5
+    macd_ind = Indicator(Indicator.TYPE_MACD, {"short_term": 12, "long_term": 26, "signal": 9})
+    dema_ind = Indicator(Indicator.TYPE_DEMA, {"periods": 12})
+    ema_ind = Indicator(Indicator.TYPE_EMA, {"periods": 200})
     risk_reward_ind = Indicator(Indicator.TYPE_ATR, {"periods": 14})
     risk_reward_ratio = 2
     timeframe = "1h"
     trailing_stop = False
 
-    def strategy(self) -> None:
-        """Overrides StrategyInterface.strategy(self)"""
+    def market_strategy(self) -> FuturesStrategy:
+        """Overrides StrategyInterface.market_strategy(self)"""
+        macd = "{short_term}/{long_term}/{signal}".format(**self.macd_ind.function_kwargs)
         signals = [
             ### MACD Histogram crosses 0
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_MACD),
-                signal_header="macd-h(12/26/9)",
+                signal_ind=self.macd_ind,
+                signal_header=f"macd-h({macd})",
                 cross_limit=0,
             ),
             ### Only place trades with the trend
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_DEMA, {"periods": 12}),
-                signal_header="dema(12)",
-                base_ind=Indicator(Indicator.TYPE_EMA, {"periods": 200}),
-                base_header="ema(200)",
+                signal_ind=self.dema_ind,
+                signal_header=f"dema({self.dema_ind.function_kwargs['periods']})",
+                base_ind=self.ema_ind,
+                base_header=f"ema({self.ema_ind.function_kwargs['periods']})",
                 base_limit=True,
                 reverse=True,
             ),
         ]
         if self.market == "futures":
-            ta = FuturesStrategy(
+            return FuturesStrategy(
                 name=self.name,
                 exchange=self.exchange,
                 leverage=self.leverage,
@@ -42,5 +46,9 @@ class MacdMaStrategy(StrategyInterface):
                 risk_reward_ratio=self.risk_reward_ratio,
                 trailing_stop=self.trailing_stop,
             )
+
+    def strategy(self) -> None:
+        """Overrides StrategyInterface.strategy(self)"""
+        ta = self.market_strategy()
         while True:
             ta.check_signals()
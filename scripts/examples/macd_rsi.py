@@ -7,37 +7,42 @@ from scripts.strategy import StrategyInterface
 class MacdRsiStrategy(StrategyInterface):
     leverage = 10
     order_value = 5
+    dema_ind = Indicator(Indicator.TYPE_DEMA, {"periods": 20})
+    macd_ind = Indicator(Indicator.TYPE_MACD, {"short_term": 12, "long_term": 26, "signal": 9})
+    rsi_ind = Indicator(Indicator.TYPE_RSI, {"periods": 14})
     risk_reward_ind = Indicator(Indicator.TYPE_ATR, {"periods": 14})
     risk_reward_ratio = 2
     timeframe = "1d"
     trailing_stop=True
 
 
-    def strategy(self) -> None:
+    def market_strategy(self) -> "FuturesStrategy | SpotStrategy":
+        """Overrides StrategyInterface.market_strategy(self)"""
+        macd = "{short_term}/{long_term}/{signal}".format(**self.macd_ind.function_kwargs)
         signals = [
             ### Price is above/below DEMA to confirm trend
             Signal(
                 signal_ind=None,
                 signal_header="close",
-                base_ind=Indicator(Indicator.TYPE_DEMA, {"periods": 20}),
-                base_header="dema(20)",
+                base_ind=self.dema_ind,
+                base_header=f"dema({self.dema_ind.function_kwargs['periods']})",
             ),
             ### MACD Histogram crosses 0
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_MACD),
-                signal_header="macd-h(12/26/9)",
+                signal_ind=self.macd_ind,
+                signal_header=f"macd-h({macd})",
                 cross_limit=0,
             ),
             ### Confirm momentum with RSI
             Signal(
-            signal_ind=Indicator(Indicator.TYPE_RSI, {"periods": 14}),
-            signal_header="rsi(14)",
+            signal_ind=self.rsi_ind,
+            signal_header=f"rsi({self.rsi_ind.function_kwargs['periods']})",
             buy_limit=40,
             sell_limit=60,
             ),
         ]
         if self.market == "futures":
-            ta = FuturesStrategy(
+            return FuturesStrategy(
                 name=self.name,
                 exchange=self.exchange,
                 leverage=self.leverage,
@@ -49,7 +54,7 @@ class MacdRsiStrategy(StrategyInterface):
                 trailing_stop=self.trailing_stop,
             )
         elif self.market == "spot":
-            ta = SpotStrategy(
+            return SpotStrategy(
                 name=self.name,
                 exchange=self.exchange,
                 order_value=self.order_value,
@@ -58,5 +63,9 @@ class MacdRsiStrategy(StrategyInterface):
                 risk_reward_ind=self.risk_reward_ind,
                 risk_reward_ratio=self.risk_reward_ratio,
             )
+
+    def strategy(self) -> None:
+        """Overrides StrategyInterface.strategy(self)"""
+        ta = self.market_strategy()
         while True:
             ta.check_signals()
@@ -6,40 +6,44 @@ from scripts.strategy import StrategyInterface
 class MacdStochRsiStrategy(StrategyInterface):
     leverage = 10
     order_value = 5
+    macd_ind = Indicator(Indicator.TYPE_MACD, {"short_term": 12, "long_term": 26, "signal": 9})
+    stoch_ind = Indicator(Indicator.TYPE_STOCH, {"periods": 14, "slow_periods": 3})
+    rsi_ind = Indicator(Indicator.TYPE_RSI, {"periods": 14})
     risk_reward_ind = Indicator(Indicator.TYPE_ATR, {"periods": 14})
     risk_reward_ratio = 1.7
     timeframe = "6h"
     trailing_stop = False
 
-    def strategy(self) -> None:
-        """Overrides StrategyInterface.strategy(self)"""
+    def market_strategy(self) -> FuturesStrategy:
+        """Overrides StrategyInterface.market_strategy(self)"""
+        macd = "{short_term}/{long_term}/{signal}".format(**self.macd_ind.function_kwargs)
         signals = [
             ### MACD Histogram crosses 0
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_MACD),
-                signal_header="macd-h(12/26/9)",
+                signal_ind=self.macd_ind,
+                signal_header=f"macd-h({macd})",
                 cross_limit=0,
             ),
             ### Stoch lines diverge
             ### %K > %D: Diff > 0 => BULLISH
             ### %K < %D: Diff < 0 => BEARISH
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_STOCH),
-                signal_header="stoch-diff(14)",
+                signal_ind=self.stoch_ind,
+                signal_header=f"stoch-diff({self.stoch_ind.function_kwargs['periods']})",
                 buy_limit=0,
                 sell_limit=0,
                 reverse=True,
             ),
             ### RSI is > 60 for shorts or < than 40 for longs
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_RSI, {"periods": 14}),
-                signal_header="rsi(14)",
+                signal_ind=self.rsi_ind,
+                signal_header=f"rsi({self.rsi_ind.function_kwargs['periods']})",
                 buy_limit=40,
                 sell_limit=60,
             ),
         ]
         if self.market == "futures":
-            ta = FuturesStrategy(
+            return FuturesStrategy(
                 name=self.name,
                 exchange=self.exchange,
                 leverage=self.leverage,
@@ -50,5 +54,9 @@ class MacdStochRsiStrategy(StrategyInterface):
                 risk_reward_ratio=self.risk_reward_ratio,
                 trailing_stop=self.trailing_stop,
             )
+
+    def strategy(self) -> None:
+        """Overrides StrategyInterface.strategy(self)"""
+        ta = self.market_strategy()
         while True:
             ta.check_signals()
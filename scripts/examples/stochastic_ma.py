@@ -6,44 +6,47 @@ from scripts.strategy import StrategyInterface
 class StochasticMaStrategy(StrategyInterface):
     leverage = 10
     order_value = 5
+    stoch_ind = Indicator(Indicator.TYPE_STOCH, {"periods": 14, "slow_periods": 3})
+    dema_ind = Indicator(Indicator.TYPE_DEMA, {"periods": 20})
+    ema_ind = Indicator(Indicator.TYPE_EMA, {"periods": 100})
     risk_reward_ind = Indicator(Indicator.TYPE_ATR, {"periods": 14})
     risk_reward_ratio = 2
     timeframe = "15m"
     trailing_stop = True
 
-    def strategy(self) -> None:
-        """Overrides StrategyInterface.strategy(self)"""
-        stoch_indicator = Indicator(Indicator.TYPE_STOCH)
+    def market_strategy(self) -> FuturesStrategy:
+        """Overrides StrategyInterface.market_strategy(self)"""
+        stoch = self.stoch_ind.function_kwargs["periods"]
         signals = [
             ### K is greater or lower than D
             ### K > D: Diff > 0 => BULLISH
             ### K < D: Diff < 0 => BEARISH
             Signal(
-                signal_ind=stoch_indicator,
-                signal_header="stoch-diff(14)",
+                signal_ind=self.stoch_ind,
+                signal_header=f"stoch-diff({stoch})",
                 buy_limit=0,
                 sell_limit=0,
                 reverse=True,
             ),
             ### D is < 20 for longs and > 80 for shorts
             Signal(
-                signal_ind=stoch_indicator,
-                signal_header="stoch-d(14)",
+                signal_ind=self.stoch_ind,
+                signal_header=f"stoch-d({stoch})",
                 buy_limit=20,
                 sell_limit=80,
             ),
             ### Only place trades with the trend
             Signal(
-                signal_ind=Indicator(Indicator.TYPE_DEMA, {"periods": 20}),
-                signal_header="dema(20)",
-                base_ind=Indicator(Indicator.TYPE_EMA, {"periods": 100}),
-                base_header="ema(100)",
+                signal_ind=self.dema_ind,
+                signal_header=f"dema({self.dema_ind.function_kwargs['periods']})",
+                base_ind=self.ema_ind,
+                base_header=f"ema({self.ema_ind.function_kwargs['periods']})",
                 base_limit=True,
                 reverse=True,
             ),
         ]
         if self.market == "futures":
-            ta = FuturesStrategy(
+            return FuturesStrategy(
                 name=self.name,
                 exchange=self.exchange,
                 leverage=self.leverage,
@@ -54,5 +57,9 @@ class StochasticMaStrategy(StrategyInterface):
                 risk_reward_ratio=self.risk_reward_ratio,
                 trailing_stop=self.trailing_stop,
             )
+
+    def strategy(self) -> None:
+        """Overrides StrategyInterface.strategy(self)"""
+        ta = self.market_strategy()
         while True:
             ta.check_signals()
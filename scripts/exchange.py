@@ -1,6 +1,8 @@
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pandas import DataFrame
 
+from scripts.exchanges.symbol_filters import SymbolFilters
 from scripts.indicator import Direction
 
 
@@ -8,8 +10,10 @@ class ExchangeInterface(metaclass=ABCMeta):
     account: "dict[str, bool | float | int]"
     candlesticks: dict[str, DataFrame]
     balance: "dict[str, dict[str, float]] | None"
+    candle_count: int
     positions: dict[str, dict[str, float]]
-    symbols: "dict[str, dict[str, str | float]]"
+    symbols: dict[str, dict[str, str]]
+    filters: SymbolFilters
     quote_asset: str
     test_mode: bool
 
@@ -18,13 +22,68 @@ class ExchangeInterface(metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def get_candlestick_data(self, _symbol, _timeframe, _qty) -> None:
+    def query_24h_tickers(self, spread: bool = False) -> "dict[str, dict[str, float]]":
+        """Statistics of the last 24h of all the symbols in a single request
+
+        Returns
+        -------
+        >>> dict:
+        {symbol: {"quote_volume", "price_change", "volatility", "spread"}} -> percentages, spread is only
+        included if requested"""
+        pass
+
+    @abstractmethod
+    def get_candlestick_data(self, _symbol, _timeframe, _qty, _start_time: "int | None" = None) -> DataFrame:
         pass
 
     @abstractmethod
     def get_data_from_exchange(self, symbol: str, timeframe: str) -> None:
         pass
 
+    def set_candle_count(self, candle_count: int) -> None:
+        """Number of candles requested and kept for each symbol, e.g. only the ones the indicators need"""
+        self.candle_count = candle_count
+        self.candle_cache.candle_count = candle_count
+        if self.resampler:
+            self.resampler.set_candle_count(candle_count)
+
+    def add_closed_candle(self, symbol: str, timeframe: str, candle: "dict[str, float | int]") -> bool:
+        """Merges a closed candle received from a kline stream into the candlesticks
+
+        Exchanges whose streamed candles differ from `get_candlestick_data` keep the default
+
+        Returns
+        -------
+        Whether the candle was added, if not candlesticks must be requested with `get_data_from_exchange`"""
+        return False
+
+    def get_data_for_symbols(self, symbols: "list[str]", timeframe: str, concurrency: int = 1) -> dict[str, Exception]:
+        """Retrieve candlesticks for several symbols in parallel
+
+        Parameters
+        ----------
+        `symbols`: list of pairs to retrieve
+
+        `timeframe`: candlesticks timeframe
+
+        `concurrency`: max number of simultaneous requests to the exchange
+
+        Returns
+        -------
+        Errors raised by the symbols that couldn't be retrieved"""
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+            # Request all the symbols, the pool keeps at most `concurrency` requests in flight
+            futures = {
+                executor.submit(self.get_data_from_exchange, symbol=symbol, timeframe=timeframe): symbol
+                for symbol in symbols
+            }
+            # Wait for the responses
+            for future in as_completed(futures):
+                if future.exception():
+                    errors[futures[future]] = future.exception()
+        return errors
+
     @abstractmethod
     def create_order(
         self,
@@ -0,0 +1,385 @@
+import heapq
+import os
+import numpy as np
+from pandas import DataFrame
+
+from scripts.candles.klines import KLINE_COLUMNS
+from scripts.candles.store import CandleStore
+from scripts.common import round_float_to_str, volatility_percent
+from scripts.console import C, I
+from scripts.exchange import ExchangeInterface
+from scripts.exchanges.symbol_filters import SymbolFilters
+from scripts.indicator import Direction
+
+# Candles searched at first for the exit of a position, multiplied by 4 each time it isn't found
+EXIT_SPAN = 64
+
+
+def simulate_exit(
+    candles: "dict[str, np.ndarray]",
+    start: int,
+    direction: int,
+    stop: "float | None" = None,
+    take_profit: "float | None" = None,
+    trailing: "tuple[float, float] | None" = None,
+) -> "tuple[int, float, str]":
+    """Candle and price at which a position opened at the close of candle `start` is closed by its orders
+
+    Prices are mirrored for shorts, so both directions are checked as longs. Within a candle, the order of its
+    high and low is unknown, so stops are checked before the take profit and trailing stops only follow the highs
+    of the previous candles. Orders are filled at their price, or at the candle's open if it gapped past it
+
+    Parameters
+    ----------
+    `candles`: arrays of open, high, low and close
+
+    `start`: candle at whose close the position was opened
+
+    `direction`: direction of the position
+
+    `stop`: stop loss price
+
+    `take_profit`: take profit price
+
+    `trailing`: (activation price, callback rate %) of a trailing stop
+
+    Returns
+    -------
+    >>> tuple:
+    (candle, price, reason) -> the last candle's close if the position is still open at the end of the data"""
+    size = len(candles["close"])
+    span = EXIT_SPAN
+    while True:
+        end = min(start + 1 + span, size)
+        opens = candles["open"][start + 1 : end] * direction
+        highs, lows = candles["high"][start + 1 : end], candles["low"][start + 1 : end]
+        # Favorable and adverse extremes of each candle, as if the position was long
+        best, worst = (highs, lows) if direction == Direction.BULLISH else (-lows, -highs)
+        level = np.full(len(opens), -np.inf if stop is None else stop * direction)
+        trails = np.zeros(len(opens), dtype=bool)
+        if trailing is not None:
+            activation, callback = trailing
+            active = np.flatnonzero(best >= activation * direction)
+            if len(active):
+                # Highest price since the activation, before each candle
+                peaks = np.full(len(opens), -np.inf)
+                peaks[active[0] + 1 :] = np.maximum.accumulate(best[active[0] : -1])
+                trail = np.where(np.isfinite(peaks), peaks * (1 - direction * callback / 100), -np.inf)
+                # Whichever stop is closer is hit first while the price falls
+                trails = trail > level
+                level = np.maximum(level, trail)
+        adverse = np.flatnonzero(worst <= level)
+        favorable = np.flatnonzero(best >= take_profit * direction) if take_profit is not None else adverse[:0]
+        first_adverse = adverse[0] if len(adverse) else len(opens)
+        first_favorable = favorable[0] if len(favorable) else len(opens)
+        if first_adverse < len(opens) and first_adverse <= first_favorable:
+            k = first_adverse
+            price = min(opens[k], level[k]) * direction
+            return start + 1 + k, price, "trailing stop" if trails[k] else "stop loss"
+        if first_favorable < len(opens):
+            k = first_favorable
+            return start + 1 + k, max(opens[k], take_profit * direction) * direction, "take profit"
+        if end == size:
+            return size - 1, float(candles["close"][-1]), "end of data"
+        span *= 4
+
+
+class BacktestExchange(ExchangeInterface):
+    """Exchange over the stored candlesticks, replayed by a Backtest
+
+    The clock is set by the replay, orders are filled at the mark price they are placed with and their stop loss,
+    take profit or trailing stop are simulated on the highs and lows of the next candles, see `simulate_exit`.
+    Liquidations and funding fees aren't simulated
+
+    Parameters
+    ----------
+    `candle_store`: folder with the stored candles of the market (e.g. "candles/live/futures")
+
+    `quote_asset`: quote of the symbols to replay (e.g. "USDT")
+
+    `timeframe`: timeframe of the stored candles to replay
+
+    `balance`: initial wallet balance, in quote asset
+
+    `fee`: fee charged on each fill, percentage of its value (e.g. 0.04)
+
+    `market`: "futures" | "spot", spot positions can only be long
+
+    `symbols`: symbols to replay, by default all the ones stored for the timeframe
+
+    `exchange_symbols`: optional symbols as returned in exchange_info()["symbols"], to apply their order filters
+
+    `candle_count`: number of candles of the frames requested with `get_data_from_exchange`"""
+
+    def __init__(
+        self,
+        candle_store: str,
+        quote_asset: str,
+        timeframe: str,
+        balance: float = 1000,
+        fee: float = 0.04,
+        market: str = "futures",
+        symbols: "list[str] | None" = None,
+        exchange_symbols: "list[dict] | None" = None,
+        candle_count: int = 1000,
+    ) -> None:
+        self.store = CandleStore(candle_store)
+        self.timeframe = timeframe
+        self.quote_asset = quote_asset
+        self.market = market
+        self.fee = fee / 100
+        self.initial_balance = balance
+        self.candle_count = candle_count
+        self.candle_cache = None
+        self.resampler = None
+        self.test_mode = True
+        self.candlesticks: dict[str, DataFrame] = {}
+        if symbols is None:
+            suffix = f"-{timeframe}.candles"
+            symbols = sorted(
+                name[: -len(suffix)]
+                for name in os.listdir(candle_store)
+                if name.endswith(suffix) and name[: -len(suffix)].endswith(quote_asset)
+            )
+        # Stored records are mapped read-only, so processes replaying the same files share them. Plain arrays
+        # viewing the map, slicing a memmap is slower
+        self.records = {symbol: self.store.records(f"{symbol}-{timeframe}").view(np.ndarray) for symbol in symbols}
+        self.records = {symbol: records for symbol, records in self.records.items() if len(records)}
+        self.symbols = {symbol: {"base": symbol[: -len(quote_asset)], "quote": quote_asset} for symbol in self.records}
+        self.filters = SymbolFilters(exchange_symbols or [], market_lot_size=True)
+        # Fields of the records read by the replay, indexed by candle
+        self.arrays: dict[str, dict[str, np.ndarray]] = {}
+        # Frames of all the stored candles, frames requested by the strategy are slices of them
+        self.frames: dict[str, DataFrame] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Initial balance without positions, the clock before the first candle"""
+        self.clock = 0
+        self.account = {
+            "canTrade": True,
+            "crossWalletBalance": float(self.initial_balance),
+            "crossUnPnl": 0.0,
+            "availableBalance": float(self.initial_balance),
+            "updateTime": 0,
+        }
+        self.positions: dict[str, dict[str, float]] = {}
+        self.balance = {self.quote_asset: {"free": float(self.initial_balance), "locked": 0.0, "markPrice": 1.0}}
+        # Open positions with their simulated exit, and the closing ones in order of exit time
+        self.open_trades: dict[str, dict] = {}
+        self.exits: list[tuple[int, int, str]] = []
+        self.trades: list[dict] = []
+        self.sequence = 0
+
+    def set_candle_count(self, candle_count: int) -> None:
+        """Overrides ExchangeInterface.set_candle_count, candles aren't cached"""
+        self.candle_count = candle_count
+
+    def candles(self, symbol: str) -> "dict[str, np.ndarray]":
+        """Times and prices of all the stored candles of the symbol, read from the mapped records"""
+        arrays = self.arrays.get(symbol)
+        if arrays is None:
+            records = self.records[symbol]
+            arrays = {name: records[name] for name in ("time", "open", "high", "low", "close", "close_time")}
+            self.arrays[symbol] = arrays
+        return arrays
+
+    def history(self, symbol: str) -> DataFrame:
+        """All the stored candles of the symbol, columns are views of the mapped records until they're replaced"""
+        records = self.records[symbol]
+        return DataFrame({name: records[name] for name in KLINE_COLUMNS}, copy=False)
+
+    def candle_index(self, symbol: str, time: "int | None" = None) -> int:
+        """Last candle of the symbol closed at `time` (default the clock), -1 if none"""
+        close_time = self.candles(symbol)["close_time"]
+        return int(np.searchsorted(close_time, self.clock if time is None else time, side="right")) - 1
+
+    def times(self) -> np.ndarray:
+        """Close times of the candles of all the symbols, sorted"""
+        return np.unique(np.concatenate([self.candles(symbol)["close_time"] for symbol in self.records]))
+
+    def get_server_time(self) -> int:
+        return self.clock
+
+    def query_24h_tickers(self, spread: bool = False) -> "dict[str, dict[str, float]]":
+        """Overrides ExchangeInterface.query_24h_tickers, with the candles of the 24h before the clock"""
+        tickers = {}
+        for symbol, records in self.records.items():
+            last = self.candle_index(symbol)
+            first = self.candle_index(symbol, self.clock - 24 * 60 * 60 * 1000) + 1
+            if last < first:
+                continue
+            day = records[first : last + 1]
+            tickers[symbol] = {
+                "quote_volume": float(day["quote_asset_volume"].sum()),
+                "price_change": (float(day["close"][-1]) / float(day["open"][0]) - 1) * 100,
+                "volatility": volatility_percent(high=float(day["high"].max()), low=float(day["low"].min())),
+            }
+            if spread:
+                # Order book isn't stored
+                tickers[symbol]["spread"] = 0.0
+        return tickers
+
+    def get_candlestick_data(self, _symbol, _timeframe, _qty, _start_time: "int | None" = None) -> DataFrame:
+        """Stored candles closed at the clock, only the timeframe being replayed is stored"""
+        records = self.records[_symbol]
+        last = self.candle_index(_symbol) + 1
+        first = max(last - _qty, 0)
+        if _start_time is not None:
+            first = max(first, int(np.searchsorted(records["time"], _start_time)))
+        return DataFrame({name: np.array(records[name][first:last]) for name in KLINE_COLUMNS}, copy=False)
+
+    def get_data_from_exchange(self, symbol: str, timeframe: str) -> None:
+        """Last `candle_count` candles closed at the clock, times are kept as timestamps"""
+        key = f"{symbol}-{timeframe}"
+        if symbol not in self.frames:
+            self.frames[symbol] = self.history(symbol)
+        last = self.candle_index(symbol) + 1
+        # Rows of the stored candles, without copying them
+        df_data = self.frames[symbol].iloc[max(last - self.candle_count, 0) : last]
+        # Identifies the frame for the indicators cache
+        df_data.attrs["key"] = key
+        self.candlesticks[key] = df_data
+
+    def update_account_data(self) -> None:
+        """Mark price and unrealized profit of the open positions at the clock"""
+        unrealized = 0.0
+        margin = 0.0
+        for symbol, trade in self.open_trades.items():
+            mark_price = float(self.candles(symbol)["close"][max(self.candle_index(symbol), trade["entry_index"])])
+            profit = (mark_price - trade["entry_price"]) * trade["qty"] * trade["direction"]
+            unrealized += profit
+            margin += trade["margin"]
+            if self.market == "spot":
+                self.balance[self.symbols[symbol]["base"]]["markPrice"] = mark_price
+            else:
+                self.positions[symbol] = {
+                    **self.positions[symbol],
+                    "markPrice": mark_price,
+                    "unrealizedProfit": profit,
+                }
+        wallet = self.account["crossWalletBalance"]
+        self.account = {
+            **self.account,
+            "crossUnPnl": unrealized,
+            "availableBalance": wallet + unrealized - margin,
+            "updateTime": self.clock,
+        }
+
+    def advance(self, time: int) -> None:
+        """Moves the clock to `time`, closing the positions whose exit happened by then"""
+        while self.exits and self.exits[0][0] <= time:
+            exit_time, _, symbol = heapq.heappop(self.exits)
+            self.clock = exit_time
+            self.close_position(symbol)
+        self.clock = time
+
+    def close_position(self, symbol: str) -> None:
+        trade = self.open_trades.pop(symbol)
+        value = trade["qty"] * trade["exit_price"]
+        fee = value * self.fee
+        profit = (trade["exit_price"] - trade["entry_price"]) * trade["qty"] * trade["direction"]
+        trade["fees"] += fee
+        trade["pnl"] = profit - trade["fees"]
+        self.account["crossWalletBalance"] += profit - fee
+        if self.market == "spot":
+            self.balance.pop(self.symbols[symbol]["base"], None)
+            self.balance[self.quote_asset]["free"] += value - fee
+        else:
+            self.positions.pop(symbol, None)
+        self.trades.append(trade)
+
+    def create_order(
+        self,
+        symbol: str,
+        direction: int,
+        qty: float,
+        price: float,
+        trailing: bool = False,
+        sl: "float | None" = None,
+        tp: "float | None" = None,
+        leverage: int = 1,
+    ) -> str:
+        """Fills a MARKET order at `price` and simulates its stop loss and take profit, same orders as the
+        exchange's create_order places
+
+        Parameters
+        ----------
+        `symbol`: pair to trade (e.g. "BTCBUSD")
+
+        `direction`: Direction of the trade
+
+        `qty`: amount of the trade
+
+        `price`: mark price of the asset
+
+        `trailing`: whether to trail stop or not
+
+        `sl`: stop loss price
+
+        `tp`: take profit price or callback rate if trailing
+
+        `leverage`: by default doesn't use leverage"""
+        if symbol in self.filters.index:
+            qty = float(self.filters.format_qty(symbol, qty))
+        value = qty * price
+        fee = value * self.fee
+        spot = self.market == "spot"
+        if spot and direction != Direction.BULLISH:
+            error = "Account has insufficient balance for requested action."
+        elif qty <= 0:
+            error = "Quantity less than or equal to zero."
+        elif (self.balance[self.quote_asset]["free"] if spot else self.account["availableBalance"]) < (
+            value if spot else value / leverage
+        ) + fee:
+            error = "Margin is insufficient."
+        else:
+            error = None
+        if error:
+            return "{icon} {message}".format(icon=I.CROSS, message=C.Style(error, C.RED))
+        index = self.candle_index(symbol)
+        if spot:
+            # Stop limit triggered halfway to the stop loss, take profit limit at its price
+            stop = None if sl is None else (price + sl) / 2
+            take_profit, trail = tp, None
+        elif trailing and tp is not None:
+            callback = min(max(tp, 1), 5)
+            # Activation price: 2/3 way from price to target
+            target = price * (1 + callback * direction / 100)
+            stop, take_profit, trail = sl, None, ((price + 2 * target) / 3, callback)
+        else:
+            stop, take_profit, trail = sl, tp, None
+        exit_index, exit_price, reason = simulate_exit(self.candles(symbol), index, direction, stop, take_profit, trail)
+        candles = self.candles(symbol)
+        self.open_trades[symbol] = {
+            "symbol": symbol,
+            "direction": direction,
+            "qty": qty,
+            "leverage": 1 if spot else leverage,
+            "margin": value if spot else value / leverage,
+            "entry_index": index,
+            "entry_time": int(candles["close_time"][index]),
+            "entry_price": price,
+            "exit_index": exit_index,
+            "exit_time": int(candles["close_time"][exit_index]),
+            "exit_price": exit_price,
+            "reason": reason,
+            "fees": fee,
+        }
+        self.account["crossWalletBalance"] -= fee
+        self.account["availableBalance"] -= (value if spot else value / leverage) + fee
+        if spot:
+            self.balance[self.quote_asset]["free"] -= value + fee
+            self.balance[self.symbols[symbol]["base"]] = {"free": qty, "locked": 0.0, "markPrice": price}
+        else:
+            self.positions[symbol] = {
+                "unrealizedProfit": 0.0,
+                "positionAmount": qty * direction,
+                "entryPrice": price,
+                "markPrice": price,
+            }
+        heapq.heappush(self.exits, (int(candles["close_time"][exit_index]), self.sequence, symbol))
+        self.sequence += 1
+        return "{}Qty {} - Mark price {}".format(
+            C.Style("Order: ", C.DARKCYAN), round_float_to_str(number=qty, decimal_places=8), price
+        )
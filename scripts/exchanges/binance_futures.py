@@ -1,30 +1,68 @@
+import os
+import threading
+import time
 from binance.error import ClientError
 from binance.um_futures import UMFutures
+from binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
 from pandas import DataFrame
 
-from scripts.common import readable_time, round_float_to_str, side_from_direction, str_to_decimal_places
+from scripts.candles.cache import CandleCache
+from scripts.candles.klines import klines_to_dataframe
+from scripts.candles.resample import CandleResampler
+from scripts.candles.store import CandleStore
+from scripts.common import readable_time, round_float_to_str, side_from_direction, spread_percent, volatility_percent
 from scripts.console import C, I
 from scripts.exchange import ExchangeInterface
+from scripts.exchanges.binance_limits import FUTURES_RATE_LIMITS, FUTURES_WEIGHTS, LimitedClient, RequestLimiter
+from scripts.exchanges.binance_user_stream import UserDataStream
+from scripts.exchanges.symbol_filters import SymbolFilters
 
 
 class BinanceFutures(ExchangeInterface):
     candlesticks: dict[str, DataFrame] = {}
     positions: dict[str, dict[str, str]] = {}
+    streams_per_connection = 200
 
     def __init__(
-        self, test_mode: bool, api_key: str, secret_key: str, quote_asset: str, candle_count: int = 1000
+        self,
+        test_mode: bool,
+        api_key: str,
+        secret_key: str,
+        quote_asset: str,
+        candle_count: int = 1000,
+        candle_store: "str | None" = None,
+        user_stream: bool = False,
+        base_timeframe: "str | None" = None,
     ) -> None:
         try:
             params = {"key": api_key, "secret": secret_key}
             if test_mode:
                 params["base_url"] = "https://testnet.binancefuture.com"
-            self.client = UMFutures(**params)
+            # All requests share the exchange's rate limits
+            self.limiter = RequestLimiter(rate_limits=FUTURES_RATE_LIMITS)
+            self.client = LimitedClient(UMFutures(**params), limiter=self.limiter, weights=FUTURES_WEIGHTS)
             print(I.CHECK, "Successful connection to account")
             self.account = {}
             self.balance = None
+            # Account and positions are replaced by the user data stream's thread and the strategy's
+            self.account_lock = threading.Lock()
+            # Leverage set for each symbol, so it's only changed when it differs
+            self.leverages: dict[str, int] = {}
             self.candle_count = candle_count
+            # Candles stored on disk, test and live prices are kept apart
+            store = None
+            if candle_store:
+                store = CandleStore(os.path.join(candle_store, "test" if test_mode else "live", "futures"))
+            self.candle_cache = CandleCache(candle_count=candle_count, store=store)
+            # Higher timeframes built locally from a single base timeframe
+            self.resampler = None
+            if base_timeframe:
+                self.resampler = CandleResampler(
+                    exchange=self, base_timeframe=base_timeframe, candle_count=candle_count, store=store
+                )
             self.quote_asset = quote_asset
             self.test_mode = test_mode
+            self.user_stream = UserDataStream(exchange=self) if user_stream else None
             self.query_quote_asset_list()
             self.update_account_data()
         except Exception as ex:
@@ -36,39 +74,94 @@ class BinanceFutures(ExchangeInterface):
         print(C.Style(f"{I.CLOCK} Receiving assets data ... ", C.DARKCYAN), end="")
         # Retrieve data
         symbol_dictionary = self.client.exchange_info()
-        # Convert into a dataframe
-        symbol_dataframe = DataFrame(symbol_dictionary["symbols"])
+        self.limiter.configure(symbol_dictionary["rateLimits"])
         # Extract only those symbols with a base asset of Quote and status of TRADING
-        quote_symbol_dataframe = symbol_dataframe.loc[symbol_dataframe["quoteAsset"] == self.quote_asset]
-        quote_symbol_dataframe = quote_symbol_dataframe.loc[quote_symbol_dataframe["status"] == "TRADING"]
+        quote_symbols = [
+            symbol
+            for symbol in symbol_dictionary["symbols"]
+            if symbol["quoteAsset"] == self.quote_asset and symbol["status"] == "TRADING"
+        ]
         # Update console
-        print(f"\r{I.CHECK} Received list of {len(quote_symbol_dataframe)} assets{'':<10}")
-        # Return list
-        symbols = {}
-        for _, row in quote_symbol_dataframe.iterrows():
-            data = {
-                "base": row["baseAsset"],
-                "quote": row["quoteAsset"],
-            }
-            for filter in row["filters"]:
-                if filter["filterType"] == "LOT_SIZE":
-                    data.update(
-                        {
-                            "min_qty": float(filter["minQty"]),
-                            "max_qty": float(filter["maxQty"]),
-                            "step_size": filter["stepSize"],
-                        }
-                    )
-                if filter["filterType"] == "PRICE_FILTER":
-                    data.update(
-                        {
-                            "tick_size": filter["tickSize"],
-                        }
-                    )
-            symbols[row["symbol"]] = data
-        self.symbols = symbols
+        print(f"\r{I.CHECK} Received list of {len(quote_symbols)} assets{'':<10}")
+        self.symbols = {
+            symbol["symbol"]: {"base": symbol["baseAsset"], "quote": symbol["quoteAsset"]} for symbol in quote_symbols
+        }
+        # Entries are MARKET orders, so MARKET_LOT_SIZE applies too
+        self.filters = SymbolFilters(quote_symbols, market_lot_size=True)
 
     def update_account_data(self) -> None:
+        """Updates account data, only requests a snapshot if the user data stream isn't keeping it current"""
+        if self.user_stream is None:
+            self.query_account_data()
+        elif not self.user_stream.synced:
+            # Stream not started yet or events may have been lost
+            self.user_stream.start()
+        else:
+            # Mark prices aren't streamed
+            self.update_mark_prices()
+
+    def update_mark_prices(self) -> None:
+        """Updates mark price and unrealized profit of the open positions"""
+        if not self.positions:
+            return
+        mark_prices = {p["symbol"]: float(p["price"]) for p in self.client.ticker_price()}
+        # Build new dicts so the stream's thread and the strategy never share a dict being modified
+        with self.account_lock:
+            positions = {}
+            for symbol, p in self.positions.items():
+                mark_price = mark_prices.get(symbol, p["markPrice"])
+                positions[symbol] = {
+                    **p,
+                    "unrealizedProfit": (mark_price - p["entryPrice"]) * p["positionAmount"],
+                    "markPrice": mark_price,
+                }
+            self.positions = positions
+            account = {**self.account, "crossUnPnl": sum(p["unrealizedProfit"] for p in positions.values())}
+            account["availableBalance"] = self.available_balance(account, positions)
+            self.account = account
+
+    def handle_user_event(self, event: dict) -> None:
+        """Applies an event of the user data stream to account and positions"""
+        if event["e"] == "ACCOUNT_CONFIG_UPDATE" and "ac" in event:
+            # Leverage changed, e.g. from the web
+            self.leverages[event["ac"]["s"]] = int(event["ac"]["l"])
+        if event["e"] != "ACCOUNT_UPDATE":
+            return
+        # Only changed balances and positions are sent
+        with self.account_lock:
+            account = dict(self.account)
+            for asset in event["a"]["B"]:
+                if asset["a"] == self.quote_asset:
+                    account["crossWalletBalance"] = float(asset["cw"])
+                    account["updateTime"] = event["T"]
+            positions = dict(self.positions)
+            for p in event["a"]["P"]:
+                amount = float(p["pa"])
+                if amount:
+                    unrealized_profit = float(p["up"])
+                    positions[p["s"]] = {
+                        "unrealizedProfit": unrealized_profit,
+                        "positionAmount": amount,
+                        "entryPrice": float(p["ep"]),
+                        "markPrice": float(p["ep"]) + unrealized_profit / amount,
+                    }
+                else:
+                    positions.pop(p["s"], None)
+            account["crossUnPnl"] = sum(p["unrealizedProfit"] for p in positions.values())
+            # Not sent in the events
+            account["availableBalance"] = self.available_balance(account, positions)
+            self.positions = positions
+            self.account = account
+
+    def available_balance(self, account: dict, positions: dict) -> float:
+        """Wallet balance plus unrealized profit minus the initial margin of the positions, as the exchange computes
+        it without open orders"""
+        margin = sum(
+            abs(p["positionAmount"]) * p["markPrice"] / self.leverages.get(symbol, 1) for symbol, p in positions.items()
+        )
+        return account.get("crossWalletBalance", 0.0) + account.get("crossUnPnl", 0.0) - margin
+
+    def query_account_data(self) -> None:
         """Retrieves updated data from Binance Futures account"""
         # Update console
         print("\r", end=" " * 100)
@@ -76,10 +169,11 @@ class BinanceFutures(ExchangeInterface):
         # Update account
         data = self.client.account()
         # Account Balances
+        account = self.account
         for asset in data["assets"]:
             # Store self.quote_asset data
             if asset["asset"] == self.quote_asset:
-                self.account = {
+                account = {
                     "canTrade": data["canTrade"],
                     "crossWalletBalance": float(asset["crossWalletBalance"]),
                     "crossUnPnl": float(asset["crossUnPnl"]),
@@ -87,60 +181,81 @@ class BinanceFutures(ExchangeInterface):
                     "updateTime": asset["updateTime"],
                 }
         # Positions
-        self.positions = {}
+        positions = {}
         mark_prices = {p["symbol"]: p["price"] for p in self.client.ticker_price()}
         for p in data["positions"]:
             # Only store data if has an open position
             if float(p["positionAmt"]):
-                self.positions[p["symbol"]] = {
+                positions[p["symbol"]] = {
                     "unrealizedProfit": float(p["unrealizedProfit"]),
                     "positionAmount": float(p["positionAmt"]),
                     "entryPrice": float(p["entryPrice"]),
                     "markPrice": float(mark_prices.get(p["symbol"], 0.0)),
                 }
+        with self.account_lock:
+            self.account = account
+            self.positions = positions
+        # Leverage currently set for each symbol
+        self.leverages = {p["symbol"]: int(p["leverage"]) for p in data["positions"] if "leverage" in p}
         print("\r{:<80}".format(""), end="\r")
 
     def get_server_time(self) -> int:
         """Retrieves current server's timestamp"""
         return self.client.time()["serverTime"]
 
-    def get_candlestick_data(self, _symbol, _timeframe, _qty):
+    def query_24h_tickers(self, spread: bool = False) -> "dict[str, dict[str, float]]":
+        """Overrides ExchangeInterface.query_24h_tickers"""
+        tickers = {}
+        for ticker in self.client.ticker_24hr_price_change():
+            if ticker["symbol"] in self.symbols:
+                tickers[ticker["symbol"]] = {
+                    "quote_volume": float(ticker["quoteVolume"]),
+                    "price_change": float(ticker["priceChangePercent"]),
+                    "volatility": volatility_percent(high=float(ticker["highPrice"]), low=float(ticker["lowPrice"])),
+                }
+        if spread:
+            # Futures 24h tickers don't include the order book
+            for ticker in self.client.book_ticker():
+                if ticker["symbol"] in tickers:
+                    tickers[ticker["symbol"]]["spread"] = spread_percent(
+                        bid=float(ticker["bidPrice"]), ask=float(ticker["askPrice"])
+                    )
+        return tickers
+
+    def get_candlestick_data(self, _symbol, _timeframe, _qty, _start_time: "int | None" = None) -> DataFrame:
         """Query Binance for candlestick data"""
-        # Set up the return array
-        converted_data = []
         # Retrieve data from Exchange
-        raw_data = self.client.mark_price_klines(symbol=_symbol, interval=_timeframe, limit=_qty)
-        # Convert each element into a Python dictionary object, then add to converted_data
-        for candle in raw_data:
-            # Dictionary object
-            converted_candle = {
-                "time": int(candle[0]),
-                "open": float(candle[1]),
-                "high": float(candle[2]),
-                "low": float(candle[3]),
-                "close": float(candle[4]),
-                "volume": float(candle[5]),
-                "close_time": int(candle[6]),
-                "quote_asset_volume": float(candle[7]),
-                "number_of_trades": int(candle[8]),
-                "taker_buy_base_asset_volume": float(candle[9]),
-                "taker_buy_quote_asset_volume": float(candle[10]),
-            }
-            converted_data.append(converted_candle)
-        # Return converted data
-        return converted_data
+        raw_data = self.client.mark_price_klines(symbol=_symbol, interval=_timeframe, limit=_qty, startTime=_start_time)
+        # Convert data into a Pandas DataFrame
+        return klines_to_dataframe(raw_data)
 
     def get_data_from_exchange(self, symbol: str, timeframe: str) -> None:
         """Retrieve candlesticks values in a Dataframe for each asset in the specified timeframe"""
-        # Get the last self.candle_count candlesticks
-        raw_data = self.get_candlestick_data(symbol, timeframe, self.candle_count)
-        # Transform raw_data into a Pandas DataFrame
-        df_data = DataFrame(raw_data)
+        key = f"{symbol}-{timeframe}"
+        if self.resampler and self.resampler.resamples(timeframe):
+            # Aggregated from the base timeframe's candles, shared by all the timeframes
+            df_data = self.resampler.candles(symbol=symbol, timeframe=timeframe)
+        else:
+            # Only request the candles newer than the cached ones
+            start_time, limit = self.candle_cache.missing_candles(key, timeframe)
+            df_data = self.get_candlestick_data(symbol, timeframe, limit, start_time)
+            # Merge the new candles into the cached Pandas DataFrame
+            df_data = self.candle_cache.update(key, df_data)
         # Convert the time to human readable format
         df_data["time"] = readable_time(df_data["time"])
         # df_data["close_time"] = readable_time(df_data["close_time"])
+        # Identifies the frame for the indicators cache
+        df_data.attrs["key"] = key
         # Update self.candlesticks
-        self.candlesticks.update({f"{symbol}-{timeframe}": df_data})
+        self.candlesticks.update({key: df_data})
+
+    def websocket_client(self, stream_url: "str | None" = None) -> UMFuturesWebsocketClient:
+        """Websocket client for market streams, `stream_url` overrides Binance's url
+
+        Mark price klines aren't streamed, so closed klines only notify that candlesticks must be updated"""
+        if stream_url is None:
+            stream_url = "wss://stream.binancefuture.com" if self.test_mode else "wss://fstream.binance.com"
+        return UMFuturesWebsocketClient(stream_url=stream_url)
 
     def create_order(
         self,
@@ -172,22 +287,27 @@ class BinanceFutures(ExchangeInterface):
         `tl`: take profit price or callback rate if trailing
 
         `leverage`: by default doesn't use leverage"""
+        # Round trip time of each request, to know how long the position was unprotected
+        latencies = {}
         # Close all previous open positions for that symbol
+        start = time.perf_counter()
         self.client.cancel_open_orders(symbol=symbol)
-        # Set leverage
-        try:
-            self.client.change_leverage(symbol=symbol, leverage=leverage)
-        except ClientError as error:
-            # Return error message
-            return "{icon} {message}".format(
-                icon=I.CROSS,
-                message=C.Style("[{}] {}".format(error.error_code, error.error_message), C.RED),
-            )
+        latencies["cancel"] = time.perf_counter() - start
+        # Set leverage, only when it differs from the one already set for the symbol
+        if self.leverages.get(symbol) != leverage:
+            start = time.perf_counter()
+            try:
+                self.client.change_leverage(symbol=symbol, leverage=leverage)
+            except ClientError as error:
+                # Return error message
+                return "{icon} {message}".format(
+                    icon=I.CROSS,
+                    message=C.Style("[{}] {}".format(error.error_code, error.error_message), C.RED),
+                )
+            self.leverages[symbol] = leverage
+            latencies["leverage"] = time.perf_counter() - start
         # Filters
-        step_size = str_to_decimal_places(self.symbols[symbol]["step_size"])
-        tick_size = str_to_decimal_places(self.symbols[symbol]["tick_size"])
-        qty = min(max(qty, self.symbols[symbol]["min_qty"]), self.symbols[symbol]["max_qty"])
-        qty = round_float_to_str(number=qty, decimal_places=step_size)
+        qty = self.filters.format_qty(symbol, qty)
         # Main order arguments
         ## Type MARKET so SL and TP can be ordered rightaway
         order_kwargs = {
@@ -198,10 +318,16 @@ class BinanceFutures(ExchangeInterface):
             "quantity": qty,
             "reduceOnly": "false",
         }
+        start = time.perf_counter()
         order_response = C.Style("Order: ", C.DARKCYAN) + self.place_order(
             response_args=["origQty"], kwargs=order_kwargs
         ).replace("origQty", "Qty")
-        sl_response = tp_response = None
+        latencies["order"] = time.perf_counter() - start
+        if I.CROSS in order_response:
+            # Leverage may have been changed from elsewhere, set it again next time
+            self.leverages.pop(symbol, None)
+        # SL and TP are placed together in a single request
+        protective_orders = []
         # Change direction for SL and TP
         direction *= -1
         # Stop loss arguments
@@ -212,25 +338,20 @@ class BinanceFutures(ExchangeInterface):
                 "side": side_from_direction(direction=direction),
                 "positionSide": "BOTH",
                 "type": "STOP_MARKET",
-                "stopPrice": round_float_to_str(number=sl, decimal_places=tick_size),  # SL
+                "stopPrice": self.filters.format_price(symbol, sl),  # SL
                 "closePosition": "true",
                 "workingType": "MARK_PRICE",
             }
-            sl_response = C.Style("Stop Loss: ", C.DARKCYAN) + (
-                self.place_order(response_args=["stopPrice"], kwargs=sl_kwargs)
-                .replace("stopPrice", "Price")
-            )
+            protective_orders.append(("Stop Loss", {"stopPrice": "Price"}, sl_kwargs))
         # Take profit arguments
         if not I.CROSS in order_response and tp is not None:
             # Activation price: 0.1% away from price
-            act_price = price * (1 + 0.001 * direction)
-            act_price = round_float_to_str(number=act_price, decimal_places=tick_size)
+            act_price = self.filters.format_price(symbol, price * (1 + 0.001 * direction))
             if trailing:
                 cr = min(max(tp, 1), 5)
                 # Activation price: 2/3 way from price to target
                 targ_price = price * (1 - cr * direction / 100)
-                act_price = (price + 2 * targ_price) / 3
-                act_price = round_float_to_str(number=act_price, decimal_places=tick_size)
+                act_price = self.filters.format_price(symbol, (price + 2 * targ_price) / 3)
                 tp_kwargs = {
                     "symbol": symbol,
                     "side": side_from_direction(direction=direction),
@@ -242,10 +363,8 @@ class BinanceFutures(ExchangeInterface):
                     "callbackRate": round_float_to_str(number=cr, decimal_places=1),
                     "workingType": "MARK_PRICE",
                 }
-                tp_response = C.Style("Trailing Take Profit: ", C.DARKCYAN) + (
-                    self.place_order(response_args=["activatePrice", "priceRate"], kwargs=tp_kwargs)
-                    .replace("activatePrice", "Activate")
-                    .replace("priceRate", "Trailing%")
+                protective_orders.append(
+                    ("Trailing Take Profit", {"activatePrice": "Activate", "priceRate": "Trailing%"}, tp_kwargs)
                 )
             else:
                 tp_kwargs = {
@@ -253,20 +372,30 @@ class BinanceFutures(ExchangeInterface):
                     "side": side_from_direction(direction=direction),
                     "positionSide": "BOTH",
                     "type": "TAKE_PROFIT_MARKET",
-                    "stopPrice": round_float_to_str(number=tp, decimal_places=tick_size),  # TP
+                    "stopPrice": self.filters.format_price(symbol, tp),  # TP
                     "closePosition": "true",
                     "workingType": "MARK_PRICE",
                 }
-                tp_response = C.Style("Take Profit: ", C.DARKCYAN) + (
-                    self.place_order(response_args=["stopPrice"], kwargs=tp_kwargs)
-                    .replace("stopPrice", "Price")
-                )
+                protective_orders.append(("Take Profit", {"stopPrice": "Price"}, tp_kwargs))
         # Return responses
         response = f"{order_response} - Mark price {price}"
-        if sl_response:
-            response += C.Style(" | ", C.DARKCYAN) + sl_response
-        if tp_response:
-            response += C.Style(" | ", C.DARKCYAN) + tp_response
+        if protective_orders:
+            start = time.perf_counter()
+            batch_responses = self.place_batch_order(
+                response_args=[list(args) for _, args, _ in protective_orders],
+                batch_kwargs=[kwargs for _, _, kwargs in protective_orders],
+            )
+            latencies["sl/tp"] = time.perf_counter() - start
+            for (title, args, _), batch_response in zip(protective_orders, batch_responses):
+                for arg, name in args.items():
+                    batch_response = batch_response.replace(arg, name)
+                response += C.Style(f" | {title}: ", C.DARKCYAN) + batch_response
+        response += C.Style(
+            " | Latency: "
+            + ", ".join(f"{leg} {seconds * 1000:.0f}ms" for leg, seconds in latencies.items())
+            + f" = {sum(latencies.values()) * 1000:.0f}ms",
+            C.DARKCYAN,
+        )
         return response
 
     def place_order(self, response_args: list[str], kwargs) -> str:
@@ -283,10 +412,37 @@ class BinanceFutures(ExchangeInterface):
         except ClientError as error:
             error_data = {"code": error.error_code, "msg": error.error_message}
         except Exception as error:
-            error_data = error
+            error_data = {"code": type(error).__name__, "msg": error}
         # Return error message
         return "{icon} {message} -> {args}".format(
             icon=I.CROSS,
             message=C.Style("[{}] {}".format(error_data["code"], error_data["msg"]), C.RED),
             args=kwargs,
         )
+
+    def place_batch_order(self, response_args: "list[list[str]]", batch_kwargs: "list[dict]") -> "list[str]":
+        """Places up to 5 orders in a single request, returns the response of each order"""
+        try:
+            order_responses = self.client.new_batch_order(batchOrders=batch_kwargs)
+        except ClientError as error:
+            # The whole batch was rejected
+            order_responses = [{"code": error.error_code, "msg": error.error_message}] * len(batch_kwargs)
+        except Exception:
+            # No response (network error, timeout...), the position is already open so each order is placed again
+            return [
+                self.place_order(response_args=args, kwargs=kwargs) for args, kwargs in zip(response_args, batch_kwargs)
+            ]
+        responses = []
+        for args, kwargs, order_response in zip(response_args, batch_kwargs, order_responses):
+            if order_response.get("orderId"):
+                responses.append(" - ".join([f"{a} {order_response[a]}" for a in args]))
+            else:
+                # Each order of the batch fails independently
+                responses.append(
+                    "{icon} {message} -> {args}".format(
+                        icon=I.CROSS,
+                        message=C.Style("[{}] {}".format(order_response.get("code"), order_response.get("msg")), C.RED),
+                        args=kwargs,
+                    )
+                )
+        return responses
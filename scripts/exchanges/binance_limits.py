@@ -0,0 +1,207 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable
+
+
+def klines_weight(kwargs: dict) -> int:
+    """Futures klines weight depends on the number of candles"""
+    limit = kwargs.get("limit") or 500
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+# Request weight of each client method, functions receive the call's kwargs
+FUTURES_WEIGHTS: "dict[str, int | Callable[[dict], int]]" = {
+    "account": 5,
+    "book_ticker": lambda kwargs: 2 if kwargs.get("symbol") else 5,
+    "cancel_open_orders": 1,
+    "change_leverage": 1,
+    "exchange_info": 1,
+    "klines": klines_weight,
+    "mark_price_klines": klines_weight,
+    "new_batch_order": 5,
+    "new_listen_key": 1,
+    "new_order": 1,
+    "renew_listen_key": 1,
+    "ticker_24hr_price_change": lambda kwargs: 1 if kwargs.get("symbol") else 40,
+    "ticker_price": lambda kwargs: 1 if kwargs.get("symbol") else 2,
+    "time": 1,
+}
+SPOT_WEIGHTS: "dict[str, int | Callable[[dict], int]]" = {
+    "account": 20,
+    "cancel_open_orders": 1,
+    "exchange_info": 20,
+    "get_open_orders": lambda kwargs: 6 if kwargs.get("symbol") else 80,
+    "klines": 2,
+    "new_listen_key": 2,
+    "new_order": 1,
+    "renew_listen_key": 2,
+    "ticker_24hr": lambda kwargs: 2 if kwargs.get("symbol") else 80,
+    "ticker_price": lambda kwargs: 2 if kwargs.get("symbol") else 4,
+    "time": 1,
+}
+# Limits used until exchange_info returns the current ones
+FUTURES_RATE_LIMITS = [
+    {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 2400},
+    {"rateLimitType": "ORDERS", "interval": "MINUTE", "intervalNum": 1, "limit": 1200},
+    {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": 300},
+]
+SPOT_RATE_LIMITS = [
+    {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 6000},
+    {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": 50},
+    {"rateLimitType": "ORDERS", "interval": "DAY", "intervalNum": 1, "limit": 160000},
+    {"rateLimitType": "RAW_REQUESTS", "interval": "MINUTE", "intervalNum": 5, "limit": 61000},
+]
+# Orders counted by each client method
+ORDER_COUNTS: "dict[str, int | Callable[[dict], int]]" = {
+    "new_order": 1,
+    "new_batch_order": lambda kwargs: len(kwargs.get("batchOrders", [])),
+}
+# Seconds of the intervals used by Binance in rateLimits and X-MBX-* headers
+INTERVALS = {"S": 1, "M": 60, "H": 60 * 60, "D": 24 * 60 * 60}
+
+
+class WindowCounter:
+    """Usage of a limit, counted in fixed windows of `period` seconds aligned to the server's clock as Binance
+    does, so it's only reset to the whole limit when the window ends"""
+
+    def __init__(self, limit: int, period: float) -> None:
+        self.limit = limit
+        self.period = period
+        self.used = 0
+        # Server time (s) when the current window started
+        self.window = 0.0
+
+    def roll(self, now: float) -> None:
+        """Starts a new window if the current one ended by `now`"""
+        window = now - now % self.period
+        if window > self.window:
+            self.window = window
+            self.used = 0
+
+    def wait_time(self, amount: int, now: float) -> float:
+        """Seconds till `amount` can be used, i.e. till the window ends if it doesn't fit in it"""
+        if self.used + min(amount, self.limit) <= self.limit:
+            return 0
+        return self.window + self.period - now
+
+
+class RequestLimiter:
+    """Keeps the requests within Binance's request weight and order count limits
+
+    Parameters
+    ----------
+    `rate_limits`: limits as returned in exchange_info()["rateLimits"]"""
+
+    def __init__(self, rate_limits: "list[dict]") -> None:
+        self.condition = threading.Condition()
+        self.counters: dict[str, dict[str, WindowCounter]] = {}
+        self.blocked_until = 0.0
+        # Server time minus local time (s), from the Date header of the responses
+        self.offset = 0.0
+        self.configure(rate_limits)
+
+    def configure(self, rate_limits: "list[dict]") -> None:
+        """Updates the limits, e.g. with the ones received from exchange_info"""
+        with self.condition:
+            self.counters = {}
+            for rate_limit in rate_limits:
+                interval = f"{rate_limit['intervalNum']}{rate_limit['interval'][0]}"
+                period = rate_limit["intervalNum"] * INTERVALS[interval[-1]]
+                self.counters.setdefault(rate_limit["rateLimitType"], {})[interval] = WindowCounter(
+                    rate_limit["limit"], period
+                )
+
+    def now(self) -> float:
+        """Estimated server time (s)"""
+        return time.time() + self.offset
+
+    def acquire(self, weight: int, orders: int = 0) -> None:
+        """Blocks until there is capacity for the request"""
+        requested = {"REQUEST_WEIGHT": weight, "ORDERS": orders, "RAW_REQUESTS": 1}
+        with self.condition:
+            while True:
+                now = self.now()
+                wait = self.blocked_until - now
+                for limit_type, amount in requested.items():
+                    if not amount:
+                        continue
+                    for counter in self.counters.get(limit_type, {}).values():
+                        counter.roll(now)
+                        wait = max(wait, counter.wait_time(amount, now))
+                if wait <= 0:
+                    break
+                self.condition.wait(timeout=wait)
+            for limit_type, amount in requested.items():
+                for counter in self.counters.get(limit_type, {}).values():
+                    counter.used += amount
+
+    def sync(self, response, *args, **kwargs) -> None:
+        """Response hook, syncs the counters with the usage reported by the server"""
+        with self.condition:
+            # Server time of the response
+            sent = self.now()
+            date = response.headers.get("Date")
+            if date:
+                # Seconds are truncated, so the server's clock is taken as behind and windows end a bit later
+                sent = parsedate_to_datetime(date).timestamp()
+                self.offset = sent - time.time()
+            for key, value in response.headers.items():
+                key = key.lower()
+                if key.startswith("x-mbx-used-weight-"):
+                    counter = self.counters.get("REQUEST_WEIGHT", {}).get(key[18:].upper())
+                elif key.startswith("x-mbx-order-count-"):
+                    counter = self.counters.get("ORDERS", {}).get(key[18:].upper())
+                else:
+                    continue
+                # Usage of a window that already ended
+                if counter is None or sent - sent % counter.period < counter.window:
+                    continue
+                counter.roll(sent)
+                # Requests still in flight aren't counted by the server yet
+                counter.used = max(counter.used, int(value))
+            # Too many requests (429) or IP banned (418)
+            if response.status_code in (418, 429):
+                self.blocked_until = sent + int(response.headers.get("Retry-After", 60))
+            self.condition.notify_all()
+
+
+class LimitedClient:
+    """Proxy of a Binance connector client that waits for capacity before each request
+
+    Parameters
+    ----------
+    `client`: UMFutures or Spot client
+
+    `limiter`: RequestLimiter shared by all the requests
+
+    `weights`: request weight of each client method, unknown methods weigh 1"""
+
+    def __init__(self, client, limiter: RequestLimiter, weights: "dict[str, int | Callable[[dict], int]]") -> None:
+        self.client = client
+        self.limiter = limiter
+        self.weights = weights
+        # Read the used weight from every response
+        client.session.hooks["response"].append(limiter.sync)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def request(*args, **kwargs):
+            weight = self.weights.get(name, 1)
+            orders = ORDER_COUNTS.get(name, 0)
+            self.limiter.acquire(
+                weight=weight(kwargs) if callable(weight) else weight,
+                orders=orders(kwargs) if callable(orders) else orders,
+            )
+            return attr(*args, **kwargs)
+
+        return request
@@ -1,8 +1,18 @@
+import os
+import threading
 from binance.error import ClientError
 from binance.spot import Spot
+from binance.websocket.spot.websocket_client import SpotWebsocketClient
 from pandas import DataFrame
-from scripts.common import readable_time, round_float_to_str, side_from_direction, str_to_decimal_places
+from scripts.candles.cache import CandleCache
+from scripts.candles.klines import klines_to_dataframe
+from scripts.candles.resample import CandleResampler
+from scripts.candles.store import CandleStore
+from scripts.common import readable_time, side_from_direction, spread_percent, volatility_percent
 from scripts.exchange import ExchangeInterface
+from scripts.exchanges.binance_limits import SPOT_RATE_LIMITS, SPOT_WEIGHTS, LimitedClient, RequestLimiter
+from scripts.exchanges.binance_user_stream import UserDataStream
+from scripts.exchanges.symbol_filters import SymbolFilters
 from scripts.indicator import Direction
 from scripts.console import C, I
 
@@ -10,19 +20,47 @@ from scripts.console import C, I
 class BinanceSpot(ExchangeInterface):
     candlesticks: dict[str, DataFrame] = {}
     positions: dict[str, dict[str, str]] = {}
+    streams_per_connection = 1024
 
-    def __init__(self, test_mode: bool, api_key: str, secret_key: str, quote_asset: str, candle_count: int = 1000):
+    def __init__(
+        self,
+        test_mode: bool,
+        api_key: str,
+        secret_key: str,
+        quote_asset: str,
+        candle_count: int = 1000,
+        candle_store: "str | None" = None,
+        user_stream: bool = False,
+        base_timeframe: "str | None" = None,
+    ):
         try:
             params = {"key": api_key, "secret": secret_key}
             if test_mode:
                 params["base_url"] = "https://testnet.binance.vision"
-            self.client = Spot(**params)
+            # All requests share the exchange's rate limits
+            self.limiter = RequestLimiter(rate_limits=SPOT_RATE_LIMITS)
+            self.client = LimitedClient(Spot(**params), limiter=self.limiter, weights=SPOT_WEIGHTS)
             print(I.CHECK, "Successful connection to account")
             self.account = {}
-            self.balance = None
+            # Events may arrive before the first snapshot
+            self.balance = {}
+            # Balances and open orders are replaced by the user data stream's thread and the strategy's
+            self.account_lock = threading.Lock()
             self.candle_count = candle_count
+            # Candles stored on disk, test and live prices are kept apart
+            store = None
+            if candle_store:
+                store = CandleStore(os.path.join(candle_store, "test" if test_mode else "live", "spot"))
+            self.candle_cache = CandleCache(candle_count=candle_count, store=store)
+            # Higher timeframes built locally from a single base timeframe
+            self.resampler = None
+            if base_timeframe:
+                self.resampler = CandleResampler(
+                    exchange=self, base_timeframe=base_timeframe, candle_count=candle_count, store=store
+                )
             self.quote_asset = quote_asset
             self.test_mode = test_mode
+            self.user_stream = UserDataStream(exchange=self) if user_stream else None
             self.query_quote_asset_list()
             self.update_account_data()
             self.maker_fee = float(self.account["commissionRates"]["maker"])
@@ -41,59 +79,101 @@ class BinanceSpot(ExchangeInterface):
         print(C.Style(f"{I.CLOCK} Receiving assets data ... ", C.DARKCYAN), end="")
         # Retrieve data
         symbol_dictionary = self.client.exchange_info()
-        # Convert into a dataframe
-        symbol_dataframe = DataFrame(symbol_dictionary["symbols"])
+        self.limiter.configure(symbol_dictionary["rateLimits"])
         # Extract only those symbols with a base asset of Quote and status of TRADING
-        quote_symbol_dataframe = symbol_dataframe.loc[symbol_dataframe["quoteAsset"] == self.quote_asset]
-        quote_symbol_dataframe = quote_symbol_dataframe.loc[quote_symbol_dataframe["status"] == "TRADING"]
+        quote_symbols = [
+            symbol
+            for symbol in symbol_dictionary["symbols"]
+            if symbol["quoteAsset"] == self.quote_asset and symbol["status"] == "TRADING"
+        ]
         # Update console
-        print(f"\r{I.CHECK} Received list of {len(quote_symbol_dataframe)} assets{'':<10}")
-        # Return list
-        symbols = {}
-        for _, row in quote_symbol_dataframe.iterrows():
-            data = {
-                "base": row["baseAsset"],
-                "quote": row["quoteAsset"],
-            }
-            for filter in row["filters"]:
-                # Market trades need to fill both LOT_SIZE and MARKET_LOT_SIZE
-                if filter["filterType"] == "PRICE_FILTER":
-                    data["tick_size"] = filter["tickSize"]
-                elif filter["filterType"] == "LOT_SIZE":
-                    data["min_qty"] = filter["minQty"]
-                    data["max_qty"] = filter["maxQty"]
-                    data["step_size"] = filter["stepSize"]
-                elif filter["filterType"] == "MARKET_LOT_SIZE":
-                    data["min_qty"] = max(data["min_qty"], filter["minQty"])
-                    data["max_qty"] = min(data["max_qty"], filter["maxQty"])
-                    data["step_size"] = max(filter["stepSize"], data["step_size"])
-            symbols[row["symbol"]] = data
-        self.symbols = symbols
+        print(f"\r{I.CHECK} Received list of {len(quote_symbols)} assets{'':<10}")
+        self.symbols = {
+            symbol["symbol"]: {"base": symbol["baseAsset"], "quote": symbol["quoteAsset"]} for symbol in quote_symbols
+        }
+        # Entries are MARKET orders, so MARKET_LOT_SIZE applies too
+        self.filters = SymbolFilters(quote_symbols, market_lot_size=True)
 
     def update_account_data(self) -> None:
-        """Retrieves updated data from Binance Futures account"""
+        """Updates account data, only requests a snapshot if the user data stream isn't keeping it current"""
+        if self.user_stream is None:
+            self.query_account_data()
+        elif not self.user_stream.synced:
+            # Stream not started yet or events may have been lost
+            self.user_stream.start()
+        else:
+            # Mark prices aren't streamed
+            self.update_mark_prices()
+
+    def update_mark_prices(self) -> None:
+        """Updates mark price of the balances and unrealized profit of the open orders"""
+        mark_prices = {p["symbol"]: float(p["price"]) for p in self.client.ticker_price()}
+        # Build new dicts so the stream's thread and the strategy never share a dict being modified
+        with self.account_lock:
+            self.balance = {
+                asset: {**b, "markPrice": mark_prices.get(asset + self.quote_asset, b["markPrice"])}
+                for asset, b in self.balance.items()
+            }
+            positions = {}
+            for symbol, p in self.positions.items():
+                mark_price = mark_prices.get(symbol, p["entryPrice"])
+                direction = Direction.BULLISH if p["side"] == "BUY" else Direction.BEARISH
+                positions[symbol] = {**p, "unrealizedProfit": (mark_price - p["entryPrice"]) * direction}
+            self.positions = positions
+
+    def handle_user_event(self, event: dict) -> None:
+        """Applies an event of the user data stream to balances and open orders"""
+        with self.account_lock:
+            if event["e"] == "outboundAccountPosition":
+                # Only changed balances are sent
+                balance = dict(self.balance)
+                for b in event["B"]:
+                    free = float(b["f"])
+                    locked = float(b["l"])
+                    if free or locked:
+                        mark_price = balance.get(b["a"], {}).get("markPrice", 0.0)
+                        balance[b["a"]] = {"free": free, "locked": locked, "markPrice": mark_price}
+                    else:
+                        balance.pop(b["a"], None)
+                self.balance = balance
+            elif event["e"] == "executionReport":
+                positions = dict(self.positions)
+                if event["X"] in ("NEW", "PARTIALLY_FILLED"):
+                    positions[event["s"]] = {
+                        "unrealizedProfit": 0.0,
+                        "positionAmount": float(event["q"]),
+                        "side": event["S"],
+                        "type": event["o"],
+                        "entryPrice": float(event["p"]),
+                    }
+                else:
+                    # Filled, canceled, rejected or expired
+                    positions.pop(event["s"], None)
+                self.positions = positions
+
+    def query_account_data(self) -> None:
+        """Retrieves updated data from Binance Spot account"""
         # Update console
         print("\r", end=" " * 100)
         print(C.Style(f"\r{I.CLOCK} Updating account data ... ", C.DARKCYAN), end="")
         # Update account
-        self.account = self.client.account()
+        account = self.client.account()
         # Assets balances
-        self.balance = {}
+        balance = {}
         mark_prices = {p["symbol"]: p["price"] for p in self.client.ticker_price()}
-        for b in self.account["balances"]:
+        for b in account["balances"]:
             free = float(b["free"])
             locked = float(b["locked"])
             price = float(mark_prices.get(b["asset"] + self.quote_asset, 0.0))
             if free or locked:
-                self.balance[b["asset"]] = {
+                balance[b["asset"]] = {
                     "free": free,
                     "locked": locked,
                     "markPrice": price,
                 }
         # Current open orders
-        self.positions = {}
-        positions = self.client.get_open_orders()
-        for p in positions:
+        positions = {}
+        for p in self.client.get_open_orders():
             # Calculate unrealized profit
             pos_amount = float(p["origQty"])
             entry_price = float(p["price"])
@@ -102,13 +182,17 @@ class BinanceSpot(ExchangeInterface):
             un_profit = (mark_price - entry_price) * direction
             # Only store data if has an open position
             if pos_amount:
-                self.positions[p["symbol"]] = {
+                positions[p["symbol"]] = {
                     "unrealizedProfit": un_profit,
                     "positionAmount": pos_amount,
                     "side": p["side"],
                     "type": p["type"],
                     "entryPrice": entry_price,
                 }
+        with self.account_lock:
+            self.account = account
+            self.balance = balance
+            self.positions = positions
         print("\r{:<80}".format(""), end="\r")
 
     def sell_all_assets(self):
@@ -140,42 +224,67 @@ class BinanceSpot(ExchangeInterface):
         """Retrieves current server's timestamp"""
         return self.client.time()["serverTime"]
 
-    def get_candlestick_data(self, _symbol, _timeframe, _qty):
+    def query_24h_tickers(self, spread: bool = False) -> "dict[str, dict[str, float]]":
+        """Overrides ExchangeInterface.query_24h_tickers"""
+        tickers = {}
+        for ticker in self.client.ticker_24hr():
+            if ticker["symbol"] in self.symbols:
+                tickers[ticker["symbol"]] = {
+                    "quote_volume": float(ticker["quoteVolume"]),
+                    "price_change": float(ticker["priceChangePercent"]),
+                    "volatility": volatility_percent(high=float(ticker["highPrice"]), low=float(ticker["lowPrice"])),
+                }
+                if spread:
+                    tickers[ticker["symbol"]]["spread"] = spread_percent(
+                        bid=float(ticker["bidPrice"]), ask=float(ticker["askPrice"])
+                    )
+        return tickers
+
+    def get_candlestick_data(self, _symbol, _timeframe, _qty, _start_time: "int | None" = None) -> DataFrame:
         """Query Binance for candlestick data"""
-        raw_data = self.client.klines(symbol=_symbol, interval=_timeframe, limit=_qty)
-        # Set up the return array
-        converted_data = []
-        # Convert each element into a Python dictionary object, then add to converted_data
-        for candle in raw_data:
-            # Dictionary object
-            converted_candle = {
-                "time": candle[0],
-                "open": float(candle[1]),
-                "high": float(candle[2]),
-                "low": float(candle[3]),
-                "close": float(candle[4]),
-                "volume": float(candle[5]),
-                "close_time": candle[6],
-                "quote_asset_volume": float(candle[7]),
-                "number_of_trades": int(candle[8]),
-                "taker_buy_base_asset_volume": float(candle[9]),
-                "taker_buy_quote_asset_volume": float(candle[10]),
-            }
-            converted_data.append(converted_candle)
-        # Return converted data
-        return converted_data
+        raw_data = self.client.klines(symbol=_symbol, interval=_timeframe, limit=_qty, startTime=_start_time)
+        # Convert data into a Pandas DataFrame
+        return klines_to_dataframe(raw_data)
 
     def get_data_from_exchange(self, symbol, timeframe):
         """Convert binance data into a dataframe"""
-        # Retrieve the raw data from Binance
-        raw_data = self.get_candlestick_data(symbol, timeframe, self.candle_count)
-        # Transform raw_data into a Pandas DataFrame
-        df_data = DataFrame(raw_data)
+        key = f"{symbol}-{timeframe}"
+        if self.resampler and self.resampler.resamples(timeframe):
+            # Aggregated from the base timeframe's candles, shared by all the timeframes
+            df_data = self.resampler.candles(symbol=symbol, timeframe=timeframe)
+        else:
+            # Only request the candles newer than the cached ones
+            start_time, limit = self.candle_cache.missing_candles(key, timeframe)
+            df_data = self.get_candlestick_data(symbol, timeframe, limit, start_time)
+            # Merge the new candles into the cached Pandas DataFrame
+            df_data = self.candle_cache.update(key, df_data)
         # Convert the time to human readable format
         df_data["time"] = readable_time(df_data["time"])
         # df_data["close_time"] = readable_time(df_data["close_time"])
+        # Identifies the frame for the indicators cache
+        df_data.attrs["key"] = key
         # Update self.candlesticks
-        self.candlesticks.update({f"{symbol}-{timeframe}": df_data})
+        self.candlesticks.update({key: df_data})
+
+    def add_closed_candle(self, symbol: str, timeframe: str, candle: "dict[str, float | int]") -> bool:
+        """Overrides ExchangeInterface.add_closed_candle, streamed klines are the same as REST klines"""
+        key = f"{symbol}-{timeframe}"
+        df_data = self.candle_cache.append(key, timeframe, candle)
+        if df_data is None:
+            return False
+        # Convert the time to human readable format
+        df_data["time"] = readable_time(df_data["time"])
+        # Identifies the frame for the indicators cache
+        df_data.attrs["key"] = key
+        # Update self.candlesticks
+        self.candlesticks.update({key: df_data})
+        return True
+
+    def websocket_client(self, stream_url: "str | None" = None) -> SpotWebsocketClient:
+        """Websocket client for market streams, `stream_url` overrides Binance's url"""
+        if stream_url is None:
+            stream_url = "wss://testnet.binance.vision" if self.test_mode else "wss://stream.binance.com:9443"
+        return SpotWebsocketClient(stream_url=stream_url)
 
     def create_order(
         self,
@@ -204,12 +313,7 @@ class BinanceSpot(ExchangeInterface):
         # Close all previous open positions for that symbol
         self.client.cancel_open_orders(symbol=symbol)
         # Filters
-        step_size = str_to_decimal_places(self.symbols[symbol]["step_size"])
-        tick_size = str_to_decimal_places(self.symbols[symbol]["tick_size"])
-        qty = round_float_to_str(
-            number=min(max(qty, self.symbols[symbol]["min_qty"]), self.symbols[symbol]["max_qty"]),
-            decimal_places=step_size,
-        )
+        qty = self.filters.format_qty(symbol, qty)
         # Main order arguments
         ## Type MARKET so SL and TP can be ordered rightaway
         order_kwargs = {
@@ -232,8 +336,8 @@ class BinanceSpot(ExchangeInterface):
                 "type": "STOP_LOSS_LIMIT",
                 "timeInForce": "GTC",
                 "quantity": qty,
-                "stopPrice": round_float_to_str(number=(price + sl) / 2, decimal_places=tick_size),  # Trigger
-                "price": round_float_to_str(number=sl, decimal_places=tick_size),  # SL
+                "stopPrice": self.filters.format_price(symbol, (price + sl) / 2),  # Trigger
+                "price": self.filters.format_price(symbol, sl),  # SL
             }
             sl_response = C.Style("Stop Loss: ", C.DARKCYAN) + (
                 self.place_order(response_args=["price", "stopPrice"], kwargs=sl_kwargs)
@@ -249,8 +353,8 @@ class BinanceSpot(ExchangeInterface):
                 "type": "TAKE_PROFIT_LIMIT",
                 "timeInForce": "GTC",
                 "quantity": qty,
-                "stopPrice": round_float_to_str(number=(price + tp) / 2, decimal_places=tick_size),  # Trigger
-                "price": round_float_to_str(number=tp, decimal_places=tick_size),  # TP
+                "stopPrice": self.filters.format_price(symbol, (price + tp) / 2),  # Trigger
+                "price": self.filters.format_price(symbol, tp),  # TP
             }
             tp_response = C.Style("Take Profit: ", C.DARKCYAN) + (
                 self.place_order(response_args=["price", "stopPrice"], kwargs=tp_kwargs)
@@ -0,0 +1,145 @@
+from queue import Empty, Queue
+from typing import Callable, Iterator
+from scripts.console import C, I
+from scripts.exchange import ExchangeInterface
+
+
+class KlineStream:
+    """Receives closed candles of all the symbols from Binance's combined kline streams
+
+    Parameters
+    ----------
+    `exchange`: BinanceFutures or BinanceSpot exchange
+
+    `timeframe`: candlesticks timeframe
+
+    `concurrency`: number of symbols to download simultaneously when history is needed
+
+    `stream_url`: overrides Binance's websocket url, the connector only accepts wss:// urls
+
+    `client`: optional websocket client to subscribe with (e.g. one replaying recorded klines) already started,
+    by default the exchange's websocket client
+
+    `batch_delay`: seconds without a candle close after which the closed symbols received are iterated, the ones
+    whose candlesticks must be requested are downloaded together"""
+
+    def __init__(
+        self,
+        exchange: ExchangeInterface,
+        timeframe: str,
+        concurrency: int = 8,
+        stream_url: "str | None" = None,
+        client=None,
+        batch_delay: float = 0.5,
+    ) -> None:
+        self.exchange = exchange
+        self.timeframe = timeframe
+        self.concurrency = concurrency
+        self.stream_url = stream_url
+        self.injected_client = client
+        self.batch_delay = batch_delay
+        self.client = None
+        # Symbols whose candle closed and haven't been analyzed yet
+        self.closed: "Queue[str]" = Queue()
+        # Symbols whose streamed candle couldn't be merged, so they need the REST candlesticks
+        self.stale: set[str] = set()
+        # First symbol whose candle closed, received while waiting
+        self.received: "str | None" = None
+
+    def start(self, symbols: "list[str]") -> None:
+        """Downloads candlesticks history and subscribes to the kline streams of `symbols`"""
+        # History
+        print(C.Style(f"\r{I.CLOCK} Receiving candlesticks history ... ", C.DARKCYAN), end="")
+        errors = self.exchange.get_data_for_symbols(
+            symbols=symbols, timeframe=self.timeframe, concurrency=self.concurrency
+        )
+        self.stale.update(errors.keys())
+        # Streams, the connector runs them in its own thread
+        self.client = self.injected_client
+        if self.client is None:
+            self.client = self.exchange.websocket_client(stream_url=self.stream_url)
+            self.client.daemon = True
+            self.client.start()
+        streams = [f"{symbol.lower()}@kline_{self.timeframe}" for symbol in symbols]
+        step = self.exchange.streams_per_connection
+        for n, i in enumerate(range(0, len(streams), step)):
+            self.client.live_subscribe(stream=streams[i : i + step], id=n + 1, callback=self.handle_message)
+        print(f"\r{I.CHECK} Subscribed to {len(streams)} {self.timeframe} kline streams{'':<20}")
+
+    def stop(self) -> None:
+        """Closes the streams, the connector's reactor keeps running so the stream can be started again"""
+        if self.client:
+            self.client.close()
+            self.client = None
+
+    def handle_message(self, message: dict) -> None:
+        """Callback for the websocket messages, only closed klines are processed"""
+        # Combined streams wrap the event in "data"
+        data = message.get("data", message)
+        if data.get("e") != "kline" or not data["k"]["x"]:
+            return
+        kline = data["k"]
+        symbol = data["s"]
+        candle = {
+            "time": int(kline["t"]),
+            "open": float(kline["o"]),
+            "high": float(kline["h"]),
+            "low": float(kline["l"]),
+            "close": float(kline["c"]),
+            "volume": float(kline["v"]),
+            "close_time": int(kline["T"]),
+            "quote_asset_volume": float(kline["q"]),
+            "number_of_trades": int(kline["n"]),
+            "taker_buy_base_asset_volume": float(kline["V"]),
+            "taker_buy_quote_asset_volume": float(kline["Q"]),
+        }
+        if not self.exchange.add_closed_candle(symbol=symbol, timeframe=self.timeframe, candle=candle):
+            self.stale.add(symbol)
+        self.closed.put(symbol)
+
+    def wait(self) -> None:
+        """Blocks until a candle closes"""
+        if self.received is None:
+            self.received = self.closed.get()
+
+    def closed_symbols(self, selected: "Callable[[str], bool] | None" = None, timeout: float = 2) -> Iterator[str]:
+        """Iterates the symbols as their candles close, waiting for the first close if it hasn't been received
+
+        Iteration stops once no candle has closed for `timeout` seconds
+
+        Parameters
+        ----------
+        `selected`: whether a symbol will be analyzed, the others aren't iterated and their candlesticks aren't
+        downloaded if stale, they remain stale till a scan selects them. By default all the symbols are iterated
+
+        `timeout`: seconds without a candle close after which iteration stops"""
+        self.wait()
+        batch = [self.received]
+        self.received = None
+        while batch:
+            # Candles of all the symbols close at once, so the closes arrive together
+            while True:
+                try:
+                    batch.append(self.closed.get(timeout=self.batch_delay))
+                except Empty:
+                    break
+            if selected is not None:
+                batch = [symbol for symbol in batch if selected(symbol)]
+            # Symbols whose candlesticks couldn't be updated from the stream are downloaded concurrently
+            stale = [symbol for symbol in batch if symbol in self.stale]
+            errors = {}
+            if stale:
+                self.stale.difference_update(stale)
+                errors = self.exchange.get_data_for_symbols(
+                    symbols=stale, timeframe=self.timeframe, concurrency=self.concurrency
+                )
+                self.stale.update(errors.keys())
+                for symbol, ex in errors.items():
+                    print("\r ", C.Style(I.CROSS + f" Error @ {symbol} ::", C.BOLD, C.RED), ex)
+            for symbol in batch:
+                if symbol not in errors:
+                    yield symbol
+            try:
+                batch = [self.closed.get(timeout=timeout)]
+            except Empty:
+                return
@@ -0,0 +1,107 @@
+import threading
+from scripts.exchange import ExchangeInterface
+
+
+class UserDataStream:
+    """Keeps the account, balances and positions of the exchange updated from Binance's user data stream
+
+    A REST snapshot is only requested when the stream starts, has to be restarted or its socket was reconnected,
+    since the events sent while it was disconnected are lost
+
+    Parameters
+    ----------
+    `exchange`: BinanceFutures or BinanceSpot exchange
+
+    `stream_url`: overrides Binance's websocket url, the connector only accepts wss:// urls
+
+    `keepalive`: seconds between listen key renewals, Binance expires them after 60 minutes
+
+    `client`: optional websocket client to subscribe with (e.g. one feeding recorded events) already started,
+    by default the exchange's websocket client"""
+
+    def __init__(
+        self,
+        exchange: ExchangeInterface,
+        stream_url: "str | None" = None,
+        keepalive: int = 30 * 60,
+        client=None,
+    ) -> None:
+        self.exchange = exchange
+        self.stream_url = stream_url
+        self.keepalive = keepalive
+        self.client = client
+        self.started = client is not None
+        self.listen_key = None
+        self.timer = None
+        # Whether the exchange data is being kept current by the stream
+        self.synced = False
+
+    def start(self) -> None:
+        """Requests a snapshot of the account and subscribes to its events"""
+        self.stop()
+        # Subscribe before the snapshot so no event is missed
+        self.listen_key = self.exchange.client.new_listen_key()["listenKey"]
+        if self.client is None:
+            self.client = self.exchange.websocket_client(stream_url=self.stream_url)
+        if not self.started:
+            # The connector runs the streams in its own thread
+            self.client.daemon = True
+            self.client.start()
+            self.started = True
+        self.client.user_data(listen_key=self.listen_key, id=1, callback=self.handle_message)
+        self.watch_reconnects()
+        self.exchange.query_account_data()
+        self.synced = True
+        self.schedule_keepalive()
+
+    def stop(self) -> None:
+        """Closes the subscription, the websocket client is kept to start it again"""
+        self.synced = False
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if self.client and self.listen_key:
+            self.client.stop_socket(self.listen_key)
+            self.listen_key = None
+
+    def watch_reconnects(self) -> None:
+        """Marks the data as not current each time the connector opens the subscription's socket again"""
+        factory = getattr(self.client, "factories", {}).get(self.listen_key)
+        if factory is None:
+            return
+        build_protocol = factory.buildProtocol
+        connections = 0
+
+        def build(addr):
+            nonlocal connections
+            connections += 1
+            if connections > 1:
+                # Reconnected after a drop, events sent in between are lost
+                self.synced = False
+            return build_protocol(addr)
+
+        factory.buildProtocol = build
+
+    def schedule_keepalive(self) -> None:
+        self.timer = threading.Timer(self.keepalive, self.renew)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def renew(self) -> None:
+        """Extends the validity of the listen key"""
+        try:
+            self.exchange.client.renew_listen_key(listenKey=self.listen_key)
+            self.schedule_keepalive()
+        except Exception:
+            # Events may have been lost, next account update restarts the stream
+            self.synced = False
+
+    def handle_message(self, message: dict) -> None:
+        """Callback for the websocket messages"""
+        event = message.get("data", message)
+        # Connection lost for good or listen key expired, data is no longer current
+        if event.get("e") in ("error", "listenKeyExpired"):
+            self.synced = False
+            return
+        if "e" in event:
+            self.exchange.handle_user_event(event)
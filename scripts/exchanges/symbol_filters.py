@@ -0,0 +1,98 @@
+import math
+from decimal import Decimal
+import numpy as np
+
+
+def decimal_places(value: str) -> int:
+    """Number of decimal places of a filter value (e.g. "0.00100000" -> 3)"""
+    return max(0, -Decimal(value).normalize().as_tuple().exponent)
+
+
+def quantize(values: np.ndarray, steps: np.ndarray, rounding) -> np.ndarray:
+    """Rounds values to multiples of steps, zero steps leave values unchanged"""
+    has_step = steps > 0
+    safe_steps = np.where(has_step, steps, 1)
+    # Tolerance for values that are already a multiple but lost precision as floats
+    quantized = rounding(values / safe_steps + (1e-9 if rounding is np.floor else 0)) * safe_steps
+    return np.where(has_step, quantized, values)
+
+
+class SymbolFilters:
+    """Order filters of the symbols, stored in arrays to quantize many orders at once
+
+    Parameters
+    ----------
+    `exchange_symbols`: symbols as returned in exchange_info()["symbols"]
+
+    `market_lot_size`: whether to merge MARKET_LOT_SIZE into LOT_SIZE, i.e. orders are MARKET orders"""
+
+    def __init__(self, exchange_symbols: "list[dict]", market_lot_size: bool = True) -> None:
+        count = len(exchange_symbols)
+        self.index: dict[str, int] = {}
+        self.min_qty = np.zeros(count)
+        self.max_qty = np.full(count, np.inf)
+        self.step_size = np.zeros(count)
+        self.tick_size = np.zeros(count)
+        self.qty_decimals = np.zeros(count, dtype=np.int64)
+        self.price_decimals = np.zeros(count, dtype=np.int64)
+        lot_size_filters = ("LOT_SIZE", "MARKET_LOT_SIZE") if market_lot_size else ("LOT_SIZE",)
+        for i, symbol in enumerate(exchange_symbols):
+            self.index[symbol["symbol"]] = i
+            for f in symbol["filters"]:
+                if f["filterType"] == "PRICE_FILTER":
+                    self.tick_size[i] = float(f["tickSize"])
+                    self.price_decimals[i] = decimal_places(f["tickSize"])
+                elif f["filterType"] in lot_size_filters:
+                    self.merge_lot_size(i, f)
+        # Same values as Python floats for single orders, indexing the arrays per order is slower
+        self.rules: dict[str, tuple] = dict(
+            zip(
+                self.index,
+                zip(
+                    self.min_qty.tolist(),
+                    self.max_qty.tolist(),
+                    self.step_size.tolist(),
+                    self.tick_size.tolist(),
+                    self.qty_decimals.tolist(),
+                    self.price_decimals.tolist(),
+                ),
+            )
+        )
+
+    def merge_lot_size(self, i: int, lot_size: dict) -> None:
+        """Keeps the most restrictive values of the lot size filters, zero means no restriction"""
+        self.min_qty[i] = max(self.min_qty[i], float(lot_size["minQty"]))
+        if float(lot_size["maxQty"]):
+            self.max_qty[i] = min(self.max_qty[i], float(lot_size["maxQty"]))
+        if float(lot_size["stepSize"]) > self.step_size[i]:
+            self.step_size[i] = float(lot_size["stepSize"])
+            self.qty_decimals[i] = decimal_places(lot_size["stepSize"])
+
+    def rows(self, symbols: "list[str]") -> np.ndarray:
+        return np.fromiter((self.index[symbol] for symbol in symbols), dtype=np.int64, count=len(symbols))
+
+    def quantize_qty(self, symbols: "list[str]", qty: np.ndarray) -> np.ndarray:
+        """Clamps quantities to the lot size and rounds them down to the step size"""
+        rows = self.rows(symbols)
+        qty = np.clip(np.asarray(qty, dtype=float), self.min_qty[rows], self.max_qty[rows])
+        return quantize(qty, self.step_size[rows], np.floor)
+
+    def quantize_price(self, symbols: "list[str]", price: np.ndarray) -> np.ndarray:
+        """Rounds prices to the nearest tick"""
+        rows = self.rows(symbols)
+        return quantize(np.asarray(price, dtype=float), self.tick_size[rows], np.round)
+
+    def format_qty(self, symbol: str, qty: float) -> str:
+        """Quantity of a single order as expected by the exchange"""
+        min_qty, max_qty, step_size, _, qty_decimals, _ = self.rules[symbol]
+        qty = min(max(qty, min_qty), max_qty)
+        if step_size:
+            qty = math.floor(qty / step_size + 1e-9) * step_size
+        return f"{qty:.{qty_decimals}f}"
+
+    def format_price(self, symbol: str, price: float) -> str:
+        """Price of a single order as expected by the exchange"""
+        _, _, _, tick_size, _, price_decimals = self.rules[symbol]
+        if tick_size:
+            price = round(price / tick_size) * tick_size
+        return f"{price:.{price_decimals}f}"
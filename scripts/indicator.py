@@ -1,13 +1,18 @@
+import numpy as np
 from pandas import DataFrame
-from scripts.indicators.momentum.macd import macd
-from scripts.indicators.momentum.rsi import rsi
-from scripts.indicators.momentum.stochastic import stochastic
-from scripts.indicators.trend.adx import adx
-from scripts.indicators.trend.dema import dema
-from scripts.indicators.trend.ema import ema
-from scripts.indicators.trend.sma import sma
-from scripts.indicators.volatility.atr import atr
-from scripts.indicators.volatility.bb import bb
+from scripts.indicators import kernels
+from scripts.indicators.cache import IndicatorCache
+from scripts.indicators.panel import PanelView
+from scripts.indicators import streaming
+from scripts.indicators.momentum.macd import macd, macd_lookback
+from scripts.indicators.momentum.rsi import rsi, rsi_lookback
+from scripts.indicators.momentum.stochastic import stochastic, stochastic_lookback
+from scripts.indicators.trend.adx import adx, adx_lookback
+from scripts.indicators.trend.dema import dema, dema_lookback
+from scripts.indicators.trend.ema import ema, ema_lookback
+from scripts.indicators.trend.sma import sma, sma_lookback
+from scripts.indicators.volatility.atr import atr, atr_lookback
+from scripts.indicators.volatility.bb import bb, bb_lookback
 
 
 class Direction:
@@ -49,17 +54,70 @@ class Indicator:
         TYPE_ATR: atr,
         TYPE_BB: bb,
     }
+    # Candles needed by each indicator for its last values to converge, None if it needs the whole frame
+    lookbacks = {
+        TYPE_MACD: macd_lookback,
+        TYPE_RSI: rsi_lookback,
+        TYPE_STOCH: stochastic_lookback,
+        TYPE_ADX: adx_lookback,
+        TYPE_DEMA: dema_lookback,
+        TYPE_EMA: ema_lookback,
+        TYPE_SMA: sma_lookback,
+        TYPE_ATR: atr_lookback,
+        TYPE_BB: bb_lookback,
+    }
+    stream_classes = {
+        TYPE_MACD: streaming.MacdStream,
+        TYPE_RSI: streaming.RsiStream,
+        TYPE_STOCH: streaming.StochasticStream,
+        TYPE_ADX: streaming.AdxStream,
+        TYPE_DEMA: streaming.DemaStream,
+        TYPE_EMA: streaming.EmaStream,
+        TYPE_SMA: streaming.SmaStream,
+        TYPE_ATR: streaming.AtrStream,
+        TYPE_BB: streaming.BbStream,
+    }
+    # Shared by all the indicators, so equal indicators of different signals are computed once per candle
+    cache = IndicatorCache()
+    # Running state per symbol, set with Indicator.enable_streaming()
+    streams: "streaming.IndicatorStreams | None" = None
+    # IndicatorPlan evaluating this indicator together with the others of the strategy, set by the plan
+    plan = None
 
     def __init__(self, indicator_type: str, kwargs: dict[str, "int | bool"] = None) -> None:
         self.indicator_type = indicator_type
         self.function_kwargs = kwargs
 
-    def analyze_data(self, data: DataFrame) -> "str | list[str]":
+    @classmethod
+    def enable_streaming(cls) -> None:
+        """Update the indicators with each new closed candle instead of computing them on the whole frame"""
+        if cls.streams is None:
+            cls.streams = streaming.IndicatorStreams(cls.stream_classes)
+
+    def lookback(self, tolerance: float) -> "int | None":
+        """Candles needed for the last value to be within tolerance of the one computed on the whole history,
+        None if the indicator needs the whole frame"""
+        return self.lookbacks[self.indicator_type](tolerance, **(self.function_kwargs or {}))
+
+    def analyze_data(self, data: "DataFrame | PanelView") -> "str | list[str]":
         """Execute analysis funciton
 
         Returns
         -------
         Header(s) of the resulting data in the DataFrame"""
+        if isinstance(data, PanelView):
+            # Computed once for all the symbols of the panel
+            return data.panel.analyze(self.indicator_type, self.function_kwargs, self.compute)
+        return self.cache.analyze(data, self.indicator_type, self.function_kwargs, lambda: self.compute(data))
+
+    def compute(self, data: DataFrame) -> "str | list[str]":
+        """Headers from the running state if streaming, else from the strategy's plan or the indicator function"""
+        if self.streams and self.streams.supports(self.indicator_type):
+            headers = self.streams.analyze(data, self.indicator_type, self.function_kwargs)
+            if headers is not None:
+                return headers
+        if self.plan and self.plan.supports(self):
+            return self.plan.analyze(data, self)
         f = self.functions[self.indicator_type]
         if self.function_kwargs:
             return f(data, **self.function_kwargs)
@@ -103,76 +161,162 @@ class Signal:
         self.base_limit = base_limit
         self.reverse = reverse
         self.rising = rising
+        # SignalEvaluator with the checks of this configuration, set by compile()
+        self.evaluator: "SignalEvaluator | None" = None
 
-    def emit_signal(self, data: DataFrame) -> tuple[int, str]:
+    def lookback(self, tolerance: float) -> "int | None":
+        """Candles needed for the rows read by the signal to be within tolerance of the whole history's,
+        None if an indicator needs the whole frame"""
+        lookbacks = []
+        for indicator in (self.signal_ind, self.base_ind):
+            if indicator:
+                lookback = indicator.lookback(tolerance)
+                if lookback is None:
+                    return None
+                lookbacks.append(lookback)
+        if not lookbacks:
+            return 2
+        # Base computed on the signal's indicator, e.g. EMA of MACD, starts once the signal has converged
+        base_header = (self.base_ind.function_kwargs or {}).get("header", "close") if self.base_ind else "close"
+        if self.signal_ind and base_header not in ("open", "high", "low", "close", "volume"):
+            return sum(lookbacks) + 1
+        # Last two rows are read
+        return max(lookbacks) + 1
+
+    def compile(self) -> None:
+        """Chooses the checks of the signal once, call again after changing its configuration"""
+        self.evaluator = SignalEvaluator(self)
+
+    def emit_signal(self, data: "DataFrame | PanelView") -> tuple[int, str]:
         """Emit BUY, NEUTRAL or SELL signal of the indicator(s)"""
+        if self.evaluator is None:
+            self.compile()
+        return self.evaluator.evaluate(data)
+
+    def series(self, data: DataFrame) -> np.ndarray:
+        """Direction of the signal at each candle, i.e. emit_signal of the frame up to that candle
+
+        Returns
+        -------
+        Array of BULLISH, NEUTRAL or BEARISH (int8), one per candle"""
+        if self.evaluator is None:
+            self.compile()
+        return self.evaluator.series(data)
+
+
+class SignalEvaluator:
+    """Checks of a signal chosen from its configuration, reading the last values of its columns as floats instead
+    of DataFrame rows, descriptions are only built when the signal fires
+
+    Parameters
+    ----------
+    `signal`: Signal to evaluate"""
+
+    def __init__(self, signal: Signal) -> None:
+        self.signal_ind = signal.signal_ind
+        self.signal_header = signal.signal_header
+        self.base_ind = signal.base_ind
+        self.base_header = signal.base_header
+        self.buy_limit = signal.buy_limit
+        self.sell_limit = signal.sell_limit
+        self.cross_limit = signal.cross_limit
+        self.consolidation_limit = signal.consolidation_limit
+        self.consolidation_header = signal.consolidation_header
+        # Base is the limit, price is compared with it (trend) so it buys if it's greater
+        self.limit_from_base = signal.base_limit or signal.signal_header == "close"
+        self.reverse = signal.reverse or signal.signal_header == "close"
+        # Name of the signal in descriptions
+        self.name = signal.signal_header.replace("close", "price")
+        self.is_rising = signal.rising
+        self.check = self.rising if signal.rising else self.limits
+
+    def evaluate(self, data: "DataFrame | PanelView") -> tuple[int, str]:
         # Update signal data
         if self.signal_ind:
             self.signal_ind.analyze_data(data)
-        if self.base_limit or self.signal_header == "close":
-            # Analyze base indicator
+        if self.limit_from_base:
             self.base_ind.analyze_data(data)
-            # Set base as limit
-            self.buy_limit = self.sell_limit = data.iloc[-1][self.base_header]
-            # Buy if price is greater than ema (trend), sell otherwise
-            if self.signal_header == "close":
-                self.reverse = True
-        current_signal = data.iloc[-1][self.signal_header].item()
-        direction = Direction.NEUTRAL
-        description = None
+        signal = kernels.column(data, self.signal_header)
         # Consolidation
         if self.consolidation_limit is not None:
-            if data.iloc[-1][self.consolidation_header].item() < self.consolidation_limit:
-                return direction, description
-        # Rising
-        if self.rising:
-            prev_signal = data.iloc[-2][self.signal_header].item()
-            if current_signal > prev_signal and not self.reverse:
-                direction = Direction.BULLISH
-                description = "{signal} rising".format(
-                    signal=self.signal_header.replace("close", "price"),
-                )
-            if current_signal < prev_signal and self.reverse:
-                direction = Direction.BEARISH
-                description = "{signal} falling".format(
-                    signal=self.signal_header.replace("close", "price"),
-                )
-            return direction, description
+            if kernels.column(data, self.consolidation_header)[-1] < self.consolidation_limit:
+                return Direction.NEUTRAL, None
+        return self.check(data, signal)
+
+    def series(self, data: DataFrame) -> np.ndarray:
+        """Same checks on every candle at once, each candle compared with the previous one"""
+        if self.signal_ind:
+            self.signal_ind.analyze_data(data)
+        if self.base_ind and self.base_header:
+            self.base_ind.analyze_data(data)
+        current = kernels.column(data, self.signal_header)
+        # First candle has no previous one, so it doesn't rise nor cross
+        previous = kernels.shift(current)
+        if self.is_rising:
+            conditions = [(current > previous) & (not self.reverse), (current < previous) & self.reverse]
+            directions = [Direction.BULLISH, Direction.BEARISH]
+        else:
+            # Buy/Sell limits
+            if self.limit_from_base:
+                buy_limit = sell_limit = kernels.column(data, self.base_header)
+            else:
+                buy_limit, sell_limit = self.buy_limit, self.sell_limit
+            conditions = [
+                np.zeros(len(current), dtype=bool) if limit is None else current > limit if greater else current < limit
+                for limit, greater in ((buy_limit, self.reverse), (sell_limit, not self.reverse))
+            ]
+            directions = [Direction.BULLISH, Direction.BEARISH]
+            crossed_up = Direction.BEARISH if self.reverse else Direction.BULLISH
+            # Check if crosses limit
+            if self.cross_limit is not None:
+                conditions += [
+                    (previous <= self.cross_limit) & (current > self.cross_limit),
+                    (previous >= self.cross_limit) & (current < self.cross_limit),
+                ]
+                directions += [crossed_up, -crossed_up]
+            # Check if crosses base
+            elif self.base_header:
+                base = kernels.column(data, self.base_header)
+                previous_base = kernels.shift(base)
+                conditions += [
+                    (previous <= previous_base) & (current > base),
+                    (previous >= previous_base) & (current < base),
+                ]
+                directions += [crossed_up, -crossed_up]
+        # First condition met by each candle
+        series = np.select(conditions, directions, Direction.NEUTRAL).astype(np.int8)
+        # Consolidation
+        if self.consolidation_limit is not None:
+            series[kernels.column(data, self.consolidation_header) < self.consolidation_limit] = Direction.NEUTRAL
+        return series
+
+    def rising(self, data: "DataFrame | PanelView", signal: np.ndarray) -> tuple[int, str]:
+        if signal[-1] > signal[-2] and not self.reverse:
+            return Direction.BULLISH, f"{self.name} rising"
+        if signal[-1] < signal[-2] and self.reverse:
+            return Direction.BEARISH, f"{self.name} falling"
+        return Direction.NEUTRAL, None
+
+    def limits(self, data: "DataFrame | PanelView", signal: np.ndarray) -> tuple[int, str]:
+        current_signal = signal[-1]
         # Buy/Sell limits
+        if self.limit_from_base:
+            buy_limit = sell_limit = kernels.column(data, self.base_header)[-1]
+        else:
+            buy_limit, sell_limit = self.buy_limit, self.sell_limit
         if self.reverse:
-            if self.buy_limit is not None and current_signal > self.buy_limit:
-                direction = Direction.BULLISH
-                description = "{signal} > {limit}".format(
-                    signal=self.signal_header.replace("close", "price"),
-                    limit=self.base_header if self.base_header else self.buy_limit,
-                )
-                return direction, description
-            if self.sell_limit is not None and current_signal < self.sell_limit:
-                direction = Direction.BEARISH
-                description = "{signal} < {limit}".format(
-                    signal=self.signal_header.replace("close", "price"),
-                    limit=self.base_header if self.base_header else self.sell_limit,
-                )
-                return direction, description
+            if buy_limit is not None and current_signal > buy_limit:
+                return Direction.BULLISH, f"{self.name} > {self.base_header or buy_limit}"
+            if sell_limit is not None and current_signal < sell_limit:
+                return Direction.BEARISH, f"{self.name} < {self.base_header or sell_limit}"
         else:
-            if self.buy_limit is not None and current_signal < self.buy_limit:
-                direction = Direction.BULLISH
-                description = "{signal} < {limit}".format(
-                    signal=self.signal_header.replace("close", "price"),
-                    limit=self.base_header if self.base_header else self.buy_limit,
-                )
-                return direction, description
-            if self.sell_limit is not None and current_signal > self.sell_limit:
-                direction = Direction.BEARISH
-                description = "{signal} > {limit}".format(
-                    signal=self.signal_header.replace("close", "price"),
-                    limit=self.base_header if self.base_header else self.sell_limit,
-                )
-                return direction, description
+            if buy_limit is not None and current_signal < buy_limit:
+                return Direction.BULLISH, f"{self.name} < {self.base_header or buy_limit}"
+            if sell_limit is not None and current_signal > sell_limit:
+                return Direction.BEARISH, f"{self.name} > {self.base_header or sell_limit}"
         # Check if crosses limit
         if self.cross_limit is not None:
-            # Get last values
-            last_signal = data.iloc[-2][self.signal_header].item()
+            last_signal = signal[-2]
             # BUY signal if crosses upwards
             if last_signal <= self.cross_limit and current_signal > self.cross_limit:
                 return (
@@ -189,21 +333,30 @@ class Signal:
         elif self.base_header:
             # Analyze base indicator
             self.base_ind.analyze_data(data)
-            # Get last values
-            last_signal = data.iloc[-2][self.signal_header].item()
-            last_base = data.iloc[-2][self.base_header].item()
-            current_base = data.iloc[-1][self.base_header].item()
+            base = kernels.column(data, self.base_header)
+            last_signal = signal[-2]
             # BUY signal if crosses upwards
-            if last_signal <= last_base and current_signal > current_base:
+            if last_signal <= base[-2] and current_signal > base[-1]:
                 return (
                     Direction.BEARISH if self.reverse else Direction.BULLISH,
                     f"{self.signal_header} crossed up {self.base_header}",
                 )
             # SELL signal if crosses downwards
-            if last_signal >= last_base and current_signal < current_base:
+            if last_signal >= base[-2] and current_signal < base[-1]:
                 return (
                     Direction.BULLISH if self.reverse else Direction.BEARISH,
                     f"{self.signal_header} crossed down {self.base_header}",
                 )
         # NEUTRAL if no signals were emitted
-        return direction, description
+        return Direction.NEUTRAL, None
+
+
+def signals_lookback(signals: list, tolerance: float, risk_reward_ind: "Indicator | float" = None) -> "int | None":
+    """Candles needed by all the signals (and the risk reward indicator) for the rows they read to be within
+    tolerance of the ones computed on the whole history, None if any of them needs the whole frame"""
+    lookbacks = [signal.lookback(tolerance) for signal in signals]
+    if isinstance(risk_reward_ind, Indicator):
+        lookbacks.append(risk_reward_ind.lookback(tolerance))
+    if not lookbacks or None in lookbacks:
+        return None
+    return max(lookbacks)
@@ -0,0 +1,659 @@
+"""Parity and speed of the indicator functions against their former pandas implementations, of the rolling window
+primitives against pandas' rolling, of the streamed indicators against the indicator functions, tolerance of the
+indicators computed on their lookback only, of the swing tracker against scipy's argrelextrema in divergences, of
+the compiled signal evaluator against reading DataFrame rows, of the signal series against the signal of each
+candle, of the backtest's replay against checking the signals at each candle close, and of the parameter sweep
+against backtesting each point
+
+Run with: python -m scripts.indicators.benchmark"""
+
+import os
+import tempfile
+import time
+import numpy as np
+from pandas import DataFrame
+from scipy.signal import argrelextrema
+from scripts.candles.store import CandleStore
+from scripts.exchanges.backtest import BacktestExchange
+from scripts.indicator import Direction, Indicator, Signal
+from scripts.indicators import rolling
+from scripts.indicators.streaming import IndicatorStreams
+from scripts.indicators.trend.divergence import DivergenceSignal
+from scripts.examples.stochastic_ma import StochasticMaStrategy
+from scripts.markets.backtest import Backtest
+from scripts.markets.futures import FuturesStrategy
+from scripts.markets.sweep import ParameterSweep, apply_parameters
+
+
+def reference_ema(data: DataFrame, periods: int, header: str = "close") -> DataFrame:
+    return DataFrame({f"ema({periods})": data[header].ewm(span=periods, adjust=False).mean()})
+
+
+def reference_dema(data: DataFrame, periods: int) -> DataFrame:
+    ema = data["close"].ewm(span=periods, adjust=False).mean()
+    return DataFrame({f"dema({periods})": ema.ewm(span=periods, adjust=False).mean()})
+
+
+def reference_sma(data: DataFrame, periods: int) -> DataFrame:
+    return DataFrame({f"sma({periods})": data["close"].rolling(periods).mean()})
+
+
+def reference_macd(data: DataFrame, short_term: int = 12, long_term: int = 26, signal: int = 9) -> DataFrame:
+    short_ema = data["close"].ewm(span=short_term, adjust=False).mean()
+    long_ema = data["close"].ewm(span=long_term, adjust=False).mean()
+    macd_line = short_ema - long_ema
+    signal_line = macd_line.ewm(span=signal, adjust=False).mean()
+    histogram = macd_line - signal_line
+    return DataFrame(
+        {
+            f"macd({short_term}/{long_term})": macd_line,
+            f"macd-s({short_term}/{long_term}/{signal})": signal_line,
+            f"macd-h({short_term}/{long_term}/{signal})": histogram,
+            f"macd-ma({short_term}/{long_term}/{signal})": histogram.rolling(signal).mean(),
+        }
+    )
+
+
+def reference_rsi(data: DataFrame, periods: int = 14) -> DataFrame:
+    u = (data["close"] - data["close"].shift(1)).clip(lower=0)
+    d = (data["close"].shift(1) - data["close"]).clip(lower=0)
+    rs = u.ewm(span=periods, adjust=False).mean() / d.ewm(span=periods, adjust=False).mean()
+    return DataFrame({f"rsi({periods})": rs.apply(lambda val: 100 - (100 / (1 + val)))})
+
+
+def reference_stochastic(data: DataFrame, periods: int = 14, slow_periods: int = 3) -> DataFrame:
+    low = data["low"].rolling(periods).min()
+    high = data["high"].rolling(periods).max()
+    fast = (data["close"] - low) / (high - low) * 100
+    slow = fast.ewm(span=slow_periods, adjust=False).mean()
+    return DataFrame({f"stoch-k({periods})": fast, f"stoch-d({periods})": slow, f"stoch-diff({periods})": fast - slow})
+
+
+def reference_atr(data: DataFrame, periods: int = 14) -> DataFrame:
+    tr = data[["close", "high", "low"]].apply(
+        lambda row: max(row["high"] - row["low"], abs(row["high"] - row["close"]), abs(row["low"] - row["close"])),
+        axis=1,
+    )
+    return DataFrame({f"atr({periods})": tr.rolling(periods).mean()})
+
+
+def reference_adx(data: DataFrame, periods: int = 14) -> DataFrame:
+    plus_dm = (data["high"] - data["high"].shift(1)).clip(lower=0)
+    minus_dm = (data["low"].shift(1) - data["low"]).clip(lower=0)
+    ema_plus_dm = plus_dm.ewm(span=periods, adjust=False).mean()
+    ema_minus_dm = minus_dm.ewm(span=periods, adjust=False).mean()
+    atr = reference_atr(data, periods)[f"atr({periods})"]
+    plus_di = (ema_plus_dm / atr).mul(100)
+    minus_di = (ema_minus_dm / atr).mul(100)
+    di = ((plus_di - minus_di).abs() / (plus_di + minus_di).abs()).mul(100)
+    return DataFrame(
+        {
+            f"-di({periods})": minus_di,
+            f"adx({periods})": di.rolling(periods).mean(),
+            f"+di({periods})": plus_di,
+            f"adx-diff({periods})": plus_di - minus_di,
+        }
+    )
+
+
+def reference_bb(data: DataFrame, periods: int = 20, std_count: int = 2) -> DataFrame:
+    middle = data["close"].rolling(periods).mean()
+    std = std_count * data["close"].rolling(periods).std()
+    return DataFrame(
+        {f"bb-l({periods})": middle.sub(std), f"bb-m({periods})": middle, f"bb-u({periods})": middle.add(std)}
+    )
+
+
+def reference_emit_signal(signal: Signal, data: DataFrame) -> "tuple[int, str]":
+    """Signal.emit_signal reading DataFrame rows, with the limits and reverse it set on the signal kept local"""
+    if signal.signal_ind:
+        signal.signal_ind.analyze_data(data)
+    buy_limit, sell_limit, reverse = signal.buy_limit, signal.sell_limit, signal.reverse
+    if signal.base_limit or signal.signal_header == "close":
+        signal.base_ind.analyze_data(data)
+        buy_limit = sell_limit = data.iloc[-1][signal.base_header]
+        if signal.signal_header == "close":
+            reverse = True
+    current_signal = data.iloc[-1][signal.signal_header].item()
+    name = signal.signal_header.replace("close", "price")
+    if signal.consolidation_limit is not None:
+        if data.iloc[-1][signal.consolidation_header].item() < signal.consolidation_limit:
+            return Direction.NEUTRAL, None
+    if signal.rising:
+        prev_signal = data.iloc[-2][signal.signal_header].item()
+        if current_signal > prev_signal and not reverse:
+            return Direction.BULLISH, "{signal} rising".format(signal=name)
+        if current_signal < prev_signal and reverse:
+            return Direction.BEARISH, "{signal} falling".format(signal=name)
+        return Direction.NEUTRAL, None
+    if reverse:
+        if buy_limit is not None and current_signal > buy_limit:
+            return Direction.BULLISH, "{signal} > {limit}".format(signal=name, limit=signal.base_header or buy_limit)
+        if sell_limit is not None and current_signal < sell_limit:
+            return Direction.BEARISH, "{signal} < {limit}".format(signal=name, limit=signal.base_header or sell_limit)
+    else:
+        if buy_limit is not None and current_signal < buy_limit:
+            return Direction.BULLISH, "{signal} < {limit}".format(signal=name, limit=signal.base_header or buy_limit)
+        if sell_limit is not None and current_signal > sell_limit:
+            return Direction.BEARISH, "{signal} > {limit}".format(signal=name, limit=signal.base_header or sell_limit)
+    if signal.cross_limit is not None:
+        last_signal = data.iloc[-2][signal.signal_header].item()
+        if last_signal <= signal.cross_limit and current_signal > signal.cross_limit:
+            return (
+                Direction.BEARISH if reverse else Direction.BULLISH,
+                f"{signal.signal_header} crossed up {signal.cross_limit}",
+            )
+        if last_signal >= signal.cross_limit and current_signal < signal.cross_limit:
+            return (
+                Direction.BULLISH if reverse else Direction.BEARISH,
+                f"{signal.signal_header} crossed down {signal.cross_limit}",
+            )
+    elif signal.base_header:
+        signal.base_ind.analyze_data(data)
+        last_signal = data.iloc[-2][signal.signal_header].item()
+        last_base = data.iloc[-2][signal.base_header].item()
+        current_base = data.iloc[-1][signal.base_header].item()
+        if last_signal <= last_base and current_signal > current_base:
+            return (
+                Direction.BEARISH if reverse else Direction.BULLISH,
+                f"{signal.signal_header} crossed up {signal.base_header}",
+            )
+        if last_signal >= last_base and current_signal < current_base:
+            return (
+                Direction.BULLISH if reverse else Direction.BEARISH,
+                f"{signal.signal_header} crossed down {signal.base_header}",
+            )
+    return Direction.NEUTRAL, None
+
+
+def reference_hl(array: np.ndarray) -> "dict[str, bool]":
+    high_indices = argrelextrema(array, np.greater, order=5)[0]
+    low_indices = argrelextrema(array, np.less, order=5)[0]
+    highs = [array[h] for h in high_indices]
+    lows = [array[l] for l in low_indices]
+    hh = lh = hl = ll = False
+    if len(highs) > 1:
+        hh = highs[-1] == max(highs)
+        lh = highs[-1] == min(highs)
+    if len(lows) > 1:
+        hl = lows[-1] == max(lows)
+        ll = lows[-1] == min(lows)
+    return {"higher_highs": hh, "higher_lows": hl, "lower_highs": lh, "lower_lows": ll}
+
+
+def reference_divergence(signal: DivergenceSignal, data: DataFrame) -> "tuple[int, str]":
+    signal.indicator.analyze_data(data)
+    indicator_hl = reference_hl(data.tail(n=signal.periods)[signal.indicator_header].to_numpy(dtype=float))
+    price_hl = reference_hl(data.tail(n=signal.periods)[signal.price_header].to_numpy(dtype=float))
+    return signal.divergence(price_hl=price_hl, indicator_hl=indicator_hl)
+
+
+REFERENCES = {
+    Indicator.TYPE_MACD: reference_macd,
+    Indicator.TYPE_RSI: reference_rsi,
+    Indicator.TYPE_STOCH: reference_stochastic,
+    Indicator.TYPE_ADX: reference_adx,
+    Indicator.TYPE_DEMA: reference_dema,
+    Indicator.TYPE_EMA: reference_ema,
+    Indicator.TYPE_SMA: reference_sma,
+    Indicator.TYPE_ATR: reference_atr,
+    Indicator.TYPE_BB: reference_bb,
+}
+KWARGS = {
+    Indicator.TYPE_DEMA: {"periods": 20},
+    Indicator.TYPE_EMA: {"periods": 20},
+    Indicator.TYPE_SMA: {"periods": 20},
+}
+
+
+def random_candles(count: int, seed: int = 0) -> DataFrame:
+    """Random walk candles"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    spread = close * rng.uniform(0, 0.01, (2, count))
+    return DataFrame({"close": close, "high": close + spread[0], "low": close - spread[1]})
+
+
+def random_klines(count: int, seed: int = 0, start: int = 1_700_000_000_000) -> DataFrame:
+    """Random walk 15m candles with all the kline columns"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, count)))
+    open = np.concatenate([close[:1], close[:-1]])
+    times = start + np.arange(count) * 900_000
+    volume = rng.uniform(1, 100, count)
+    return DataFrame(
+        {
+            "time": times,
+            "open": open,
+            "high": np.maximum(open, close) * (1 + rng.uniform(0, 0.004, count)),
+            "low": np.minimum(open, close) * (1 - rng.uniform(0, 0.004, count)),
+            "close": close,
+            "volume": volume,
+            "close_time": times + 899_999,
+            "quote_asset_volume": volume * close,
+            "number_of_trades": np.ones(count, dtype=np.int64),
+            "taker_buy_base_asset_volume": volume / 2,
+            "taker_buy_quote_asset_volume": volume * close / 2,
+        }
+    )
+
+
+def reference_replay(backtest: Backtest) -> "list[dict]":
+    """Trades of checking the signals on the frame of each symbol at each candle close, as check_signals does"""
+    strategy, exchange = backtest.strategy, backtest.exchange
+    exchange.reset()
+    frames = {symbol: exchange.history(symbol) for symbol in exchange.symbols}
+    signal_weight = 1 / len(strategy.signals)
+    for close_time in exchange.times():
+        exchange.advance(int(close_time))
+        exchange.update_account_data()
+        for symbol, frame in frames.items():
+            end = exchange.candle_index(symbol)
+            if symbol in exchange.open_trades or end < backtest.warmup:
+                continue
+            candles = frame.iloc[: end + 1].copy()
+            avg_signal = 0
+            for signal in strategy.signals:
+                avg_signal += signal.emit_signal(candles)[0] * signal_weight
+            if abs(avg_signal) >= strategy.min_signals_percentage:
+                exchange.get_data_from_exchange(symbol, strategy.timeframe)
+                strategy.place_order(
+                    symbol=symbol,
+                    mark_price=float(candles["close"].iat[-1]),
+                    direction=Direction.BULLISH if avg_signal > 0 else Direction.BEARISH,
+                )
+    exchange.advance(np.iinfo(np.int64).max)
+    return exchange.trades
+
+
+def timed(f, repeat: int) -> float:
+    """Best time of `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def max_difference(expected: DataFrame, data: DataFrame, headers: "list[str]") -> float:
+    """Max difference relative to the expected values, NaNs must match too"""
+    diff = 0.0
+    for header in headers:
+        a = expected[header].to_numpy()
+        b = data[header].to_numpy()
+        assert np.array_equal(np.isnan(a), np.isnan(b)), f"{header}: NaNs differ"
+        both = ~np.isnan(a)
+        if both.any():
+            diff = max(diff, float(np.max(np.abs(a[both] - b[both]) / np.maximum(np.abs(a[both]), 1))))
+    return diff
+
+
+def rolling_windows(counts: "tuple[int, ...]" = (1_000, 10_000, 100_000), periods: "tuple[int, ...]" = (3, 9, 14, 20)):
+    """Rolling window primitives, batch and streamed, against pandas' rolling at the indicators' window sizes
+
+    Both are compared with each window reduced on its own, pandas' running sums drift on long frames"""
+    print(
+        f"\n{'Rolling':<24}{'Candles':>10}{'pandas':>12}{'numpy':>12}{'Speedup':>10}"
+        f"{'pandas diff':>12}{'numpy diff':>12}{'stream diff':>12}"
+    )
+    primitives = {
+        "mean": (rolling.mean, lambda r: r.mean(), lambda w: w.mean(axis=-1)),
+        "std": (rolling.std, lambda r: r.std(), lambda w: w.std(axis=-1, ddof=1)),
+        "min": (rolling.minimum, lambda r: r.min(), lambda w: w.min(axis=-1)),
+        "max": (rolling.maximum, lambda r: r.max(), lambda w: w.max(axis=-1)),
+    }
+    streams = {
+        "mean": lambda p: rolling.RollingStats(p).update,
+        "std": lambda p: (lambda state: lambda x: (state.update(x), state.std())[1])(rolling.RollingStats(p)),
+        "min": lambda p: rolling.RollingExtreme(p, maximum=False).update,
+        "max": lambda p: rolling.RollingExtreme(p, maximum=True).update,
+    }
+    for count in counts:
+        close = random_candles(count)["close"]
+        values = close.to_numpy()
+        repeat = 5 if count < 100_000 else 2
+        for name, (f, reference, exact) in primitives.items():
+            for p in periods:
+                expected = DataFrame({name: rolling.pad(exact(rolling.windows(values, p)), p)})
+                pandas_diff = max_difference(expected, DataFrame({name: reference(close.rolling(p))}), [name])
+                numpy_diff = max_difference(expected, DataFrame({name: f(values, p)}), [name])
+                # Streamed values of the first 10k candles
+                update = streams[name](p)
+                streamed = DataFrame({name: [update(x) for x in values[:10_000]]})
+                stream_diff = max_difference(expected.iloc[:10_000], streamed, [name])
+                pandas_time = timed(lambda: reference(close.rolling(p)), repeat)
+                numpy_time = timed(lambda: f(values, p), repeat)
+                print(
+                    f"{f'{name}({p})':<24}{count:>10}{pandas_time * 1000:>10.2f}ms{numpy_time * 1000:>10.2f}ms"
+                    f"{pandas_time / numpy_time:>9.1f}x{pandas_diff:>12.1e}{numpy_diff:>12.1e}{stream_diff:>12.1e}"
+                )
+                assert max(numpy_diff, stream_diff) < 1e-9, f"{name}({p}): values differ"
+
+
+def streaming(frame_size: int = 1_000, new_candles: int = 500) -> None:
+    """Streams `new_candles` closed candles into a frame of `frame_size` candles, comparing the streamed candles
+    with the indicator functions computed on the whole frame, which differ while the averages started at the
+    frame's first candle haven't converged (tests/test_streaming.py checks them against the whole history)"""
+    print(
+        f"\n{'Indicator':<24}{'Candles':>10}{'batch':>12}{'streamed':>12}{'Speedup':>10}{'Frame diff':>12}"
+        f"{'columns':>12}"
+    )
+    candles = random_candles(frame_size + new_candles)
+    candles["time"] = np.arange(len(candles))
+    for indicator_type in REFERENCES:
+        kwargs = KWARGS.get(indicator_type, {})
+        f = Indicator.functions[indicator_type]
+        streams = IndicatorStreams(Indicator.stream_classes)
+        frame = candles.iloc[:frame_size].copy()
+        frame.attrs["key"] = "BENCHMARK"
+        streams.analyze(frame, indicator_type, kwargs)
+        update_time = batch_time = columns_time = diff = 0.0
+        for end in range(frame_size + 1, len(candles) + 1):
+            frame = candles.iloc[end - frame_size : end].copy()
+            frame.attrs["key"] = "BENCHMARK"
+            start = time.perf_counter()
+            headers = streams.analyze(frame, indicator_type, kwargs)
+            update_time += time.perf_counter() - start
+            # Adding the columns to the DataFrame, which copies them, is most of the streamed time
+            columns = [frame[header].to_numpy() for header in headers]
+            bare = frame.drop(columns=headers)
+            start = time.perf_counter()
+            for header, values in zip(headers, columns):
+                bare[header] = values
+            columns_time += time.perf_counter() - start
+            expected = candles.iloc[end - frame_size : end].copy()
+            start = time.perf_counter()
+            f(expected, **kwargs)
+            batch_time += time.perf_counter() - start
+            # Values of the streamed candle, the ones before it were computed when it was the last one
+            diff = max(diff, max_difference(expected.iloc[-1:], frame.iloc[-1:], headers))
+        print(
+            f"{indicator_type:<24}{frame_size:>10}{batch_time / new_candles * 1e6:>10.1f}us"
+            f"{update_time / new_candles * 1e6:>10.1f}us{batch_time / update_time:>9.1f}x{diff:>12.1e}"
+            f"{columns_time / new_candles * 1e6:>10.1f}us"
+        )
+
+
+def tail_tolerance(tolerance: float = 1e-4, frame_size: int = 1_000, frames: int = 50) -> None:
+    """Computes each indicator on the whole frame and on its lookback only, comparing the last two rows"""
+    print(
+        f"\n{'Indicator':<24}{'Lookback':>10}{'full':>12}{'tail':>12}{'Speedup':>10}{'Max diff':>12}{'Tolerance':>11}"
+    )
+    for indicator_type in REFERENCES:
+        indicator = Indicator(indicator_type, KWARGS.get(indicator_type))
+        lookback = indicator.lookback(tolerance)
+        if lookback is None:
+            print(f"{indicator_type:<24}{'whole frame':>10}")
+            continue
+        # Signals read the last two rows
+        rows = lookback + 1
+        diff = full_time = tail_time = 0.0
+        for seed in range(frames):
+            candles = random_candles(frame_size, seed)
+            full = candles.copy()
+            start = time.perf_counter()
+            headers = indicator.compute(full)
+            full_time += time.perf_counter() - start
+            tail = candles.tail(rows).copy()
+            start = time.perf_counter()
+            indicator.compute(tail)
+            tail_time += time.perf_counter() - start
+            for header in [headers] if isinstance(headers, str) else headers:
+                a = full[header].to_numpy()[-2:]
+                b = tail[header].to_numpy()[-2:]
+                diff = max(diff, float(np.max(np.abs(a - b) / np.maximum(np.abs(a), 1))))
+        print(
+            f"{indicator_type:<24}{rows:>10}{full_time / frames * 1e6:>10.1f}us{tail_time / frames * 1e6:>10.1f}us"
+            f"{full_time / tail_time:>9.1f}x{diff:>12.1e}{'ok' if diff <= tolerance else 'exceeded':>11}"
+        )
+
+
+def divergences(frame_size: int = 1_000, new_candles: int = 500, symbols: int = 10) -> None:
+    """Streams closed candles into frames, comparing the RSI divergences of the swing tracker with argrelextrema"""
+    print(f"\n{'Divergence':<24}{'Signals':>10}{'scipy':>12}{'tracker':>12}{'Speedup':>10}{'Mismatches':>12}")
+    scipy_time = tracker_time = 0.0
+    signals = mismatches = 0
+    for seed in range(symbols):
+        candles = random_candles(frame_size + new_candles, seed)
+        candles["time"] = np.arange(len(candles))
+        signal = DivergenceSignal(indicator=Indicator(Indicator.TYPE_RSI, {"periods": 14}), indicator_header="rsi(14)")
+        for end in range(frame_size, len(candles) + 1):
+            frame = candles.iloc[end - frame_size : end].copy()
+            frame.attrs["key"] = f"BENCHMARK{seed}"
+            # Indicator is computed before timing the signals
+            signal.indicator.analyze_data(frame)
+            start = time.perf_counter()
+            expected = reference_divergence(signal, frame)
+            scipy_time += time.perf_counter() - start
+            start = time.perf_counter()
+            result = signal.emit_signal(frame)
+            tracker_time += time.perf_counter() - start
+            signals += result[0] != 0
+            mismatches += result != expected
+    count = symbols * (new_candles + 1)
+    print(
+        f"{'RSI(14) @ 50':<24}{signals:>10}{scipy_time / count * 1e6:>10.1f}us{tracker_time / count * 1e6:>10.1f}us"
+        f"{scipy_time / tracker_time:>9.1f}x{mismatches:>12}"
+    )
+    assert mismatches == 0, "Divergences differ"
+
+
+def signal_configurations() -> "dict[str, dict]":
+    """Signal kwargs of the examples' kinds of checks"""
+    macd = Indicator(Indicator.TYPE_MACD)
+    rsi = Indicator(Indicator.TYPE_RSI)
+    stochastic = Indicator(Indicator.TYPE_STOCH)
+    dema = Indicator(Indicator.TYPE_DEMA, {"periods": 20})
+    return {
+        "RSI limits": dict(signal_ind=rsi, signal_header="rsi(14)", buy_limit=40, sell_limit=60),
+        "MACD-h crosses 0": dict(signal_ind=macd, signal_header="macd-h(12/26/9)", cross_limit=0),
+        "MACD-s crosses MA": dict(
+            signal_ind=macd, signal_header="macd-s(12/26/9)", base_ind=macd, base_header="macd-ma(12/26/9)"
+        ),
+        "MACD-s base limit": dict(
+            signal_ind=macd,
+            signal_header="macd-s(12/26/9)",
+            base_ind=macd,
+            base_header="macd-ma(12/26/9)",
+            base_limit=True,
+        ),
+        "Price over DEMA": dict(signal_ind=None, signal_header="close", base_ind=dema, base_header="dema(20)"),
+        "Stoch-k rising": dict(
+            signal_ind=stochastic,
+            signal_header="stoch-k(14)",
+            rising=True,
+            consolidation_limit=5,
+            consolidation_header="stoch-diff(14)",
+        ),
+    }
+
+
+def signal_evaluation(frame_size: int = 1_000, candles: int = 500) -> None:
+    """emit_signal calls per second reading DataFrame rows and with the compiled evaluator, on frames whose
+    indicators are already cached, as in a scan with several signals sharing their indicators"""
+    print(f"\n{'Signal':<24}{'Signals':>10}{'rows':>12}{'compiled':>12}{'Speedup':>10}{'Mismatches':>12}")
+    configurations = signal_configurations()
+    data = random_candles(frame_size + candles)
+    data["time"] = np.arange(len(data))
+    frames = []
+    for end in range(frame_size, len(data)):
+        frame = data.iloc[end - frame_size : end].copy()
+        frame.attrs["key"] = "BENCHMARK"
+        frames.append(frame)
+    total_rows = total_compiled = 0.0
+    for name, kwargs in configurations.items():
+        signal = Signal(**kwargs)
+        signal.compile()
+        rows_time = compiled_time = 0.0
+        signals = mismatches = 0
+        for frame in frames:
+            # Indicators are cached before timing the signals
+            expected = reference_emit_signal(signal, frame)
+            start = time.perf_counter()
+            reference_emit_signal(signal, frame)
+            rows_time += time.perf_counter() - start
+            start = time.perf_counter()
+            result = signal.emit_signal(frame)
+            compiled_time += time.perf_counter() - start
+            signals += result[0] != 0
+            mismatches += result != expected
+        total_rows += rows_time
+        total_compiled += compiled_time
+        print(
+            f"{name:<24}{signals:>10}{len(frames) / rows_time:>10.0f}/s{len(frames) / compiled_time:>10.0f}/s"
+            f"{rows_time / compiled_time:>9.1f}x{mismatches:>12}"
+        )
+        assert mismatches == 0, f"{name}: signals differ"
+    count = len(frames) * len(configurations)
+    print(
+        f"{'All':<24}{'':>10}{count / total_rows:>10.0f}/s{count / total_compiled:>10.0f}/s"
+        f"{total_rows / total_compiled:>9.1f}x"
+    )
+
+
+def signal_series(candles: int = 1_000, history: int = 35_040) -> None:
+    """Direction at each candle from the vectorized series against calling emit_signal on each candle's frame, and
+    the time of the series on a year of 15m candles"""
+    print(f"\n{'Signal':<24}{'Candles':>10}{'loop':>12}{'series':>12}{'Speedup':>10}{'Mismatches':>12}{'1 year':>12}")
+    signals = {name: Signal(**kwargs) for name, kwargs in signal_configurations().items()}
+    rsi = Indicator(Indicator.TYPE_RSI)
+    signals["RSI divergence"] = DivergenceSignal(indicator=rsi, indicator_header="rsi(14)")
+    signals["RSI divergence (20, 50)"] = DivergenceSignal(indicator=rsi, indicator_header="rsi(14)", periods=[20, 50])
+    data = random_candles(candles)
+    year = random_candles(history)
+    for name, signal in signals.items():
+        start = time.perf_counter()
+        # First candle has no previous one to compare with
+        expected = [signal.emit_signal(data.iloc[: end + 1].copy())[0] for end in range(1, candles)]
+        loop_time = time.perf_counter() - start
+        start = time.perf_counter()
+        series = signal.series(data.copy())
+        series_time = time.perf_counter() - start
+        mismatches = int(np.sum(series[1:] != expected))
+        year_time = timed(lambda: signal.series(year.copy()), 3)
+        print(
+            f"{name:<24}{candles:>10}{loop_time * 1000:>10.1f}ms{series_time * 1000:>10.2f}ms"
+            f"{loop_time / series_time:>9.0f}x{mismatches:>12}{year_time * 1000:>10.2f}ms"
+        )
+        assert mismatches == 0, f"{name}: series differs"
+
+
+def backtest_replay(symbols: int = 3, candles: int = 1_500, history: int = 35_040) -> None:
+    """Trades of the backtest against checking the signals at each candle close, and the time to replay a year of
+    15m candles of each symbol"""
+    print(f"\n{'Backtest':<24}{'Candles':>10}{'loop':>12}{'replay':>12}{'Speedup':>10}{'Trades':>12}{'1 year':>12}")
+    signals = signal_configurations()
+    with tempfile.TemporaryDirectory() as path:
+        stores = {"replay": CandleStore(os.path.join(path, "replay")), "year": CandleStore(os.path.join(path, "year"))}
+        for n in range(symbols):
+            stores["replay"].append(f"SYM{n}USDT-15m", random_klines(candles, seed=n))
+            stores["year"].append(f"SYM{n}USDT-15m", random_klines(history, seed=n))
+        for trailing_stop in (False, True):
+            name = "trailing stop" if trailing_stop else "stop loss + take profit"
+            strategy = FuturesStrategy(
+                name=name,
+                exchange=BacktestExchange(stores["replay"].path, quote_asset="USDT", timeframe="15m"),
+                order_value=5,
+                risk_reward_ind=Indicator(Indicator.TYPE_ATR, {"periods": 14}),
+                risk_reward_ratio=2,
+                signals=[Signal(**signals["MACD-h crosses 0"]), Signal(**signals["RSI limits"])],
+                timeframe="15m",
+                leverage=10,
+                min_signals_percentage=0.5,
+                trailing_stop=trailing_stop,
+            )
+            backtest = Backtest(strategy)
+            start = time.perf_counter()
+            expected = DataFrame(reference_replay(backtest))
+            loop_time = time.perf_counter() - start
+            start = time.perf_counter()
+            result = backtest.run(verbose=False)
+            replay_time = time.perf_counter() - start
+            assert result.trades.equals(expected[result.trades.columns]), f"{name}: trades differ"
+            strategy.exchange = BacktestExchange(stores["year"].path, quote_asset="USDT", timeframe="15m")
+            year_time = timed(lambda: Backtest(strategy).run(verbose=False), 1) / symbols
+            print(
+                f"{name:<24}{candles:>10}{loop_time * 1000:>10.0f}ms{replay_time * 1000:>10.0f}ms"
+                f"{loop_time / replay_time:>9.0f}x{len(result.trades):>12}{year_time * 1000:>10.0f}ms"
+            )
+
+
+def parameter_sweep(symbols: int = 3, candles: int = 3_000) -> None:
+    """Summaries of the sweep against backtesting each point on its own with a cold cache, and its scaling with the
+    number of workers"""
+    workers = os.cpu_count() or 1
+    print(
+        f"\n{'Sweep':<24}{'Points':>10}{'each':>12}{'1 worker':>12}{'Reuse':>10}"
+        f"{f'{workers} workers':>12}{'Scaling':>10}"
+    )
+    space = {
+        "leverage": [5, 10],
+        "risk_reward_ratio": [1.5, 2],
+        "risk_reward_ind.periods": [14, 21],
+        "stoch_ind.slow_periods": [3, 5],
+        "ema_ind.periods": [50, 100],
+    }
+    with tempfile.TemporaryDirectory() as path:
+        store = CandleStore(path)
+        for n in range(symbols):
+            store.append(f"SYM{n}USDT-15m", random_klines(candles, seed=n))
+        sweep_times = []
+        for count in (1, workers):
+            # Forked workers inherit the cache, so every run starts cold
+            Indicator.cache.results.clear()
+            sweep = ParameterSweep(StochasticMaStrategy, space, path, quote_asset="USDT", workers=count)
+            start = time.perf_counter()
+            results = sweep.run(verbose=False)
+            sweep_times.append(time.perf_counter() - start)
+            if count == 1:
+                expected_results = results
+            assert results.equals(expected_results), f"{count} workers differ"
+        start = time.perf_counter()
+        for parameters, summary in zip(results[list(space)].to_dict("records"), results.to_dict("records")):
+            # Nothing is reused between the points
+            Indicator.cache.results.clear()
+            strategy = StochasticMaStrategy(BacktestExchange(path, "USDT", "15m"), "futures", name="sweep")
+            apply_parameters(strategy, parameters)
+            expected = Backtest(strategy.market_strategy()).run(verbose=False).summary()
+            assert all(np.isclose(value, summary[name]) for name, value in expected.items()), f"{parameters} differ"
+        each_time = time.perf_counter() - start
+        one_time, workers_time = sweep_times
+        print(
+            f"{'StochasticMaStrategy':<24}{len(results):>10}{each_time * 1000:>10.0f}ms{one_time * 1000:>10.0f}ms"
+            f"{each_time / one_time:>9.1f}x{workers_time * 1000:>10.0f}ms{one_time / workers_time:>9.1f}x"
+        )
+
+
+def main() -> None:
+    print(f"{'Indicator':<24}{'Candles':>10}{'pandas':>12}{'numpy':>12}{'Speedup':>10}{'Max diff':>12}")
+    for count in (1_000, 10_000, 100_000):
+        candles = random_candles(count)
+        repeat = 5 if count < 100_000 else 2
+        for indicator_type, reference in REFERENCES.items():
+            kwargs = KWARGS.get(indicator_type, {})
+            f = Indicator.functions[indicator_type]
+            expected = reference(candles.copy(), **kwargs)
+            data = candles.copy()
+            f(data, **kwargs)
+            diff = max_difference(expected, data, expected.columns)
+            pandas_time = timed(lambda: reference(candles.copy(), **kwargs), repeat)
+            numpy_time = timed(lambda: f(candles.copy(), **kwargs), repeat)
+            print(
+                f"{indicator_type:<24}{count:>10}{pandas_time * 1000:>10.2f}ms{numpy_time * 1000:>10.2f}ms"
+                f"{pandas_time / numpy_time:>9.1f}x{diff:>12.1e}"
+            )
+    rolling_windows()
+    for frame_size in (1_000, 10_000):
+        streaming(frame_size)
+    for tolerance in (1e-3, 1e-4, 1e-6):
+        tail_tolerance(tolerance)
+    divergences()
+    signal_evaluation()
+    signal_series()
+    backtest_replay()
+    parameter_sweep()
+
+
+if __name__ == "__main__":
+    main()
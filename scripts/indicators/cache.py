@@ -0,0 +1,67 @@
+import threading
+from typing import Callable
+import numpy as np
+from pandas import DataFrame
+
+
+class IndicatorCache:
+    """Results of the indicators computed on each candlesticks frame, so signals sharing an indicator compute it
+    once per candle
+
+    Frames are identified by `data.attrs["key"]` (i.e. symbol-timeframe, set by the exchange) and the time of their
+    last candle, frames without key are always computed"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # (indicator type, kwargs, frame key) -> (frame version, headers, columns)
+        self.results: dict[tuple, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def analyze(
+        self, data: DataFrame, indicator_type: str, kwargs: "dict | None", compute: Callable[[], "str | list[str]"]
+    ) -> "str | list[str]":
+        """Adds the indicator's columns to data, computing them only if they aren't cached
+
+        Returns
+        -------
+        Header(s) returned by the indicator function"""
+        if "key" not in data.attrs or data.empty:
+            return compute()
+        key = (indicator_type, tuple(sorted(kwargs.items())) if kwargs else (), data.attrs["key"])
+        # Same frame after a new candle or after changing its chart type must be computed again
+        version = (data["time"].iat[-1], len(data), data.attrs.get("chart", "candle"))
+        with self.lock:
+            cached = self.results.get(key)
+        if cached and cached[0] == version:
+            _, headers, columns = cached
+            # Columns may be missing if the frame was replaced since, e.g. requested again to the exchange, or
+            # written by the same indicator with other kwargs and the same headers (e.g. stochastic's slow periods)
+            for name, values in columns.items():
+                if name not in data.columns or not np.may_share_memory(data[name].to_numpy(), values):
+                    data[name] = values
+            with self.lock:
+                self.hits += 1
+            return headers
+        columns_before = set(data.columns)
+        headers = compute()
+        # Functions that return no headers are cached by the columns they added
+        names = [headers] if isinstance(headers, str) else list(headers or [])
+        names += [name for name in data.columns if name not in columns_before and name not in names]
+        with self.lock:
+            self.results[key] = (version, headers, {name: data[name].to_numpy() for name in names})
+            self.misses += 1
+        return headers
+
+    def discard(self, frame_key: str) -> None:
+        """Removes the results of the frame, e.g. once a backtest doesn't need its indicators anymore"""
+        with self.lock:
+            for key in [key for key in self.results if key[2] == frame_key]:
+                del self.results[key]
+
+    def stats(self) -> "tuple[int, int]":
+        """Hits and misses since the last call"""
+        with self.lock:
+            stats = (self.hits, self.misses)
+            self.hits = self.misses = 0
+        return stats
@@ -0,0 +1,91 @@
+import math
+import numpy as np
+from pandas import Series
+from scipy.signal import lfilter
+
+# Indicator functions compute on contiguous float64 arrays with these kernels, no Python runs per candle
+# Kernels work along the last axis, so a panel of symbols x candles is computed in one call
+
+
+def column(data, name: str) -> np.ndarray:
+    """Column of a DataFrame (1D) or CandlePanel (2D, symbols x candles) as a float array"""
+    values = data[name]
+    if isinstance(values, Series):
+        # Without copying float columns, np.asarray takes longer than reading the column
+        return values.to_numpy(dtype=np.float64)
+    return np.asarray(values, dtype=np.float64)
+
+
+def ema(values: np.ndarray, periods: int) -> np.ndarray:
+    """Exponential moving average along the last axis, same as pandas' ewm(span=periods, adjust=False).mean()
+
+    Leading NaNs are kept, NaNs after the first value carry the previous average"""
+    values = np.asarray(values, dtype=np.float64)
+    alpha = 2 / (periods + 1)
+    rows = values.reshape(-1, values.shape[-1])
+    valid = ~np.isnan(rows)
+    any_valid = valid.any(axis=0)
+    start = int(np.argmax(any_valid)) if any_valid.any() else rows.shape[1]
+    if not valid[:, start:].all():
+        # NaNs after the first value are carried row by row
+        return np.stack([ema_with_gaps(row, alpha) for row in rows]).reshape(values.shape)
+    # Leading NaNs shared by all the rows are skipped
+    result = np.full(rows.shape, np.nan)
+    x = rows[:, start:]
+    if x.shape[1]:
+        # y[t] = alpha * x[t] + (1 - alpha) * y[t-1]
+        result[:, start:] = lfilter([alpha], [1, alpha - 1], x, axis=-1, zi=(1 - alpha) * x[:, :1])[0]
+    return result.reshape(values.shape)
+
+
+def ema_with_gaps(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponential moving average of a 1D array with NaNs after its first value"""
+    result = np.full(len(values), np.nan)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return result
+    start = np.argmax(valid)
+    # Runs of valid values are filtered separately, each one continuing from the previous average
+    edges = np.flatnonzero(np.diff(valid[start:].astype(np.int8))) + start + 1
+    bounds = np.r_[start, edges, len(values)]
+    average = values[start]
+    for run_start, run_end in zip(bounds[:-1], bounds[1:]):
+        if valid[run_start]:
+            result[run_start:run_end] = lfilter(
+                [alpha], [1, alpha - 1], values[run_start:run_end], zi=[(1 - alpha) * average]
+            )[0]
+            average = result[run_end - 1]
+        else:
+            result[run_start:run_end] = average
+    return result
+
+
+def ema_warmup(periods: int, tolerance: float) -> int:
+    """Candles after which an EMA started at any value is within `tolerance` of the one started earlier,
+    relative to the difference between both starting values"""
+    return math.ceil(math.log(tolerance) / math.log(1 - 2 / (periods + 1)))
+
+
+def diff(values: np.ndarray) -> np.ndarray:
+    """Difference with the previous value along the last axis, NaN for the first one"""
+    values = np.asarray(values, dtype=np.float64)
+    if not values.shape[-1]:
+        return values
+    return np.concatenate([np.full(values.shape[:-1] + (1,), np.nan), values[..., 1:] - values[..., :-1]], axis=-1)
+
+
+def shift(values: np.ndarray) -> np.ndarray:
+    """Previous value along the last axis, NaN for the first one"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.concatenate([np.full(values.shape[:-1] + (1,), np.nan), values[..., :-1]], axis=-1)
+
+
+def true_range(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """True range of each candle, measured against the candle's own close"""
+    return np.maximum.reduce([high - low, np.abs(high - close), np.abs(low - close)])
+
+
+def divide(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a / b with pandas semantics, i.e. x / 0 is ±inf and 0 / 0 is NaN, without warnings"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return a / b
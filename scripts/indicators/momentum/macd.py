@@ -1,18 +1,21 @@
 from pandas import DataFrame
+from scripts.indicators import kernels, rolling
 
 
 def macd(data: DataFrame, short_term: int = 12, long_term: int = 26, signal: int = 9) -> list[str]:
     """Moving Average Convergence Divergence
 
     Return Headers: [0] MACD | [1] Signal | [2] Histogram | [3] Histogram's Moving Average for signal periods"""
+    close = kernels.column(data, "close")
     # Calculate short-term EMA
-    short_ema = data["close"].ewm(span=short_term, adjust=False).mean()
+    short_ema = kernels.ema(close, short_term)
     # Calculate long-term EMA
-    long_ema = data["close"].ewm(span=long_term, adjust=False).mean()
+    long_ema = kernels.ema(close, long_term)
     # Calculate MACD by substracting long term from short term EMA
     macd_line = short_ema - long_ema
     # Calculate Signal (EMA(9) of MACD)
-    signal_line = macd_line.ewm(span=signal, adjust=False).mean()
+    signal_line = kernels.ema(macd_line, signal)
+    histogram = macd_line - signal_line
     # Update DataFrame
     headers = [
         f"macd({short_term}/{long_term})",
@@ -22,6 +25,13 @@ def macd(data: DataFrame, short_term: int = 12, long_term: int = 26, signal: int
     ]
     data[headers[0]] = macd_line
     data[headers[1]] = signal_line
-    data[headers[2]] = macd_line - signal_line
-    data[headers[3]] = data[headers[2]].rolling(signal).mean()
+    data[headers[2]] = histogram
+    data[headers[3]] = rolling.mean(histogram, signal)
     return headers
+
+
+def macd_lookback(tolerance: float, short_term: int = 12, long_term: int = 26, signal: int = 9) -> int:
+    """Candles needed for the last values to be within tolerance of the ones computed on the whole history"""
+    # Signal line starts converging once the MACD line has, then its moving average takes signal candles
+    macd_line = kernels.ema_warmup(max(short_term, long_term), tolerance)
+    return macd_line + kernels.ema_warmup(signal, tolerance) + signal - 1
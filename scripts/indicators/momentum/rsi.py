@@ -1,4 +1,6 @@
+import numpy as np
 from pandas import DataFrame
+from scripts.indicators import kernels
 
 
 def rsi(data: DataFrame, periods: int = 14) -> str:
@@ -6,15 +8,22 @@ def rsi(data: DataFrame, periods: int = 14) -> str:
 
     Return Header: RSI"""
     # Calculate U and D
-    u = (data["close"] - data["close"].shift(1)).clip(lower=0)
-    d = (data["close"].shift(1) - data["close"]).clip(lower=0)
+    change = kernels.diff(kernels.column(data, "close"))
+    u = np.maximum(change, 0)
+    d = np.maximum(-change, 0)
     # Smooth U and D
-    ema_u = u.ewm(span=periods, adjust=False).mean()
-    ema_d = d.ewm(span=periods, adjust=False).mean()
+    ema_u = kernels.ema(u, periods)
+    ema_d = kernels.ema(d, periods)
     # Calculate Relative Strength
-    rs = ema_u / ema_d
-    _rsi = rs.apply(lambda val: 100 - (100 / (1 + val)))
+    rs = kernels.divide(ema_u, ema_d)
+    _rsi = 100 - kernels.divide(100, 1 + rs)
     # Update DataFrame
     header = f"rsi({periods})"
     data[header] = _rsi
     return header
+
+
+def rsi_lookback(tolerance: float, periods: int = 14) -> int:
+    """Candles needed for the last values to be within tolerance of the ones computed on the whole history"""
+    # First candle has no change, ratio of the averages is scaled to 0-100 so it's 100 times more sensitive
+    return 1 + kernels.ema_warmup(periods, tolerance / 100)
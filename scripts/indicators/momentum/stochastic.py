@@ -1,17 +1,19 @@
 from pandas import DataFrame
+from scripts.indicators import kernels, rolling
 
 
 def stochastic(data: DataFrame, periods: int = 14, slow_periods: int = 3) -> list[str]:
     """Stochastic Oscilator
 
     Return Headers: [0] Fast Stochastic (K) | [1] Slow Stochastic (D) | [2] K-D Diff"""
+    close = kernels.column(data, "close")
     # Period's low and high
-    low = data["low"].rolling(periods).min()
-    high = data["high"].rolling(periods).max()
+    low = rolling.minimum(kernels.column(data, "low"), periods)
+    high = rolling.maximum(kernels.column(data, "high"), periods)
     # Fast stochastic => (close - low) / (high - low) * 100
-    fast = (data["close"] - low) / (high - low) * 100
+    fast = kernels.divide(close - low, high - low) * 100
     # Slow stochastic => EMA(fast_stochastic @ slow_periods)
-    slow = fast.ewm(span=slow_periods, adjust=False).mean()
+    slow = kernels.ema(fast, slow_periods)
     # Update DataFrame
     headers = [
         f"stoch-k({periods})",
@@ -22,3 +24,9 @@ def stochastic(data: DataFrame, periods: int = 14, slow_periods: int = 3) -> lis
     data[headers[1]] = slow
     data[headers[2]] = fast - slow
     return headers
+
+
+def stochastic_lookback(tolerance: float, periods: int = 14, slow_periods: int = 3) -> int:
+    """Candles needed for the last values to be within tolerance of the ones computed on the whole history"""
+    # Slow stochastic starts from a fast one anywhere in 0-100
+    return periods - 1 + kernels.ema_warmup(slow_periods, tolerance / 100)
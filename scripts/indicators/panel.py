@@ -0,0 +1,118 @@
+import threading
+from collections import Counter
+from typing import Callable
+import numpy as np
+from pandas import DataFrame
+
+
+class CandlePanel:
+    """Candlesticks of many symbols with the same number of candles, held in symbols x candles arrays, so each
+    indicator is computed for all the symbols in a single call of its function
+
+    Parameters
+    ----------
+    `frames`: symbol -> candlesticks, all with the same number of candles
+
+    `columns`: candlesticks columns copied to the panel"""
+
+    def __init__(self, frames: "dict[str, DataFrame]", columns: "tuple[str, ...]" = ("open", "high", "low", "close")):
+        self.symbols = list(frames.keys())
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.columns: dict[str, np.ndarray] = {
+            name: np.stack([frame[name].to_numpy(dtype=float) for frame in frames.values()]) for name in columns
+        }
+        # Times identify the candles of each symbol, e.g. to update the trackers of its divergences
+        self.columns["time"] = np.stack([frame["time"].to_numpy() for frame in frames.values()])
+        # Streams and caches by frame key don't apply to panels, but views keep the attrs of their frames
+        self.attrs = {}
+        self.frame_attrs = [dict(frame.attrs) for frame in frames.values()]
+        self.lock = threading.Lock()
+        # (indicator type, kwargs) -> headers
+        self.headers: dict[tuple, "str | list[str]"] = {}
+
+    @classmethod
+    def from_frames(cls, frames: "dict[str, DataFrame]", min_symbols: int = 2) -> "CandlePanel | None":
+        """Panel of the symbols with the most common number of candles, None if they're fewer than min_symbols"""
+        if not frames:
+            return None
+        size, count = Counter(len(frame) for frame in frames.values()).most_common(1)[0]
+        if count < min_symbols or size < 2:
+            return None
+        return cls({symbol: frame for symbol, frame in frames.items() if len(frame) == size})
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.index
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __setitem__(self, name: str, values: np.ndarray) -> None:
+        self.columns[name] = np.asarray(values, dtype=np.float64)
+
+    def analyze(
+        self, indicator_type: str, kwargs: "dict | None", compute: Callable[["CandlePanel"], "str | list[str]"]
+    ) -> "str | list[str]":
+        """Computes the indicator for all the symbols the first time it's requested
+
+        Returns
+        -------
+        Header(s) returned by the indicator function"""
+        key = (indicator_type, tuple(sorted(kwargs.items())) if kwargs else ())
+        with self.lock:
+            if key not in self.headers:
+                columns_before = set(self.columns)
+                headers = compute(self)
+                # Functions that return no headers are identified by the columns they added
+                if headers is None:
+                    headers = [name for name in self.columns if name not in columns_before]
+                self.headers[key] = headers
+            return self.headers[key]
+
+    def view(self, symbol: str) -> "PanelView":
+        """Candlesticks and indicators of a symbol, without copying them"""
+        return PanelView(self, self.index[symbol])
+
+
+class PanelView:
+    """Row of a panel with the parts of the DataFrame interface read by the signals,
+    i.e. data[header], data.iloc[i][header] and data.tail(n)"""
+
+    def __init__(self, panel: CandlePanel, row: int, start: int = 0) -> None:
+        self.panel = panel
+        self.row = row
+        self.start = start
+        # Key of the symbol's frame, its indicators are still computed by the panel
+        self.attrs = panel.frame_attrs[row]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.panel.columns[name][self.row, self.start :]
+
+    def __len__(self) -> int:
+        return next(iter(self.panel.columns.values())).shape[1] - self.start
+
+    @property
+    def iloc(self) -> "PanelRows":
+        return PanelRows(self)
+
+    def tail(self, n: int) -> "PanelView":
+        return PanelView(self.panel, self.row, self.start + max(len(self) - n, 0))
+
+
+class PanelRows:
+    def __init__(self, view: PanelView) -> None:
+        self.view = view
+
+    def __getitem__(self, i: int) -> "PanelRow":
+        return PanelRow(self.view, i)
+
+
+class PanelRow:
+    def __init__(self, view: PanelView, i: int) -> None:
+        self.view = view
+        self.i = i
+
+    def __getitem__(self, name: str) -> np.float64:
+        return self.view[name][self.i]
@@ -0,0 +1,282 @@
+import threading
+import numpy as np
+from pandas import DataFrame
+from scripts.console import C, I
+from scripts.indicator import Indicator
+from scripts.indicators import kernels, rolling
+from scripts.indicators.panel import CandlePanel
+
+# Indicators are built from these primitives, nodes are tuples (operation, *arguments) so equal sub-computations
+# of different indicators are the same node, e.g. ("ema", ("column", "close"), 12)
+
+# Operation -> (function, estimated cost)
+OPERATIONS = {
+    "ema": (kernels.ema, 4),
+    "sma": (rolling.mean, 3),
+    "std": (rolling.std, 4),
+    "min": (rolling.minimum, 4),
+    "max": (rolling.maximum, 4),
+    "diff": (kernels.diff, 1),
+    "true_range": (kernels.true_range, 2),
+    "positive": (lambda x: np.maximum(x, 0), 1),
+    "negative": (lambda x: np.maximum(-x, 0), 1),
+    "add": (np.add, 1),
+    "sub": (np.subtract, 1),
+    "mul": (np.multiply, 1),
+    "abs_add": (lambda a, b: np.abs(a + b), 1),
+    "abs_sub": (lambda a, b: np.abs(a - b), 1),
+    "percent": (lambda a, b: kernels.divide(a, b) * 100, 1),
+    "divide": (kernels.divide, 1),
+    "rsi": (lambda rs: 100 - kernels.divide(100, 1 + rs), 1),
+}
+COLUMN_COST = 1
+
+
+def column(name: str) -> tuple:
+    return ("column", name)
+
+
+def macd_graph(short_term: int = 12, long_term: int = 26, signal: int = 9):
+    close = column("close")
+    macd_line = ("sub", ("ema", close, short_term), ("ema", close, long_term))
+    signal_line = ("ema", macd_line, signal)
+    histogram = ("sub", macd_line, signal_line)
+    headers = [
+        f"macd({short_term}/{long_term})",
+        f"macd-s({short_term}/{long_term}/{signal})",
+        f"macd-h({short_term}/{long_term}/{signal})",
+        f"macd-ma({short_term}/{long_term}/{signal})",
+    ]
+    return headers, dict(zip(headers, [macd_line, signal_line, histogram, ("sma", histogram, signal)]))
+
+
+def rsi_graph(periods: int = 14):
+    change = ("diff", column("close"))
+    rs = ("divide", ("ema", ("positive", change), periods), ("ema", ("negative", change), periods))
+    header = f"rsi({periods})"
+    return header, {header: ("rsi", rs)}
+
+
+def stochastic_graph(periods: int = 14, slow_periods: int = 3):
+    close = column("close")
+    low = ("min", column("low"), periods)
+    high = ("max", column("high"), periods)
+    fast = ("percent", ("sub", close, low), ("sub", high, low))
+    slow = ("ema", fast, slow_periods)
+    headers = [f"stoch-k({periods})", f"stoch-d({periods})", f"stoch-diff({periods})"]
+    return headers, dict(zip(headers, [fast, slow, ("sub", fast, slow)]))
+
+
+def atr_node(periods: int) -> tuple:
+    return ("sma", ("true_range", column("close"), column("high"), column("low")), periods)
+
+
+def adx_graph(periods: int = 14):
+    plus_dm = ("ema", ("positive", ("diff", column("high"))), periods)
+    minus_dm = ("ema", ("negative", ("diff", column("low"))), periods)
+    atr = atr_node(periods)
+    plus_di = ("percent", plus_dm, atr)
+    minus_di = ("percent", minus_dm, atr)
+    di = ("percent", ("abs_sub", plus_di, minus_di), ("abs_add", plus_di, minus_di))
+    headers = [f"-di({periods})", f"adx({periods})", f"+di({periods})", f"adx-diff({periods})"]
+    return headers, dict(zip(headers, [minus_di, ("sma", di, periods), plus_di, ("sub", plus_di, minus_di)]))
+
+
+def dema_graph(periods: int):
+    header = f"dema({periods})"
+    return header, {header: ("ema", ("ema", column("close"), periods), periods)}
+
+
+def ema_graph(periods: int, header: str = "close"):
+    name = f"ema({periods})" if header == "close" else f"ema-{header}"
+    return name, {name: ("ema", column(header), periods)}
+
+
+def sma_graph(periods: int):
+    header = f"sma({periods})"
+    return header, {header: ("sma", column("close"), periods)}
+
+
+def atr_graph(periods: int = 14):
+    header = f"atr({periods})"
+    return header, {header: atr_node(periods)}
+
+
+def bb_graph(periods: int = 20, std_count: int = 2):
+    close = column("close")
+    middle = ("sma", close, periods)
+    deviation = ("mul", ("std", close, periods), std_count)
+    headers = [f"bb-l({periods})", f"bb-m({periods})", f"bb-u({periods})"]
+    return headers, dict(zip(headers, [("sub", middle, deviation), middle, ("add", middle, deviation)]))
+
+
+GRAPHS = {
+    Indicator.TYPE_MACD: macd_graph,
+    Indicator.TYPE_RSI: rsi_graph,
+    Indicator.TYPE_STOCH: stochastic_graph,
+    Indicator.TYPE_ADX: adx_graph,
+    Indicator.TYPE_DEMA: dema_graph,
+    Indicator.TYPE_EMA: ema_graph,
+    Indicator.TYPE_SMA: sma_graph,
+    Indicator.TYPE_ATR: atr_graph,
+    Indicator.TYPE_BB: bb_graph,
+}
+
+
+def nodes_cost(nodes: "list[tuple]") -> int:
+    """Estimated cost of computing the nodes and their arguments, each distinct node once"""
+    seen = set()
+    cost = 0
+    pending = list(nodes)
+    while pending:
+        node = pending.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        if node[0] == "column":
+            cost += COLUMN_COST
+            continue
+        cost += OPERATIONS[node[0]][1]
+        pending.extend(arg for arg in node[1:] if isinstance(arg, tuple))
+    return cost
+
+
+class IndicatorPlan:
+    """Evaluates the indicators of a strategy together, computing each primitive shared by several indicators once
+
+    The indicators are split in primitives (EMA of a column, rolling min/max, true range, diff...), deduplicated
+    and evaluated in topological order, each frame once per candle
+
+    Parameters
+    ----------
+    `indicators`: indicators of the strategy, they're evaluated by the plan from now on"""
+
+    def __init__(self, indicators: "list[Indicator]") -> None:
+        self.lock = threading.Lock()
+        # (indicator type, kwargs) -> (returned headers, {header: node})
+        graphs: dict[tuple, tuple] = {}
+        for indicator in indicators:
+            if indicator.indicator_type not in GRAPHS:
+                continue
+            key = self.key(indicator)
+            if key not in graphs:
+                graphs[key] = GRAPHS[indicator.indicator_type](**(indicator.function_kwargs or {}))
+            indicator.plan = self
+        self.indicators = len(graphs)
+        # Computed separately, each indicator reads the columns of the indicators it's based on
+        self.separate_cost = sum(nodes_cost(list(columns.values())) for _, columns in graphs.values())
+        # Columns produced by other indicators are replaced by their nodes, e.g. EMA of MACD
+        produced = {header: node for _, columns in graphs.values() for header, node in columns.items()}
+        resolved = {}
+
+        def resolve(node: tuple) -> tuple:
+            if node not in resolved:
+                if node[0] == "column":
+                    target = produced.get(node[1])
+                    resolved[node] = resolve(target) if target and target != node else node
+                else:
+                    resolved[node] = (node[0],) + tuple(
+                        resolve(arg) if isinstance(arg, tuple) else arg for arg in node[1:]
+                    )
+            return resolved[node]
+
+        # Distinct nodes in topological order, as steps whose tuple arguments are indices of previous steps
+        self.steps: list[tuple] = []
+        index: dict[tuple, int] = {}
+
+        def add(node: tuple) -> int:
+            if node not in index:
+                args = tuple((True, add(arg)) if isinstance(arg, tuple) else (False, arg) for arg in node[1:])
+                self.steps.append((node[0], args))
+                index[node] = len(self.steps) - 1
+            return index[node]
+
+        # (indicator type, kwargs) -> (returned headers, {header: step})
+        self.outputs = {
+            key: (returned, {header: add(resolve(node)) for header, node in columns.items()})
+            for key, (returned, columns) in graphs.items()
+        }
+        self.cost = sum(COLUMN_COST if op == "column" else OPERATIONS[op][1] for op, _ in self.steps)
+        # Values of the last evaluated frame, signals analyze each frame before moving to the next one
+        self.last: "tuple | None" = None
+
+    @classmethod
+    def from_signals(cls, signals: list, risk_reward_ind=None) -> "IndicatorPlan":
+        """Plan of the indicators used by the signals (and the risk reward indicator)"""
+        indicators = [risk_reward_ind] if isinstance(risk_reward_ind, Indicator) else []
+        for signal in signals:
+            for name in ("signal_ind", "base_ind", "indicator"):
+                if isinstance(getattr(signal, name, None), Indicator):
+                    indicators.append(getattr(signal, name))
+        return cls(indicators)
+
+    @staticmethod
+    def key(indicator: Indicator) -> tuple:
+        kwargs = indicator.function_kwargs
+        return (indicator.indicator_type, tuple(sorted(kwargs.items())) if kwargs else ())
+
+    def supports(self, indicator: Indicator) -> bool:
+        return self.key(indicator) in self.outputs
+
+    def analyze(self, data: "DataFrame | CandlePanel", indicator: Indicator) -> "str | list[str]":
+        """Adds the indicator's columns to data, evaluating the plan once per frame
+
+        Returns
+        -------
+        Header(s) returned by the indicator function"""
+        returned, columns = self.outputs[self.key(indicator)]
+        values = self.evaluate(data)
+        for header, step in columns.items():
+            data[header] = values[step]
+        return returned
+
+    def evaluate(self, data: "DataFrame | CandlePanel") -> "list[np.ndarray]":
+        """Values of every step for data"""
+        if isinstance(data, CandlePanel):
+            version = (id(data),)
+            frame = data
+        elif "key" in data.attrs and not data.empty:
+            version = (data.attrs["key"], data["time"].iloc[-1], len(data), data.attrs.get("chart", "candle"))
+            frame = None
+        else:
+            return self.run(data)
+        with self.lock:
+            # Panels are compared by identity, as the id of a released panel may be reused
+            if self.last and self.last[0] == version and self.last[1] is frame:
+                return self.last[2]
+            values = self.run(data)
+            self.last = (version, frame, values)
+        return values
+
+    def run(self, data: "DataFrame | CandlePanel") -> "list[np.ndarray]":
+        values = []
+        for op, args in self.steps:
+            if op == "column":
+                values.append(kernels.column(data, args[0][1]))
+                continue
+            inputs = [values[arg] if is_step else arg for is_step, arg in args]
+            values.append(OPERATIONS[op][0](*inputs))
+        return values
+
+    def describe(self) -> str:
+        """Steps of the plan and its estimated saving, to print at strategy start"""
+
+        def name(is_step: bool, arg) -> str:
+            if not is_step:
+                return str(arg)
+            # Columns are shown by their name
+            op, args = self.steps[arg]
+            return args[0][1] if op == "column" else f"#{arg + 1}"
+
+        saving = 1 - self.cost / self.separate_cost if self.separate_cost else 0
+        lines = [
+            C.Style(
+                f"{I.CHECK} Indicator plan: {self.indicators} indicators in {len(self.steps)} steps,"
+                f" estimated cost {self.cost} (computed separately {self.separate_cost}, {saving:.0%} saved)",
+                C.DARKCYAN,
+            )
+        ]
+        for i, (op, args) in enumerate(self.steps):
+            names = [str(arg) for _, arg in args] if op == "column" else [name(*arg) for arg in args]
+            lines.append(f"   #{i + 1} {op}({', '.join(names)})")
+        return "\n".join(lines)
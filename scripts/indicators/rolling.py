@@ -0,0 +1,190 @@
+import math
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+# Rolling window primitives, as batch functions along the last axis of 1D frames and 2D panels (symbols x candles),
+# and as states updated one value at a time in constant time for the streamed indicators
+
+NAN = float("nan")
+# Windows whose sums of squares are accumulated together, so their error doesn't grow with the frame
+BLOCK = 64
+
+
+def windows(values: np.ndarray, periods: int) -> np.ndarray:
+    """Windows of the last `periods` values of each position along the last axis, without copying values"""
+    return sliding_window_view(np.asarray(values, dtype=np.float64), periods, axis=-1)
+
+
+def pad(values: np.ndarray, periods: int) -> np.ndarray:
+    """Prepends NaN for the first `periods - 1` positions, which don't have a full window"""
+    return np.concatenate([np.full(values.shape[:-1] + (periods - 1,), np.nan), values], axis=-1)
+
+
+def window_sums(values: np.ndarray, periods: int) -> np.ndarray:
+    """Sums of each full window, NaNs are summed as 0"""
+    sums = np.cumsum(np.where(np.isnan(values), 0, values), axis=-1)
+    zero = np.zeros(values.shape[:-1] + (1,))
+    return sums[..., periods - 1 :] - np.concatenate([zero, sums[..., :-periods]], axis=-1)
+
+
+def window_nans(values: np.ndarray, periods: int) -> np.ndarray:
+    """Whether each full window has any NaN"""
+    nans = np.isnan(values)
+    if not nans.any():
+        return np.zeros(values.shape[:-1] + (values.shape[-1] - periods + 1,), dtype=bool)
+    return window_sums(nans.astype(np.float64), periods) > 0
+
+
+def mean(values: np.ndarray, periods: int) -> np.ndarray:
+    """Same as pandas' rolling(periods).mean() along the last axis, NaN if a window has any NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[-1] < periods:
+        return np.full(values.shape, np.nan)
+    # Sums of the deviations from the first value keep the cumulative sum small, so it stays precise
+    origin = np.where(np.isnan(values[..., :1]), 0, values[..., :1])
+    means = window_sums(values - origin, periods) / periods + origin
+    means[window_nans(values, periods)] = np.nan
+    return pad(means, periods)
+
+
+def std(values: np.ndarray, periods: int, ddof: int = 1) -> np.ndarray:
+    """Same as pandas' rolling(periods).std(ddof=ddof) along the last axis, NaN if a window has any NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[-1] < periods or periods <= ddof:
+        return np.full(values.shape, np.nan)
+    size = values.shape[-1] - periods + 1
+    blocks = -(-size // BLOCK)
+    padded = np.zeros(values.shape[:-1] + (blocks * BLOCK + periods - 1,))
+    padded[..., : values.shape[-1]] = np.where(np.isnan(values), 0, values)
+    # Blocks of windows with the `periods - 1` values before them, relative to their first value
+    view = sliding_window_view(padded, BLOCK + periods - 1, axis=-1)[..., ::BLOCK, :]
+    view = view - view[..., :1]
+    sums = np.cumsum(view, axis=-1)
+    squares = np.cumsum(view * view, axis=-1)
+    window_sum = sums[..., periods - 1 :].copy()
+    window_sum[..., 1:] -= sums[..., :-periods]
+    window_squares = squares[..., periods - 1 :].copy()
+    window_squares[..., 1:] -= squares[..., :-periods]
+    # Sum of squared deviations from the window's mean
+    deviations = np.maximum(window_squares - window_sum**2 / periods, 0)
+    variances = deviations.reshape(values.shape[:-1] + (blocks * BLOCK,))[..., :size] / (periods - ddof)
+    variances[window_nans(values, periods)] = np.nan
+    return pad(np.sqrt(variances), periods)
+
+
+def minimum(values: np.ndarray, periods: int) -> np.ndarray:
+    """Same as pandas' rolling(periods).min() along the last axis, NaN if a window has any NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[-1] < periods:
+        return np.full(values.shape, np.nan)
+    if np.isnan(values).any():
+        return pad(windows(values, periods).min(axis=-1), periods)
+    # Monotonic deque of scipy's filter, centered so each window ends at its position
+    return pad(minimum_filter1d(values, periods, axis=-1, origin=(periods - 1) // 2)[..., periods - 1 :], periods)
+
+
+def maximum(values: np.ndarray, periods: int) -> np.ndarray:
+    """Same as pandas' rolling(periods).max() along the last axis, NaN if a window has any NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[-1] < periods:
+        return np.full(values.shape, np.nan)
+    if np.isnan(values).any():
+        return pad(windows(values, periods).max(axis=-1), periods)
+    return pad(maximum_filter1d(values, periods, axis=-1, origin=(periods - 1) // 2)[..., periods - 1 :], periods)
+
+
+class RollingExtreme:
+    """Rolling min or max, the monotonic deque keeps only the values that can still be the extreme"""
+
+    def __init__(self, periods: int, maximum: bool) -> None:
+        self.periods = periods
+        self.maximum = maximum
+        self.candidates: deque[tuple[int, float]] = deque()
+        self.index = -1
+        self.last_nan = -periods
+
+    def update(self, x: float) -> float:
+        self.index += 1
+        if math.isnan(x):
+            self.last_nan = self.index
+        else:
+            while self.candidates and (self.candidates[-1][1] <= x if self.maximum else self.candidates[-1][1] >= x):
+                self.candidates.pop()
+            self.candidates.append((self.index, x))
+        while self.candidates and self.candidates[0][0] <= self.index - self.periods:
+            self.candidates.popleft()
+        if self.index < self.periods - 1 or self.index - self.last_nan < self.periods:
+            return NAN
+        return self.candidates[0][1]
+
+
+class RollingStats:
+    """Rolling mean and variance of the last `periods` values with Welford's updates,
+    NaN until the window is full or while it has any NaN"""
+
+    def __init__(self, periods: int) -> None:
+        self.periods = periods
+        self.window: deque[float] = deque()
+        self.count = 0
+        self.average = self.squares = 0.0
+        self.nans = 0
+        self.updates = 0
+
+    def update(self, x: float) -> float:
+        """Adds the value, dropping the one out of the window
+
+        Returns
+        -------
+        Mean of the window"""
+        self.window.append(x)
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self.add(x)
+        if len(self.window) > self.periods:
+            old = self.window.popleft()
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self.remove(old)
+        self.updates += 1
+        if self.updates % 1000 == 0:
+            # Running sums drift, so they're computed again from time to time
+            self.reset()
+        return self.mean
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.average
+        self.average += delta / self.count
+        self.squares += delta * (x - self.average)
+
+    def remove(self, x: float) -> None:
+        self.count -= 1
+        if not self.count:
+            self.average = self.squares = 0.0
+            return
+        delta = x - self.average
+        self.average -= delta / self.count
+        self.squares -= delta * (x - self.average)
+
+    def reset(self) -> None:
+        values = [x for x in self.window if not math.isnan(x)]
+        self.count = len(values)
+        self.average = math.fsum(values) / self.count if values else 0.0
+        self.squares = math.fsum((x - self.average) ** 2 for x in values)
+
+    @property
+    def full(self) -> bool:
+        return len(self.window) == self.periods and not self.nans
+
+    @property
+    def mean(self) -> float:
+        return self.average if self.full else NAN
+
+    def std(self, ddof: int = 1) -> float:
+        if not self.full or self.periods <= ddof:
+            return NAN
+        return math.sqrt(max(self.squares, 0) / (self.periods - ddof))
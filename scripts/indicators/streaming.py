@@ -0,0 +1,267 @@
+import math
+import threading
+from abc import ABCMeta, abstractmethod
+import numpy as np
+from pandas import DataFrame
+from scripts.indicators.rolling import RollingExtreme, RollingStats
+
+# Indicators updated one closed candle at a time in constant time, same formulas as the batch functions
+
+NAN = float("nan")
+
+
+class EmaState:
+    """Exponential moving average, NaNs before the first value are kept and after it carry the average"""
+
+    def __init__(self, periods: int) -> None:
+        self.alpha = 2 / (periods + 1)
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if math.isnan(x):
+            return self.value
+        self.value = x if math.isnan(self.value) else self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+def divide(a: float, b: float) -> float:
+    """a / b with NumPy semantics, i.e. x / 0 is ±inf and 0 / 0 is NaN"""
+    if b:
+        return a / b
+    return NAN if a == 0 or math.isnan(a) else math.copysign(math.inf, a) * math.copysign(1, b)
+
+
+class StreamingIndicator(metaclass=ABCMeta):
+    """Running state of an indicator for a single frame
+
+    `inputs`: columns read from each candle
+
+    `headers`: columns produced, same as the batch function"""
+
+    inputs: "tuple[str, ...]" = ("close",)
+    headers: "list[str]"
+
+    @abstractmethod
+    def update(self, candle: "dict[str, float]") -> "tuple[float, ...]":
+        pass
+
+
+class EmaStream(StreamingIndicator):
+    def __init__(self, periods: int, header: str = "close") -> None:
+        self.inputs = (header,)
+        self.headers = [f"ema({periods})" if header == "close" else f"ema-{header}"]
+        self.ema = EmaState(periods)
+
+    def update(self, candle):
+        return (self.ema.update(candle[self.inputs[0]]),)
+
+
+class DemaStream(StreamingIndicator):
+    def __init__(self, periods: int) -> None:
+        self.headers = [f"dema({periods})"]
+        self.ema = EmaState(periods)
+        self.dema = EmaState(periods)
+
+    def update(self, candle):
+        return (self.dema.update(self.ema.update(candle["close"])),)
+
+
+class SmaStream(StreamingIndicator):
+    def __init__(self, periods: int) -> None:
+        self.headers = [f"sma({periods})"]
+        self.sma = RollingStats(periods)
+
+    def update(self, candle):
+        return (self.sma.update(candle["close"]),)
+
+
+class MacdStream(StreamingIndicator):
+    def __init__(self, short_term: int = 12, long_term: int = 26, signal: int = 9) -> None:
+        self.headers = [
+            f"macd({short_term}/{long_term})",
+            f"macd-s({short_term}/{long_term}/{signal})",
+            f"macd-h({short_term}/{long_term}/{signal})",
+            f"macd-ma({short_term}/{long_term}/{signal})",
+        ]
+        self.short_ema = EmaState(short_term)
+        self.long_ema = EmaState(long_term)
+        self.signal_ema = EmaState(signal)
+        self.histogram_sma = RollingStats(signal)
+
+    def update(self, candle):
+        macd_line = self.short_ema.update(candle["close"]) - self.long_ema.update(candle["close"])
+        signal_line = self.signal_ema.update(macd_line)
+        histogram = macd_line - signal_line
+        return macd_line, signal_line, histogram, self.histogram_sma.update(histogram)
+
+
+class RsiStream(StreamingIndicator):
+    def __init__(self, periods: int = 14) -> None:
+        self.headers = [f"rsi({periods})"]
+        self.ema_u = EmaState(periods)
+        self.ema_d = EmaState(periods)
+        self.close = NAN
+
+    def update(self, candle):
+        change = candle["close"] - self.close
+        self.close = candle["close"]
+        # max() would drop the NaN of the first candle
+        u = change if math.isnan(change) else max(change, 0)
+        d = -change if math.isnan(change) else max(-change, 0)
+        rs = divide(self.ema_u.update(u), self.ema_d.update(d))
+        return (100 - divide(100, 1 + rs),)
+
+
+class StochasticStream(StreamingIndicator):
+    inputs = ("close", "high", "low")
+
+    def __init__(self, periods: int = 14, slow_periods: int = 3) -> None:
+        self.headers = [f"stoch-k({periods})", f"stoch-d({periods})", f"stoch-diff({periods})"]
+        self.low = RollingExtreme(periods, maximum=False)
+        self.high = RollingExtreme(periods, maximum=True)
+        self.slow = EmaState(slow_periods)
+
+    def update(self, candle):
+        low = self.low.update(candle["low"])
+        high = self.high.update(candle["high"])
+        fast = divide(candle["close"] - low, high - low) * 100
+        slow = self.slow.update(fast)
+        return fast, slow, fast - slow
+
+
+class AtrStream(StreamingIndicator):
+    inputs = ("close", "high", "low")
+
+    def __init__(self, periods: int = 14) -> None:
+        self.headers = [f"atr({periods})"]
+        self.sma = RollingStats(periods)
+
+    def update(self, candle):
+        # True range against the candle's own close, as the batch function
+        high, low, close = candle["high"], candle["low"], candle["close"]
+        return (self.sma.update(max(high - low, abs(high - close), abs(low - close))),)
+
+
+class AdxStream(StreamingIndicator):
+    inputs = ("close", "high", "low")
+
+    def __init__(self, periods: int = 14) -> None:
+        self.headers = [f"-di({periods})", f"adx({periods})", f"+di({periods})", f"adx-diff({periods})"]
+        self.ema_plus_dm = EmaState(periods)
+        self.ema_minus_dm = EmaState(periods)
+        self.atr = AtrStream(periods)
+        self.adx = RollingStats(periods)
+        self.high = self.low = NAN
+
+    def update(self, candle):
+        high_change = candle["high"] - self.high
+        low_change = self.low - candle["low"]
+        self.high, self.low = candle["high"], candle["low"]
+        plus_dm = self.ema_plus_dm.update(high_change if math.isnan(high_change) else max(high_change, 0))
+        minus_dm = self.ema_minus_dm.update(low_change if math.isnan(low_change) else max(low_change, 0))
+        (atr,) = self.atr.update(candle)
+        plus_di = divide(plus_dm, atr) * 100
+        minus_di = divide(minus_dm, atr) * 100
+        di = divide(abs(plus_di - minus_di), abs(plus_di + minus_di)) * 100
+        return minus_di, self.adx.update(di), plus_di, plus_di - minus_di
+
+
+class BbStream(StreamingIndicator):
+    def __init__(self, periods: int = 20, std_count: int = 2) -> None:
+        self.headers = [f"bb-l({periods})", f"bb-m({periods})", f"bb-u({periods})"]
+        self.stats = RollingStats(periods)
+        self.std_count = std_count
+
+    def update(self, candle):
+        middle = self.stats.update(candle["close"])
+        deviation = self.std_count * self.stats.std()
+        return middle - deviation, middle, middle + deviation
+
+
+class IndicatorStreams:
+    """Running state of the indicators of each frame, so a new closed candle is analyzed in constant time
+
+    Frames are identified by `data.attrs["key"]` (i.e. symbol-timeframe, set by the exchange), the state is built
+    from the whole frame the first time and when candles are missing
+
+    Streamed values are the ones of the indicator function on all the candles streamed, which differ from the
+    function on the frame alone while its averages haven't converged: for frames as long as the indicator's
+    `lookback(tolerance)`, their last values are within about twice the tolerance of each other
+
+    Parameters
+    ----------
+    `streams`: indicator type -> StreamingIndicator class"""
+
+    def __init__(self, streams: "dict[str, type[StreamingIndicator]]") -> None:
+        self.streams = streams
+        self.lock = threading.Lock()
+        # (indicator type, kwargs, frame key, chart) -> StreamHistory
+        self.states: dict[tuple, StreamHistory] = {}
+
+    def supports(self, indicator_type: str) -> bool:
+        return indicator_type in self.streams
+
+    def analyze(self, data: DataFrame, indicator_type: str, kwargs: "dict | None") -> "list[str] | None":
+        """Adds the indicator's columns to data from its running state
+
+        Returns
+        -------
+        Headers of the indicator or None if the frame can't be streamed"""
+        if "key" not in data.attrs or len(data) < 2:
+            return None
+        key = (
+            indicator_type,
+            tuple(sorted(kwargs.items())) if kwargs else (),
+            data.attrs["key"],
+            data.attrs.get("chart", "candle"),
+        )
+        times = data["time"].to_numpy()
+        with self.lock:
+            state = self.states.get(key)
+            if state and state.last_time == times[-1] and state.size >= len(data):
+                # Already analyzed
+                pass
+            elif state and state.last_time == times[-2] and state.size + 1 >= len(data):
+                # One new candle
+                state.append({name: float(data[name].iat[-1]) for name in state.stream.inputs}, times[-1])
+            else:
+                # Built from the whole frame
+                stream = self.streams[indicator_type](**(kwargs or {}))
+                state = StreamHistory(stream, len(data))
+                inputs = {name: data[name].to_numpy(dtype=float) for name in stream.inputs}
+                for i in range(len(data)):
+                    state.append({name: float(values[i]) for name, values in inputs.items()}, times[i])
+                self.states[key] = state
+            for header, values in zip(state.stream.headers, state.tail(len(data))):
+                data[header] = values
+        return state.stream.headers
+
+
+class StreamHistory:
+    """Values of a streamed indicator for the last candles, kept in an array twice the frame's size
+
+    Each candle only writes its values, frames are read-only views of the array"""
+
+    def __init__(self, stream: StreamingIndicator, frame_size: int) -> None:
+        self.stream = stream
+        self.frame_size = frame_size
+        self.values = np.full((len(stream.headers), 2 * frame_size), np.nan)
+        self.size = 0
+        self.last_time = None
+
+    def append(self, candle: "dict[str, float]", time) -> None:
+        if self.size == self.values.shape[1]:
+            # Full, the last frame is copied to the start of a new array, views of the previous one are kept
+            values = np.full_like(self.values, np.nan)
+            values[:, : self.frame_size] = self.values[:, -self.frame_size :]
+            self.values = values
+            self.size = self.frame_size
+        self.values[:, self.size] = self.stream.update(candle)
+        self.size += 1
+        self.last_time = time
+
+    def tail(self, count: int) -> np.ndarray:
+        """View of the values of the last `count` candles"""
+        values = self.values[:, self.size - count : self.size]
+        values.flags.writeable = False
+        return values
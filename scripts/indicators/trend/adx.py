@@ -1,4 +1,6 @@
+import numpy as np
 from pandas import DataFrame
+from scripts.indicators import kernels, rolling
 from scripts.indicators.volatility.atr import atr
 
 
@@ -8,20 +10,20 @@ def adx(data: DataFrame, periods: int = 14) -> list[str]:
     Return Headers: [0] -DI | [1] ADX | [2] +DI | [3] Diff"""
     # +DM = max(current_high - previous_high, 0)
     # -DM = max(previous_low - current_low, 0)
-    plus_dm = (data["high"] - data["high"].shift(1)).clip(lower=0)
-    minus_dm = (data["low"].shift(1) - data["low"]).clip(lower=0)
+    plus_dm = np.maximum(kernels.diff(kernels.column(data, "high")), 0)
+    minus_dm = np.maximum(-kernels.diff(kernels.column(data, "low")), 0)
     # Smooth DM with EMA
-    ema_plus_dm = plus_dm.ewm(span=periods, adjust=False).mean()
-    ema_minus_dm = minus_dm.ewm(span=periods, adjust=False).mean()
+    ema_plus_dm = kernels.ema(plus_dm, periods)
+    ema_minus_dm = kernels.ema(minus_dm, periods)
     # Calculate ATR
     _atr = atr(data=data, periods=periods, return_data=True)
     # DI = 100 * [ EMA (DM) / ATR ]
-    plus_di = (ema_plus_dm / _atr).mul(100)
-    minus_di = (ema_minus_dm / _atr).mul(100)
+    plus_di = kernels.divide(ema_plus_dm, _atr) * 100
+    minus_di = kernels.divide(ema_minus_dm, _atr) * 100
     # DI = | +DI - -DI | / | +DI + -DI |  * 100
-    di = ((plus_di - minus_di).abs() / (plus_di + minus_di).abs()).mul(100)
+    di = kernels.divide(np.abs(plus_di - minus_di), np.abs(plus_di + minus_di)) * 100
     # ADX = SMA(TR)
-    _adx = di.rolling(periods).mean()
+    _adx = rolling.mean(di, periods)
     # Update DataFrame
     headers = [
         f"-di({periods})",
@@ -34,3 +36,10 @@ def adx(data: DataFrame, periods: int = 14) -> list[str]:
     data[headers[2]] = plus_di
     data[headers[3]] = plus_di - minus_di
     return headers
+
+
+def adx_lookback(tolerance: float, periods: int = 14) -> int:
+    """Candles needed for the last values to be within tolerance of the ones computed on the whole history"""
+    # DI needs the smoothed DM (first candle has no change) and the ATR, then ADX averages periods DIs
+    # DIs are ratios scaled to 0-100, so they're 100 times more sensitive than the smoothed DM
+    return max(1 + kernels.ema_warmup(periods, tolerance / 100), periods) + periods - 1
@@ -1,4 +1,5 @@
 from pandas import DataFrame
+from scripts.indicators import kernels
 
 
 def dema(data: DataFrame, periods: int) -> str:
@@ -6,10 +7,15 @@ def dema(data: DataFrame, periods: int) -> str:
 
     Return Header: DEMA"""
     # Calculate EMA from the data
-    ema = data["close"].ewm(span=periods, adjust=False).mean()
-    #  Calculate EMA from the previous calculated EMA
-    _dema = ema.ewm(span=periods, adjust=False).mean()
+    ema = kernels.ema(kernels.column(data, "close"), periods)
+    #  Calculate EMA from the previous calculated EMA
+    _dema = kernels.ema(ema, periods)
     # Update DataFrame
     header = f"dema({periods})"
     data[header] = _dema
     return header
+
+
+def dema_lookback(tolerance: float, periods: int) -> int:
+    """Candles needed for the last values to be within tolerance of the ones computed on the whole history"""
+    return 2 * kernels.ema_warmup(periods, tolerance)
@@ -1,7 +1,10 @@
+import threading
 import numpy as np
-from pandas import DataFrame, Series
-from scipy.signal import argrelextrema
+from pandas import DataFrame
 from scripts.indicator import Direction, Indicator
+from scripts.indicators import kernels
+from scripts.indicators.panel import PanelView
+from scripts.indicators.trend.pivots import SwingTracker, hl_series
 
 
 class DivergenceSignal:
@@ -13,22 +16,61 @@ class DivergenceSignal:
 
     `indicator_header`: column's indicator header for the divergence analysis
 
-    `periods`: n of candles to analize"""
+    `periods`: n of candles to analize, or list of n to analyze several windows at once"""
 
-    def __init__(self, indicator: Indicator, indicator_header: str, periods: int = 50) -> None:
+    def __init__(self, indicator: Indicator, indicator_header: str, periods: "int | list[int]" = 50) -> None:
         self.indicator = indicator
         self.indicator_header = indicator_header
         self.price_header = "close"
-        self.periods = periods
+        self.windows = (periods,) if isinstance(periods, int) else tuple(periods)
+        self.periods = max(self.windows)
+        # Highs and lows of each frame, updated with each closed candle
+        self.lock = threading.Lock()
+        # (frame key, chart) -> [time of the last candle, price tracker, indicator tracker]
+        self.trackers: dict[tuple, list] = {}
 
-    def emit_signal(self, data: DataFrame) -> tuple[int, str]:
+    def lookback(self, tolerance: float) -> "int | None":
+        """Candles needed for the analyzed rows to be within tolerance of the whole history's,
+        None if the indicator needs the whole frame"""
+        lookback = self.indicator.lookback(tolerance)
+        return None if lookback is None else lookback + self.periods - 1
+
+    def emit_signal(self, data: "DataFrame | PanelView") -> tuple[int, str]:
         # Run indicator
         self.indicator.analyze_data(data)
-        # Get las n (width) rows to analyze highs and lows
-        indicator_data = data.tail(n=self.periods)[self.indicator_header]
-        indicator_hl = self.hl(indicator_data)
-        price_data = data.tail(n=self.periods)[self.price_header]
-        price_hl = self.hl(price_data)
+        price, indicator = self.swing_trackers(data)
+        for periods in self.windows:
+            # Highs and lows of the last n (width) rows
+            direction, description = self.divergence(price_hl=price.hl(periods), indicator_hl=indicator.hl(periods))
+            if direction != Direction.NEUTRAL:
+                return direction, description if len(self.windows) == 1 else f"{description} ({periods})"
+        # No divergence found
+        return Direction.NEUTRAL, ""
+
+    def series(self, data: DataFrame) -> np.ndarray:
+        """Direction of the divergence at each candle, i.e. emit_signal of the frame up to that candle
+
+        Returns
+        -------
+        Array of BULLISH, NEUTRAL or BEARISH (int8), one per candle"""
+        self.indicator.analyze_data(data)
+        price = kernels.column(data, self.price_header)
+        indicator = kernels.column(data, self.indicator_header)
+        conditions = []
+        for periods in self.windows:
+            price_hl = hl_series(price, periods)
+            indicator_hl = hl_series(indicator, periods)
+            # Same order as divergence()
+            conditions += [
+                price_hl["higher_highs"] & indicator_hl["lower_highs"],
+                price_hl["lower_lows"] & indicator_hl["higher_lows"],
+                price_hl["lower_highs"] & indicator_hl["higher_highs"],
+                price_hl["higher_lows"] & indicator_hl["lower_lows"],
+            ]
+        directions = [Direction.BEARISH, Direction.BULLISH, Direction.BEARISH, Direction.BULLISH] * len(self.windows)
+        return np.select(conditions, directions, Direction.NEUTRAL).astype(np.int8)
+
+    def divergence(self, price_hl: "dict[str, bool]", indicator_hl: "dict[str, bool]") -> tuple[int, str]:
         # Bearish divergence
         if price_hl["higher_highs"] and indicator_hl["lower_highs"]:
             return Direction.BEARISH, "Bearish divergence"
@@ -41,40 +83,31 @@ class DivergenceSignal:
         # Bullish hidden divergence
         if price_hl["higher_lows"] and indicator_hl["lower_lows"]:
             return Direction.BULLISH, "Bullish hidden divergence"
-        # No divergence found
         return Direction.NEUTRAL, ""
 
-    def hl(self, series: Series) -> dict[str:bool]:
-        """Analyze series for 2+ consecutive highs and lows
+    def swing_trackers(self, data: "DataFrame | PanelView") -> "tuple[SwingTracker, SwingTracker]":
+        """Trackers of the price and the indicator, built from the frame or updated with its last candle"""
+        if "key" not in data.attrs or len(data) < 2:
+            return self.new_trackers(data)
+        key = (data.attrs["key"], data.attrs.get("chart", "candle"))
+        times = np.asarray(data["time"])
+        with self.lock:
+            entry = self.trackers.get(key)
+            if entry and entry[0] == times[-1]:
+                # Already updated
+                pass
+            elif entry and entry[0] == times[-2]:
+                # One new candle
+                entry[1].update(float(kernels.column(data, self.price_header)[-1]))
+                entry[2].update(float(kernels.column(data, self.indicator_header)[-1]))
+                entry[0] = times[-1]
+            else:
+                entry = [times[-1], *self.new_trackers(data)]
+                self.trackers[key] = entry
+            return entry[1], entry[2]
 
-        Parameters
-        ----------
-        `series`: subset of data to analyze for divergences
-
-        Returns
-        -------
-        >>> dict:
-        {"higher_highs": bool, "higher_lows": bool, "lower_highs": bool, "lower_lows": bool}"""
-        # Get highs and lows filtered by 5 periods
-        array = series.to_numpy(dtype=float)
-        high_indices = argrelextrema(array, np.greater, order=5)[0]
-        low_indices = argrelextrema(array, np.less, order=5)[0]
-        highs = [array[h] for h in high_indices]
-        lows = [array[l] for l in low_indices]
-        # Initialize variables
-        hh = lh = hl = ll = False
-        # If last value is the highest of the series, it has higher highs/lows
-        # If last value is the lowest of the series, it has lower highs/lows
-        if len(highs) > 1:
-            hh = highs[-1] == max(highs)
-            lh = highs[-1] == min(highs)
-        if len(lows) > 1:
-            hl = lows[-1] == max(lows)
-            ll = lows[-1] == min(lows)
-        # Return data
-        return {
-            "higher_highs": hh,
-            "higher_lows": hl,
-            "lower_highs": lh,
-            "lower_lows": ll,
-        }
+    def new_trackers(self, data: "DataFrame | PanelView") -> "tuple[SwingTracker, SwingTracker]":
+        return (
+            SwingTracker.from_values(kernels.column(data, self.price_header), windows=self.windows),
+            SwingTracker.from_values(kernels.column(data, self.indicator_header), windows=self.windows),
+        )
@@ -1,4 +1,5 @@
 from pandas import DataFrame
+from scripts.indicators import kernels
 
 
 def ema(data: DataFrame, periods: int, header: str = "close") -> None:
@@ -6,8 +7,14 @@ def ema(data: DataFrame, periods: int, header: str = "close") -> None:
 
     Return Header: EMA"""
     # Calculate EMA
-    _ema = data[header].ewm(span=periods, adjust=False).mean()
+    _ema = kernels.ema(kernels.column(data, header), periods)
     # Update DataFrame
     header = f"ema({periods})" if header == "close" else f"ema-{header}"
     data[header] = _ema
     return header
+
+
+def ema_lookback(tolerance: float, periods: int, header: str = "close") -> int:
+    """Candles needed for the last values to be within tolerance of the ones computed on the whole history,
+    not including the ones needed by the indicator of `header`"""
+    return kernels.ema_warmup(periods, tolerance)
@@ -0,0 +1,204 @@
+from collections import deque
+import numpy as np
+from scripts.indicators import rolling
+
+
+class WindowPivots:
+    """Pivots (index, value) of a window, with monotonic deques of their max and min"""
+
+    def __init__(self) -> None:
+        self.pivots: deque[tuple[int, float]] = deque()
+        self.maxima: deque[tuple[int, float]] = deque()
+        self.minima: deque[tuple[int, float]] = deque()
+
+    def add(self, index: int, value: float) -> None:
+        self.pivots.append((index, value))
+        while self.maxima and self.maxima[-1][1] < value:
+            self.maxima.pop()
+        self.maxima.append((index, value))
+        while self.minima and self.minima[-1][1] > value:
+            self.minima.pop()
+        self.minima.append((index, value))
+
+    def evict(self, first_index: int) -> None:
+        """Removes the pivots before first_index"""
+        for pivots in (self.pivots, self.maxima, self.minima):
+            while pivots and pivots[0][0] < first_index:
+                pivots.popleft()
+
+
+class SwingTracker:
+    """Swing highs and lows of a series, updated as each value arrives
+
+    A value is a high (low) if it's greater (lower) than the `order` values on each side. Highs and lows with all
+    their neighbors inside a window are confirmed once, the ones closer to the window's edges are compared only with
+    the neighbors inside the window, same as scipy's argrelextrema(window, np.greater, order)
+
+    Parameters
+    ----------
+    `windows`: numbers of last values in which highs and lows are queried
+
+    `order`: values on each side to compare with"""
+
+    def __init__(self, windows: "tuple[int, ...]" = (50,), order: int = 5) -> None:
+        self.order = order
+        self.windows = tuple(windows)
+        # Values needed by the largest window, the list is trimmed once it doubles
+        self.size = max(max(self.windows), 2 * order + 1)
+        self.values: list[float] = []
+        self.count = 0
+        self.highs = {window: WindowPivots() for window in self.windows}
+        self.lows = {window: WindowPivots() for window in self.windows}
+        # window -> (values of the pivots at the start, values of the pivots at the end)
+        self.high_edges = {window: ([], []) for window in self.windows}
+        self.low_edges = {window: ([], []) for window in self.windows}
+
+    @classmethod
+    def from_values(cls, values, windows: "tuple[int, ...]" = (50,), order: int = 5) -> "SwingTracker":
+        """Tracker of the last values of a series, only the ones inside the largest window are needed"""
+        tracker = cls(windows=windows, order=order)
+        for value in values[-tracker.size :]:
+            tracker.add(float(value))
+        tracker.update_edges()
+        return tracker
+
+    def update(self, value: float) -> None:
+        self.add(value)
+        self.update_edges()
+
+    def add(self, value: float) -> None:
+        """Adds the value and confirms the pivot `order` values before it, without updating the edges"""
+        self.values.append(value)
+        if len(self.values) > 2 * self.size:
+            del self.values[: -self.size]
+        self.count += 1
+        # Value with `order` values after it is confirmed
+        candidate = self.count - 1 - self.order
+        if candidate >= self.order:
+            position = len(self.values) - 1 - self.order
+            pivot = self.values[position]
+            neighbors = [self.values[position + k] for k in range(-self.order, self.order + 1) if k]
+            if all(pivot > neighbor for neighbor in neighbors):
+                for window in self.windows:
+                    self.highs[window].add(candidate, pivot)
+            elif all(pivot < neighbor for neighbor in neighbors):
+                for window in self.windows:
+                    self.lows[window].add(candidate, pivot)
+        for window in self.windows:
+            # Only pivots with their left neighbors inside the window
+            first = max(self.count - window, 0) + self.order
+            self.highs[window].evict(first)
+            self.lows[window].evict(first)
+
+    def update_edges(self) -> None:
+        """Pivots closer than `order` to the start and end of each window, only their `order` neighbors are read"""
+        for window in self.windows:
+            size = min(window, self.count)
+            offset = len(self.values) - size
+            start = range(min(self.order, size))
+            end = range(max(size - self.order, self.order), size)
+            for high, edges in ((True, self.high_edges), (False, self.low_edges)):
+                edges[window] = (
+                    [self.values[offset + j] for j in start if self.is_edge_pivot(offset, size, j, high)],
+                    [self.values[offset + j] for j in end if self.is_edge_pivot(offset, size, j, high)],
+                )
+
+    def is_edge_pivot(self, offset: int, size: int, j: int, high: bool) -> bool:
+        """Whether the value at position j of the window starting at offset is a pivot"""
+        value = self.values[offset + j]
+        for k in range(1, self.order + 1):
+            # Neighbors outside the window are clipped to its edges
+            for neighbor in (self.values[offset + min(j + k, size - 1)], self.values[offset + max(j - k, 0)]):
+                if not (value > neighbor if high else value < neighbor):
+                    return False
+        return True
+
+    def hl(self, window: int) -> "dict[str, bool]":
+        """Analyze the last `window` values for 2+ consecutive highs and lows
+
+        Returns
+        -------
+        >>> dict:
+        {"higher_highs": bool, "higher_lows": bool, "lower_highs": bool, "lower_lows": bool}"""
+        result = {}
+        for high, pivots, names in (
+            (True, self.highs[window], ("higher_highs", "lower_highs")),
+            (False, self.lows[window], ("higher_lows", "lower_lows")),
+        ):
+            start, end = (self.high_edges if high else self.low_edges)[window]
+            count = len(start) + len(pivots.pivots) + len(end)
+            if count < 2:
+                result[names[0]] = result[names[1]] = False
+                continue
+            last = end[-1] if end else pivots.pivots[-1][1] if pivots.pivots else start[-1]
+            inner = [pivots.maxima[0][1], pivots.minima[0][1]] if pivots.pivots else []
+            # If last value is the highest of the pivots, they're higher, if it's the lowest, they're lower
+            result[names[0]] = last == max(start + inner + end)
+            result[names[1]] = last == min(start + inner + end)
+        return result
+
+
+def hl_series(values: np.ndarray, window: int, order: int = 5) -> "dict[str, np.ndarray]":
+    """Highs and lows of the last `window` values up to each position, same as SwingTracker.hl(window) after each
+    value, computed for all the positions at once with shifted arrays
+
+    Returns
+    -------
+    >>> dict:
+    {"higher_highs": bool array, "higher_lows": bool array, "lower_highs": bool array, "lower_lows": bool array}"""
+    values = np.asarray(values, dtype=np.float64)
+    size = len(values)
+    end = np.arange(size)
+    start = np.maximum(end - window + 1, 0)
+    # Pivots with all their neighbors inside the window are between first and last
+    first = start + order
+    last = np.maximum(end - order, 0)
+    inner = end - order >= first
+    full = end >= window - 1
+    result = {}
+    for compare, names in ((np.greater, ("higher_highs", "lower_highs")), (np.less, ("higher_lows", "lower_lows"))):
+        pivots = np.zeros(size, dtype=bool)
+        if size > 2 * order:
+            center = values[order : size - order]
+            pivots[order : size - order] = np.logical_and.reduce(
+                [compare(center, values[order + k : size - order + k]) for k in range(-order, order + 1) if k]
+            )
+        counts = np.concatenate([[0], np.cumsum(pivots)])
+        count = np.where(inner, counts[last + 1] - counts[np.minimum(first, size)], 0)
+        last_pivot = np.maximum.accumulate(np.where(pivots, end, -1))[last]
+        # Max and min of the pivots, over the whole prefix while the window isn't full
+        highest = np.where(pivots, values, -np.inf)
+        lowest = np.where(pivots, values, np.inf)
+        top = np.maximum.accumulate(highest)[last]
+        bottom = np.minimum.accumulate(lowest)[last]
+        width = window - 2 * order
+        if width > 0 and size >= width:
+            top = np.where(full, rolling.pad(rolling.windows(highest, width).max(axis=-1), width)[last], top)
+            bottom = np.where(full, rolling.pad(rolling.windows(lowest, width).min(axis=-1), width)[last], bottom)
+        top = np.where(count > 0, top, -np.inf)
+        bottom = np.where(count > 0, bottom, np.inf)
+        latest = np.full(size, np.nan)
+
+        def add_edge(position: np.ndarray, valid: np.ndarray) -> None:
+            """Adds the pivots at the window's edges, their neighbors outside it are clipped to its edges"""
+            nonlocal count, top, bottom, latest
+            position = np.clip(position, start, end)
+            value = values[position]
+            pivot = valid.copy()
+            for k in range(1, order + 1):
+                pivot &= compare(value, values[np.minimum(position + k, end)])
+                pivot &= compare(value, values[np.maximum(position - k, start)])
+            count = count + pivot
+            top = np.where(pivot, np.maximum(top, value), top)
+            bottom = np.where(pivot, np.minimum(bottom, value), bottom)
+            latest = np.where(pivot, value, latest)
+
+        # Positions in order, so the latest pivot is the last one added
+        for i in range(order):
+            add_edge(start + i, start + i <= end)
+        latest = np.where(inner & (last_pivot >= first), values[np.maximum(last_pivot, 0)], latest)
+        for i in reversed(range(order)):
+            add_edge(end - i, end - i >= first)
+        result[names[0]] = (count >= 2) & (latest == top)
+        result[names[1]] = (count >= 2) & (latest == bottom)
+    return result
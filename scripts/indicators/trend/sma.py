@@ -1,4 +1,5 @@
 from pandas import DataFrame
+from scripts.indicators import kernels, rolling
 
 
 def sma(data: DataFrame, periods: int) -> None:
@@ -6,8 +7,13 @@ def sma(data: DataFrame, periods: int) -> None:
 
     Return Header: SMA"""
     # Calculate SMA
-    _sma = data["close"].rolling(periods).mean()
+    _sma = rolling.mean(kernels.column(data, "close"), periods)
     # Update DataFrame
     header = f"sma({periods})"
     data[header] = _sma
     return header
+
+
+def sma_lookback(tolerance: float, periods: int) -> int:
+    """Candles needed for the last values to be exact"""
+    return periods
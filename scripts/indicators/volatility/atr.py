@@ -1,22 +1,28 @@
-from pandas import DataFrame, Series
+import numpy as np
+from pandas import DataFrame
+from scripts.indicators import kernels, rolling
 
 
-def tr(close: float, high: float, low: float) -> float:
-    """True Range"""
-    return max((high - low), abs(high - close), abs(low - close))
-
-
-def atr(data: DataFrame, periods: int = 14, return_data: bool = False) -> "str | Series":
+def atr(data: DataFrame, periods: int = 14, return_data: bool = False) -> "str | np.ndarray":
     """Average True Range
 
     Return Header: ATR"""
     # Calculate TR
-    _tr = data[["close", "high", "low"]].apply(lambda row: tr(*row), axis=1)
+    _tr = kernels.true_range(
+        close=kernels.column(data, "close"),
+        high=kernels.column(data, "high"),
+        low=kernels.column(data, "low"),
+    )
     # ATR = SMA(TR)
-    _atr = _tr.rolling(periods).mean()
+    _atr = rolling.mean(_tr, periods)
     if return_data:
         return _atr
     # Update DataFrame
     header = f"atr({periods})"
     data[header] = _atr
     return header
+
+
+def atr_lookback(tolerance: float, periods: int = 14, return_data: bool = False) -> int:
+    """Candles needed for the last values to be exact"""
+    return periods
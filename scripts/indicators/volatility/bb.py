@@ -1,19 +1,20 @@
 from pandas import DataFrame
-from scripts.indicators.trend.sma import sma
+from scripts.indicators import kernels, rolling
 
 
-def bb(data: DataFrame, periods: int = 20, std_count: int = 2) -> None:
+def bb(data: DataFrame, periods: int = 20, std_count: int = 2) -> list[str]:
     """Bollinger Bands
 
     Return Headers: [0] Lower | [1] Middle | [2] Upper"""
+    close = kernels.column(data, "close")
     # Calculate Middle Band : SMA
-    middle = data["close"].rolling(periods).mean()
-    # Calculate 2 Standard Deviations
-    std = std_count * middle.std()
+    middle = rolling.mean(close, periods)
+    # Calculate 2 Standard Deviations of the close over the same periods
+    std = std_count * rolling.std(close, periods)
     # Calculate Lower Band : Middle Band - 2 std
-    lower = middle.sub(std)
+    lower = middle - std
     # Calculate Upper Band : Middle Band + 2 std
-    upper = middle.add(std)
+    upper = middle + std
     # Update DataFrame
     headers = [
         f"bb-l({periods})",
@@ -23,3 +24,9 @@ def bb(data: DataFrame, periods: int = 20, std_count: int = 2) -> None:
     data[headers[0]] = lower
     data[headers[1]] = middle
     data[headers[2]] = upper
+    return headers
+
+
+def bb_lookback(tolerance: float, periods: int = 20, std_count: int = 2) -> int:
+    """Candles needed for the last values to be exact"""
+    return periods
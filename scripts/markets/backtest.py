@@ -0,0 +1,259 @@
+import heapq
+import os
+import time
+import numpy as np
+from pandas import DataFrame
+from tabulate import tabulate
+
+from scripts.candles.heikin_ashi import data_to_heikin_ashi
+from scripts.console import C, I, progress_bar
+from scripts.exchanges.backtest import BacktestExchange
+from scripts.indicator import Direction, Indicator, signals_lookback
+from scripts.markets.futures import FuturesStrategy
+from scripts.markets.spot import SpotStrategy
+
+# Tolerance of the indicators to the values computed on the whole history, the first candles of each symbol aren't
+# traded till the indicators are within it, and frames requested by place_order only have the candles it needs
+TOLERANCE = 1e-6
+
+
+class BacktestResult:
+    """Trades of a backtest and the equity curve of the account
+
+    Parameters
+    ----------
+    `exchange`: BacktestExchange after the replay"""
+
+    def __init__(self, exchange: BacktestExchange) -> None:
+        self.initial_balance = float(exchange.initial_balance)
+        self.trades = DataFrame(
+            exchange.trades,
+            columns=[
+                "symbol",
+                "direction",
+                "qty",
+                "leverage",
+                "entry_time",
+                "entry_price",
+                "exit_time",
+                "exit_price",
+                "reason",
+                "fees",
+                "pnl",
+            ],
+        )
+        self.equity = self.equity_curve(exchange)
+
+    def equity_curve(self, exchange: BacktestExchange) -> DataFrame:
+        """Wallet balance and equity (i.e. plus unrealized profit) at the close of each candle"""
+        times = exchange.times()
+        # Entry fee is paid when the position is opened, the rest of its pnl when it's closed
+        changes = np.zeros(len(times))
+        unrealized = np.zeros(len(times))
+        for trade in exchange.trades:
+            entry, exit = np.searchsorted(times, (trade["entry_time"], trade["exit_time"]))
+            entry_fee = trade["entry_price"] * trade["qty"] * exchange.fee
+            changes[entry] -= entry_fee
+            changes[exit] += trade["pnl"] + entry_fee
+            # Marked to the close of the candles while the position is open
+            candles = exchange.candles(trade["symbol"])
+            closes = candles["close"][trade["entry_index"] : trade["exit_index"]]
+            indexes = np.searchsorted(times, candles["close_time"][trade["entry_index"] : trade["exit_index"]])
+            unrealized[indexes] += (closes - trade["entry_price"]) * trade["qty"] * trade["direction"]
+        balance = self.initial_balance + np.cumsum(changes)
+        return DataFrame({"time": times, "balance": balance, "equity": balance + unrealized})
+
+    def summary(self) -> "dict[str, float]":
+        """Performance of the backtest
+
+        Returns
+        -------
+        >>> dict:
+        {"trades", "win_rate", "profit_factor", "return", "max_drawdown", "final_balance", "fees"} -> percentages
+        except trades, profit factor, final balance and fees"""
+        pnl = self.trades["pnl"].to_numpy()
+        equity = self.equity["equity"].to_numpy() if len(self.equity) else np.array([self.initial_balance])
+        peaks = np.maximum.accumulate(np.concatenate([[self.initial_balance], equity]))[1:]
+        losses = -pnl[pnl < 0].sum()
+        final_balance = self.equity["balance"].iat[-1] if len(self.equity) else self.initial_balance
+        return {
+            "trades": len(pnl),
+            "win_rate": (pnl > 0).mean() * 100 if len(pnl) else 0.0,
+            "profit_factor": pnl[pnl > 0].sum() / losses if losses else float("inf") if len(pnl) else 0.0,
+            "return": (final_balance / self.initial_balance - 1) * 100,
+            "max_drawdown": ((peaks - equity) / peaks).max() * 100 if len(equity) else 0.0,
+            "final_balance": final_balance,
+            "fees": self.trades["fees"].sum(),
+        }
+
+    def print_summary(self) -> None:
+        """Prints the summary as a table"""
+        summary = self.summary()
+        print(
+            tabulate(
+                [
+                    [C.Style(name, C.DARKCYAN), f"{value:.2f}" if isinstance(value, float) else value]
+                    for name, value in summary.items()
+                ],
+                numalign="left",
+                stralign="left",
+            )
+        )
+
+    def save(self, path: str) -> None:
+        """Writes trades.csv and equity.csv into the `path` folder"""
+        os.makedirs(path, exist_ok=True)
+        self.trades.to_csv(os.path.join(path, "trades.csv"), index=False)
+        self.equity.to_csv(os.path.join(path, "equity.csv"), index=False)
+
+
+class Backtest:
+    """Replays the stored candles through a strategy, as if `check_signals` ran at each candle close
+
+    The signals are evaluated on every candle at once with their `series`, so only the candles where the strategy
+    would place an order are replayed: the exchange's clock is moved to their close and the strategy's `place_order`
+    sends the order, which the exchange fills and closes with its simulated stop loss and take profit. Symbols with
+    an open position aren't analyzed, same as live. Orders are placed in the order of the exchange's symbols. The
+    strategy's universe filter selects the symbols from the 24h tickers before the clock, every `refresh` seconds of
+    the replay
+
+    Parameters
+    ----------
+    `strategy`: FuturesStrategy or SpotStrategy whose exchange is a BacktestExchange
+
+    `start`: time (ms) of the first candle close to trade, the previous candles warm up the indicators
+
+    `end`: time (ms) of the last candle close to trade"""
+
+    def __init__(
+        self, strategy: "FuturesStrategy | SpotStrategy", start: "int | None" = None, end: "int | None" = None
+    ) -> None:
+        self.strategy = strategy
+        self.exchange: BacktestExchange = strategy.exchange
+        self.start = start
+        self.end = end
+        # Candles the indicators need to converge, or the frame analyzed live if they need the whole frame
+        self.warmup = signals_lookback(strategy.signals, TOLERANCE, strategy.risk_reward_ind)
+        if self.warmup is None:
+            self.warmup = self.exchange.candle_count
+        if isinstance(strategy.risk_reward_ind, Indicator):
+            lookback = strategy.risk_reward_ind.lookback(TOLERANCE)
+            if lookback is not None:
+                self.exchange.set_candle_count(lookback + 1)
+        # Symbols selected by the universe filter and the clock when they were
+        self.selection: "set[str] | None" = None
+        self.selection_time = 0
+
+    def universe(self) -> "set[str] | None":
+        """Symbols selected by the strategy's universe filter at the exchange's clock, None without filter"""
+        universe = self.strategy.universe
+        if universe is None:
+            return None
+        if self.selection is None or self.exchange.clock - self.selection_time >= universe.refresh * 1000:
+            tickers = self.exchange.query_24h_tickers(spread=universe.max_spread is not None)
+            self.selection = set(universe.select(tickers))
+            self.selection_time = self.exchange.clock
+        return self.selection
+
+    def entries(self, symbol: str, candles: "DataFrame | None" = None) -> "tuple[np.ndarray, np.ndarray, np.ndarray]":
+        """Candles where the strategy places an order for the symbol, the first `warmup` candles included
+
+        Parameters
+        ----------
+        `candles`: optional frame of all the stored candles of the symbol, signals of several strategies analyzing
+        the same keyed frame share the indicators they have in common. By default the exchange's history
+
+        Returns
+        -------
+        >>> tuple:
+        (candle indexes, directions, mark prices)"""
+        if candles is None:
+            candles = self.exchange.history(symbol)
+        if self.strategy.chart_type == "heikin_ashi":
+            candles = candles.copy()
+            data_to_heikin_ashi(candles)
+        # Same weighted average as check_signals
+        signal_weight = 1 / len(self.strategy.signals)
+        avg_signal = np.zeros(len(candles))
+        for signal in self.strategy.signals:
+            avg_signal += signal.series(candles) * signal_weight
+        orders = np.abs(avg_signal) >= self.strategy.min_signals_percentage
+        close_time = candles["close_time"].to_numpy()
+        if self.start is not None:
+            orders &= close_time >= self.start
+        if self.end is not None:
+            orders &= close_time <= self.end
+        indexes = np.flatnonzero(orders)
+        directions = np.where(avg_signal[indexes] > 0, Direction.BULLISH, Direction.BEARISH).astype(np.int8)
+        return indexes, directions, candles["close"].to_numpy()[indexes]
+
+    def run(
+        self, verbose: bool = True, entries: "dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]] | None" = None
+    ) -> BacktestResult:
+        """Replays the candles and returns the trades and equity curve
+
+        Parameters
+        ----------
+        `entries`: optional entries of each symbol, as returned by `entries`, computed by default"""
+        run_start = time.perf_counter()
+        exchange = self.exchange
+        exchange.reset()
+        self.selection = None
+        symbols = list(exchange.symbols)
+        # Next candidate order of each symbol: (close time, symbol's order, position in its entries)
+        queue = []
+        candidates = {}
+        for n, symbol in enumerate(symbols):
+            indexes, directions, prices = self.entries(symbol) if entries is None else entries[symbol]
+            # Indicators haven't converged yet
+            converged = indexes >= self.warmup
+            indexes, directions, prices = indexes[converged], directions[converged], prices[converged]
+            candidates[symbol] = (indexes, directions, prices, exchange.candles(symbol)["close_time"][indexes])
+            if len(indexes):
+                queue.append((int(candidates[symbol][3][0]), n, 0))
+            if verbose:
+                print(
+                    "\r ",
+                    I.CLOCK,
+                    C.Style(f"{symbol:<20}", C.CYAN),
+                    "{:<50}".format(progress_bar(n + 1, len(symbols))),
+                    end="",
+                )
+        signals_time = time.perf_counter() - run_start
+        heapq.heapify(queue)
+        orders = rejected = 0
+        while queue:
+            close_time, n, position = heapq.heappop(queue)
+            symbol = symbols[n]
+            indexes, directions, prices, times = candidates[symbol]
+            if close_time != exchange.clock:
+                # Positions closed by then are realized first, account is updated once per candle close as live
+                exchange.advance(close_time)
+                exchange.update_account_data()
+            trade = exchange.open_trades.get(symbol)
+            universe = self.universe()
+            if trade is None and (universe is None or symbol in universe):
+                exchange.get_data_from_exchange(symbol, self.strategy.timeframe)
+                response = self.strategy.place_order(
+                    symbol=symbol, mark_price=float(prices[position]), direction=int(directions[position])
+                )
+                orders += 1
+                rejected += I.CROSS in response
+                trade = exchange.open_trades.get(symbol)
+            # Symbol is analyzed again once its position is closed
+            position += 1 if trade is None else max(int(np.searchsorted(times[position:], trade["exit_time"])), 1)
+            if position < len(indexes):
+                heapq.heappush(queue, (int(times[position]), n, position))
+        exchange.advance(np.iinfo(np.int64).max)
+        result = BacktestResult(exchange)
+        if verbose:
+            print(
+                "\r ",
+                I.CHECK,
+                C.Style(
+                    f"Replayed {len(symbols)} assets in {time.perf_counter() - run_start:.2f}s"
+                    f" (signals {signals_time:.2f}s) | {orders} orders, {rejected} rejected{'':<20}",
+                    C.DARKCYAN,
+                ),
+            )
+        return result
@@ -0,0 +1,73 @@
+import threading
+import time
+from queue import Queue
+from typing import Callable
+from scripts.console import C, I
+
+
+class OrderExecutor:
+    """Places orders in background threads, so the scan doesn't wait for the exchange's responses
+
+    Parameters
+    ----------
+    `workers`: number of orders placed simultaneously
+
+    `max_queue`: number of orders waiting for a worker, once full the scan waits till one is free"""
+
+    def __init__(self, workers: int = 4, max_queue: int = 32) -> None:
+        self.queue: "Queue[tuple[str, float, Callable[[], str]]]" = Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        # Seconds from being queued till the exchange responded, for each order
+        self.latencies: list[float] = []
+        self.max_depth = 0
+        # Started with the first order, so strategies that never place one (e.g. backtests) don't spawn them
+        self.workers = workers
+        self.threads: list[threading.Thread] = []
+
+    @property
+    def depth(self) -> int:
+        """Orders waiting for a worker"""
+        return self.queue.qsize()
+
+    def submit(self, symbol: str, place_order: Callable[[], str]) -> int:
+        """Queues the order, returns the number of orders waiting for a worker"""
+        with self.lock:
+            while len(self.threads) < self.workers:
+                self.threads.append(threading.Thread(target=self.work, daemon=True))
+                self.threads[-1].start()
+        self.queue.put((symbol, time.perf_counter(), place_order))
+        depth = self.depth
+        with self.lock:
+            self.max_depth = max(self.max_depth, depth)
+        return depth
+
+    def work(self) -> None:
+        """Places the queued orders and prints their responses"""
+        while True:
+            symbol, queued, place_order = self.queue.get()
+            start = time.perf_counter()
+            try:
+                response = place_order()
+            except Exception as ex:
+                response = C.Style(I.CROSS + " Error placing order ::", C.BOLD, C.RED) + f" {ex}"
+            end = time.perf_counter()
+            with self.lock:
+                self.latencies.append(end - queued)
+            latency = f"(queued {(start - queued) * 1000:.0f}ms, placed in {(end - start) * 1000:.0f}ms)"
+            print("\r ", I.TRADE, C.Style(f"{symbol} ::", C.CYAN), response, C.Style(latency, C.DARKCYAN))
+            self.queue.task_done()
+
+    def join(self) -> "str | None":
+        """Waits till the queued orders are placed, returns a summary of their latency and resets it"""
+        self.queue.join()
+        with self.lock:
+            latencies, self.latencies = self.latencies, []
+            max_depth, self.max_depth = self.max_depth, 0
+        if not latencies:
+            return None
+        return "{} orders, latency avg {:.0f}ms / max {:.0f}ms, max queue depth {}".format(
+            len(latencies),
+            sum(latencies) / len(latencies) * 1000,
+            max(latencies) * 1000,
+            max_depth,
+        )
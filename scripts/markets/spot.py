@@ -1,11 +1,18 @@
+import time
 from datetime import datetime
+from functools import partial
 from tabulate import tabulate
 from scripts.candles.heikin_ashi import data_to_heikin_ashi
 from scripts.common import round_float_to_str, sleep_till_next_candle
 from scripts.console import *
 from scripts.exchange import ExchangeInterface
-from scripts.indicator import Direction, Indicator, Signal
+from scripts.exchanges.binance_stream import KlineStream
+from scripts.indicator import Direction, Indicator, Signal, signals_lookback
+from scripts.indicators.panel import CandlePanel
+from scripts.indicators.planner import IndicatorPlan
 from scripts.indicators.trend.divergence import DivergenceSignal
+from scripts.markets.order_executor import OrderExecutor
+from scripts.markets.universe import UniverseFilter
 
 
 class SpotStrategy:
@@ -29,7 +36,26 @@ class SpotStrategy:
 
     `min_signals_percentage`: percentage of signals to place an order
 
-    `chart_type`: "candle" (default) | "heikin_ashi" """
+    `chart_type`: "candle" (default) | "heikin_ashi"
+
+    `concurrency`: number of symbols to download simultaneously
+
+    `stream`: whether to analyze each symbol as soon as its candle closes in the kline stream
+
+    `stream_url`: overrides the exchange's websocket url of the kline stream
+
+    `order_workers`: number of orders placed simultaneously while the scan continues
+
+    `universe`: optional filter of the symbols to analyze, by 24h volume, spread or volatility
+
+    `streaming_indicators`: whether to update the indicators with each closed candle instead of the whole frame
+
+    `panel_indicators`: whether to compute each indicator for all the symbols at once, in symbols x candles arrays
+
+    `plan_indicators`: whether to evaluate the indicators together, computing their shared primitives once
+
+    `tail_tolerance`: if set, only the last candles needed for the indicators to be within this tolerance of the
+    whole history are requested and analyzed (e.g. 1e-4)"""
 
     def __init__(
         self,
@@ -42,23 +68,68 @@ class SpotStrategy:
         timeframe: str,
         min_signals_percentage: float = 1,
         chart_type: str = "candle",
+        concurrency: int = 8,
+        stream: bool = False,
+        stream_url: "str | None" = None,
+        order_workers: int = 4,
+        universe: "UniverseFilter | None" = None,
+        streaming_indicators: bool = False,
+        panel_indicators: bool = False,
+        plan_indicators: bool = False,
+        tail_tolerance: "float | None" = None,
     ) -> None:
         self.chart_type = chart_type
+        self.concurrency = concurrency
         self.exchange = exchange
         self.min_signals_percentage = min_signals_percentage
         self.name = name
+        self.orders = OrderExecutor(workers=order_workers)
+        self.panel_indicators = panel_indicators
         self.order_value = order_value
         self.risk_reward_ind = risk_reward_ind
         self.risk_reward_ratio = risk_reward_ratio
         self.signals = signals
+        self.stream = stream
+        self.stream_url = stream_url
+        self.kline_stream = None
         self.timeframe = timeframe
+        self.universe = universe
+        # Checks of each signal are chosen once, they read their columns as arrays
+        for signal in signals:
+            if isinstance(signal, Signal):
+                signal.compile()
+        if streaming_indicators:
+            Indicator.enable_streaming()
+        if plan_indicators:
+            print(IndicatorPlan.from_signals(signals, risk_reward_ind).describe())
+        # Candles analyzed, None for the whole frame
+        self.lookback = signals_lookback(signals, tail_tolerance, risk_reward_ind) if tail_tolerance else None
+        if self.lookback and chart_type == "heikin_ashi":
+            # Heikin Ashi candles are built from the previous one
+            self.lookback += 1
+        # Plus the candle still open, the candle count is only reduced
+        if self.lookback and self.lookback + 1 < exchange.candle_count:
+            exchange.set_candle_count(self.lookback + 1)
+            print(I.CHECK, f"Analyzing the last {self.lookback} candles, within {tail_tolerance} of the whole history")
+        else:
+            self.lookback = None
 
     def check_signals(self) -> None:
         """Place an order if ≥ percentage of signals say so"""
         # Update console
         self.print_positions()
-        # Sleep till candle close
-        sleep_till_next_candle(exchange=self.exchange, timeframe=self.timeframe)
+        if self.stream:
+            if self.kline_stream is None:
+                self.kline_stream = KlineStream(
+                    self.exchange, self.timeframe, concurrency=self.concurrency, stream_url=self.stream_url
+                )
+                self.kline_stream.start(symbols=list(self.exchange.symbols.keys()))
+            # Wait till the stream receives a candle close
+            self.kline_stream.wait()
+        else:
+            # Sleep till candle close
+            sleep_till_next_candle(exchange=self.exchange, timeframe=self.timeframe)
+        scan_start = time.perf_counter()
         # Update console
         total_symbols = len(self.exchange.symbols.keys())
         mode = "TEST" if self.exchange.test_mode else "LIVE"
@@ -81,22 +152,52 @@ class SpotStrategy:
         current_time = self.exchange.get_server_time()
         # Initialize variables
         signal_weight = 1 / len(self.signals)
-        # Check signals
+        # Only analyze selected symbols that don't have an open position
+        universe = self.universe.symbols(self.exchange) if self.universe else self.exchange.symbols.keys()
+        symbols = [
+            symbol for symbol in universe if not self.exchange.balance.get(self.exchange.symbols[symbol]["base"])
+        ]
+        selected = set(symbols)
+        if self.stream:
+            # Candlesticks are updated by the stream as each candle closes, stale ones only if selected
+            closed_symbols = self.kline_stream.closed_symbols(selected=selected.__contains__)
+            errors = {}
+            fetch_info = "streamed"
+        else:
+            # Update price data from Exchange
+            errors = self.exchange.get_data_for_symbols(
+                symbols=symbols, timeframe=self.timeframe, concurrency=self.concurrency
+            )
+            closed_symbols = symbols
+            fetch_info = f"download {time.perf_counter() - scan_start:.2f}s @ {self.concurrency} workers"
+        # Get closed candles
         analyzed_index = 0
-        for symbol, symbol_data in self.exchange.symbols.items():
-            # Update waiting
-            analyzed_index += 1
-            # Only analyze if doesn't have an open position
-            if self.exchange.balance.get(symbol_data["base"]):
+        frames = {}
+        for symbol in closed_symbols:
+            # Only analyze if selected and doesn't have an open position
+            if symbol not in selected or self.exchange.balance.get(self.exchange.symbols[symbol]["base"]):
+                continue
+            # Price data couldn't be retrieved
+            if errors.get(symbol):
+                analyzed_index += 1
+                print("\r ", C.Style(I.CROSS + f" Error @ {symbol} ::", C.BOLD, C.RED), errors[symbol])
                 continue
-            # Update price data from Exchange
-            self.exchange.get_data_from_exchange(symbol=symbol, timeframe=self.timeframe)
-            # Get closed candles
             candles = self.exchange.candlesticks[f"{symbol}-{self.timeframe}"]
             candles.drop(candles[(candles["close_time"] > current_time)].index, inplace=True)
+            if self.lookback and len(candles) > self.lookback:
+                candles = candles.iloc[-self.lookback :]
             # Chart type
             if self.chart_type == "heikin_ashi":
                 data_to_heikin_ashi(candles)
+            frames[symbol] = candles
+        # Indicators of the symbols with the same number of candles are computed at once
+        panel = CandlePanel.from_frames(frames) if self.panel_indicators else None
+        # Check signals
+        for symbol, candles in frames.items():
+            # Update waiting
+            analyzed_index += 1
+            if panel and symbol in panel:
+                candles = panel.view(symbol)
             # Perform analysis
             avg_signal = 0
             analysis = None
@@ -110,11 +211,17 @@ class SpotStrategy:
             # Define if needs to place an order
             if abs(avg_signal) >= self.min_signals_percentage:
                 analysis = C.Style("Buy", C.GREEN) if avg_signal > 0 else C.Style("Sell", C.RED)
-                analysis += "\n    " + self.place_order(
+                # The order is placed in the background, its response is printed once received
+                depth = self.orders.submit(
                     symbol=symbol,
-                    mark_price=candles.iloc[-1]["close"].item(),
-                    direction=Direction.BULLISH if avg_signal > 0 else Direction.BEARISH,
+                    place_order=partial(
+                        self.place_order,
+                        symbol=symbol,
+                        mark_price=candles.iloc[-1]["close"].item(),
+                        direction=Direction.BULLISH if avg_signal > 0 else Direction.BEARISH,
+                    ),
                 )
+                analysis += C.Style(f" - order queued ({depth} waiting)", C.DARKCYAN)
             else:
                 # Reset descriptions
                 descriptions = []
@@ -134,11 +241,27 @@ class SpotStrategy:
                     "\r ",
                     I.CLOCK,
                     C.Style(f"{symbol:<20}", C.CYAN),
-                    "{:<50}".format(progress_bar(analyzed_index, total_symbols)),
+                    "{:<50}".format(progress_bar(analyzed_index, len(symbols))),
                     end="",
                 )
+        # Scan duration
+        scan_time = time.perf_counter() - scan_start
+        hits, misses = Indicator.cache.stats()
+        panel_info = f", {len(panel.headers)} for {len(panel)} assets at once" if panel else ""
+        print(
+            "\r ",
+            I.CHECK,
+            C.Style(
+                f"Scanned {analyzed_index} assets in {scan_time:.2f}s ({fetch_info})"
+                f" | Indicators: {misses} computed, {hits} reused{panel_info}{'':<20}",
+                C.DARKCYAN,
+            ),
+        )
+        # Wait for the orders, so the account data includes them
+        orders_info = self.orders.join()
+        if orders_info:
+            print("\r ", I.CHECK, C.Style(f"Placed {orders_info}", C.DARKCYAN))
         # Update account data from Exchange
-        print()
         self.exchange.update_account_data()
 
     def place_order(self, symbol: str, mark_price: float, direction: int) -> str:
@@ -0,0 +1,280 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from pandas import DataFrame
+from tabulate import tabulate
+
+from scripts.console import C, I, progress_bar
+from scripts.exchanges.backtest import BacktestExchange
+from scripts.indicator import Indicator
+from scripts.markets.backtest import Backtest
+from scripts.strategy import StrategyInterface
+
+# Attributes only read when placing the orders, points differing only in them share the candles where orders are
+# placed, i.e. their signals are evaluated once
+ORDER_PARAMETERS = ("leverage", "order_value", "risk_reward_ind", "risk_reward_ratio", "trailing_stop")
+
+# Summary columns where lower is better
+ASCENDING = ("max_drawdown", "fees")
+
+
+def apply_parameters(strategy: StrategyInterface, parameters: dict) -> None:
+    """Sets the parameters on the strategy instance
+
+    Parameters
+    ----------
+    `parameters`: {name: value}, names are attributes of the strategy (e.g. "leverage"), or "attribute.kwarg" to
+    set a kwarg of an Indicator attribute (e.g. "rsi_ind.periods"), which is replaced by a new Indicator"""
+    for name, value in parameters.items():
+        attribute, _, kwarg = name.partition(".")
+        if kwarg:
+            indicator = getattr(strategy, attribute)
+            kwargs = {**(indicator.function_kwargs or {}), kwarg: value}
+            setattr(strategy, attribute, Indicator(indicator.indicator_type, kwargs))
+        else:
+            setattr(strategy, attribute, value)
+
+
+def signal_key(parameters: dict) -> tuple:
+    """Parameters changing the signals of the strategy"""
+    return tuple((name, value) for name, value in parameters.items() if name.partition(".")[0] not in ORDER_PARAMETERS)
+
+
+class SweepWorker:
+    """Exchange of a worker process, its candles are mapped read-only so all the workers share them
+
+    Parameters
+    ----------
+    `settings`: ParameterSweep's strategy class, market, dates and BacktestExchange kwargs"""
+
+    def __init__(self, settings: dict) -> None:
+        self.strategy_class = settings["strategy_class"]
+        self.market = settings["market"]
+        self.start = settings["start"]
+        self.end = settings["end"]
+        self.exchange = BacktestExchange(**settings["exchange"])
+
+    def backtest(self, parameters: dict) -> Backtest:
+        strategy = self.strategy_class(self.exchange, self.market, name=self.strategy_class.__name__)
+        apply_parameters(strategy, parameters)
+        return Backtest(strategy.market_strategy(), start=self.start, end=self.end)
+
+    def run(self, points: "list[dict]") -> "list[dict]":
+        """Backtests the points, returns their parameters with the summary of each backtest"""
+        # Candles where the orders are placed, once per signal parameters
+        backtests = {}
+        for parameters in points:
+            if signal_key(parameters) not in backtests:
+                backtests[signal_key(parameters)] = self.backtest(parameters)
+        entries = {key: {} for key in backtests}
+        for symbol in self.exchange.symbols:
+            # Same keyed frame for all the signals, indicators they have in common are computed once
+            candles = self.exchange.history(symbol)
+            candles.attrs["key"] = f"{symbol}-{self.exchange.timeframe}"
+            for key, backtest in backtests.items():
+                entries[key][symbol] = backtest.entries(symbol, candles)
+            Indicator.cache.discard(candles.attrs["key"])
+        results = []
+        for parameters in points:
+            start = time.perf_counter()
+            # Backtest of each point sets the exchange's candle count for its risk reward indicator
+            result = self.backtest(parameters).run(verbose=False, entries=entries[signal_key(parameters)])
+            results.append({**parameters, **result.summary(), "seconds": time.perf_counter() - start})
+        return results
+
+
+# Worker of the current process, set by the pool's initializer
+worker: "SweepWorker | None" = None
+
+
+def init_worker(settings: dict) -> None:
+    global worker
+    worker = SweepWorker(settings)
+
+
+def run_points(points: "list[dict]") -> "list[dict]":
+    return worker.run(points)
+
+
+class ParameterSweep:
+    """Backtests a strategy with each combination of parameters, in a pool of processes
+
+    Points are split in chunks of consecutive points with the same signal parameters, so each worker evaluates the
+    signals once for all the points only differing in order parameters (leverage, order value, risk reward...),
+    and signals of different points share the indicators they have in common. Workers are forked and map the
+    stored candles read-only, so they share them through the page cache and scale with the number of cores
+
+    Parameters
+    ----------
+    `strategy_class`: StrategyInterface subclass implementing `market_strategy`
+
+    `space`: {parameter: list of values}, parameters are attributes of the strategy (e.g. "leverage") or
+    "attribute.kwarg" for the kwargs of its Indicator attributes (e.g. "rsi_ind.periods")
+
+    `candle_store`: folder of the stored candles of the market
+
+    `quote_asset`: quote asset of the symbols to replay
+
+    `market`: "futures" | "spot"
+
+    `balance`: initial wallet balance of each backtest
+
+    `fee`: fee charged on each fill, percentage of its value
+
+    `symbols`: symbols to replay, by default all the ones stored for the strategy's timeframe
+
+    `start`: time (ms) of the first candle close to trade
+
+    `end`: time (ms) of the last candle close to trade
+
+    `samples`: number of random points of the grid to backtest, None for the whole grid
+
+    `seed`: seed of the random points
+
+    `workers`: number of processes, by default the number of cores
+
+    `rank_by`: summary column the results are ranked by (e.g. "return", "profit_factor", "max_drawdown")"""
+
+    def __init__(
+        self,
+        strategy_class: type,
+        space: "dict[str, list]",
+        candle_store: str,
+        quote_asset: str,
+        market: str = "futures",
+        balance: float = 1000,
+        fee: float = 0.04,
+        symbols: "list[str] | None" = None,
+        start: "int | None" = None,
+        end: "int | None" = None,
+        samples: "int | None" = None,
+        seed: int = 0,
+        workers: "int | None" = None,
+        rank_by: str = "return",
+    ) -> None:
+        for name, values in space.items():
+            attribute, _, kwarg = name.partition(".")
+            if not hasattr(strategy_class, attribute):
+                raise ValueError(f"{strategy_class.__name__} has no attribute {attribute}")
+            if kwarg and not isinstance(getattr(strategy_class, attribute), Indicator):
+                raise ValueError(f"{strategy_class.__name__}.{attribute} isn't an Indicator")
+            if not values:
+                raise ValueError(f"No values for {name}")
+        self.strategy_class = strategy_class
+        self.space = {name: list(values) for name, values in space.items()}
+        self.samples = samples
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        self.rank_by = rank_by
+        self.settings = {
+            "strategy_class": strategy_class,
+            "market": market,
+            "start": start,
+            "end": end,
+            "exchange": {
+                "candle_store": candle_store,
+                "quote_asset": quote_asset,
+                "timeframe": strategy_class.timeframe,
+                "balance": balance,
+                "fee": fee,
+                "market": market,
+                "symbols": symbols,
+            },
+        }
+        self.results: "DataFrame | None" = None
+
+    def points(self) -> "list[dict]":
+        """Combinations of the space to backtest, grouped by their signal parameters"""
+        names = list(self.space)
+        shape = tuple(len(values) for values in self.space.values())
+        count = int(np.prod(shape))
+        if self.samples is None or self.samples >= count:
+            flat = np.arange(count)
+        else:
+            flat = np.sort(np.random.default_rng(self.seed).choice(count, self.samples, replace=False))
+        indexes = np.unravel_index(flat, shape)
+        points = [
+            {name: self.space[name][int(indexes[n][i])] for n, name in enumerate(names)} for i in range(len(flat))
+        ]
+        groups = {}
+        for parameters in points:
+            groups.setdefault(signal_key(parameters), []).append(parameters)
+        return [parameters for group in groups.values() for parameters in group]
+
+    def chunks(self, points: "list[dict]") -> "list[list[dict]]":
+        """Consecutive points for each task, a few tasks per worker so they finish at about the same time"""
+        count = min(len(points), self.workers * 4)
+        return [[points[i] for i in chunk] for chunk in np.array_split(np.arange(len(points)), count) if len(chunk)]
+
+    def run(self, verbose: bool = True) -> DataFrame:
+        """Backtests all the points and returns their parameters and summaries, ranked"""
+        run_start = time.perf_counter()
+        points = self.points()
+        chunks = self.chunks(points)
+        results = []
+
+        def update(done: int) -> None:
+            if verbose:
+                print(
+                    "\r ",
+                    I.CLOCK,
+                    C.Style(f"{len(results)}/{len(points)} points", C.CYAN),
+                    "{:<50}".format(progress_bar(done, len(chunks))),
+                    end="",
+                )
+
+        if self.workers == 1:
+            init_worker(self.settings)
+            for n, chunk in enumerate(chunks):
+                results += run_points(chunk)
+                update(n + 1)
+        else:
+            # Forked workers inherit the imported modules, each one maps the candles once
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=init_worker,
+                initargs=(self.settings,),
+            ) as pool:
+                tasks = [pool.submit(run_points, chunk) for chunk in chunks]
+                for n, task in enumerate(as_completed(tasks)):
+                    results += task.result()
+                    update(n + 1)
+        self.results = self.rank(DataFrame(results))
+        if verbose:
+            print(
+                "\r ",
+                I.CHECK,
+                C.Style(
+                    f"Backtested {len(points)} points in {time.perf_counter() - run_start:.2f}s"
+                    f" with {self.workers} workers{'':<30}",
+                    C.DARKCYAN,
+                ),
+            )
+        return self.results
+
+    def rank(self, results: DataFrame) -> DataFrame:
+        """Sorts the results by `rank_by`, best first"""
+        results = results.sort_values(self.rank_by, ascending=self.rank_by in ASCENDING, kind="stable")
+        results.index = np.arange(1, len(results) + 1)
+        results.index.name = "rank"
+        return results
+
+    def print_results(self, top: int = 10) -> None:
+        """Prints the best points as a table"""
+        results = self.results.head(top)
+        print(
+            tabulate(
+                results.round(2),
+                headers=[C.Style(name, C.DARKCYAN) for name in [results.index.name, *results.columns]],
+                numalign="left",
+                stralign="left",
+            )
+        )
+
+    def save(self, path: str) -> None:
+        """Writes the ranked results to `path` (csv)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.results.to_csv(path)
@@ -0,0 +1,59 @@
+import time
+from scripts.console import C, I
+from scripts.exchange import ExchangeInterface
+
+
+class UniverseFilter:
+    """Selects the symbols worth analyzing from the 24h tickers of all the symbols, requested in a single call
+
+    Parameters
+    ----------
+    `min_quote_volume`: min volume traded in the last 24h, in quote asset
+
+    `top`: max number of symbols, the ones with the highest quote volume are kept
+
+    `max_spread`: max spread between best bid and ask, percentage of price
+
+    `min_volatility`: min range between high and low in the last 24h, percentage of price
+
+    `refresh`: seconds to keep the selection before requesting the tickers again"""
+
+    def __init__(
+        self,
+        min_quote_volume: float = 0,
+        top: "int | None" = None,
+        max_spread: "float | None" = None,
+        min_volatility: float = 0,
+        refresh: int = 60 * 60,
+    ) -> None:
+        self.min_quote_volume = min_quote_volume
+        self.top = top
+        self.max_spread = max_spread
+        self.min_volatility = min_volatility
+        self.refresh = refresh
+        self.selected: list[str] = []
+        self.updated = 0.0
+
+    def symbols(self, exchange: ExchangeInterface) -> "list[str]":
+        """Selected symbols, tickers are only requested once `refresh` seconds have passed"""
+        if not self.updated or time.monotonic() - self.updated >= self.refresh:
+            try:
+                self.selected = self.select(exchange.query_24h_tickers(spread=self.max_spread is not None))
+                self.updated = time.monotonic()
+                print(f"\r{I.CHECK} Selected {len(self.selected)} of {len(exchange.symbols)} assets{'':<20}")
+            except Exception as ex:
+                print(C.Style(I.CROSS + " Error @ universe_filter ::", C.BOLD, C.RED), ex)
+        # Analyze every symbol until the tickers can be retrieved
+        return self.selected if self.updated else list(exchange.symbols.keys())
+
+    def select(self, tickers: "dict[str, dict[str, float]]") -> "list[str]":
+        """Symbols that pass the filters, sorted by quote volume"""
+        selected = [
+            symbol
+            for symbol, ticker in tickers.items()
+            if ticker["quote_volume"] >= self.min_quote_volume
+            and ticker["volatility"] >= self.min_volatility
+            and (self.max_spread is None or ticker.get("spread", 0) <= self.max_spread)
+        ]
+        selected.sort(key=lambda symbol: tickers[symbol]["quote_volume"], reverse=True)
+        return selected[: self.top]
@@ -9,7 +9,8 @@ class StrategyInterface(metaclass=ABCMeta):
     exchange: Interface of the exchange
     market: "futures" or "spot"
     name: Name to identify on command line
-    strategy: Function itself"""
+    strategy: Function itself
+    market_strategy: FuturesStrategy or SpotStrategy checking the signals, also replayed by backtests"""
 
     exchange: ExchangeInterface
     market: str
@@ -20,5 +21,8 @@ class StrategyInterface(metaclass=ABCMeta):
         self.market = market
         self.name = name
     
+    @abstractmethod
+    def market_strategy(self): pass
+
     @abstractmethod
     def strategy(self): pass
\ No newline at end of file
@@ -0,0 +1,66 @@
+import numpy as np
+from pandas import DataFrame
+from scripts.candles.store import CandleStore
+from scripts.exchanges.backtest import BacktestExchange
+from scripts.indicator import Indicator, Signal
+from scripts.markets.backtest import Backtest
+from scripts.markets.futures import FuturesStrategy
+from scripts.markets.universe import UniverseFilter
+
+
+def klines(count: int, seed: int, volume: float, start: int = 1_700_000_000_000) -> DataFrame:
+    """Random walk 15m candles, `volume` traded in each one"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, count)))
+    open = np.concatenate([close[:1], close[:-1]])
+    times = start + np.arange(count) * 900_000
+    volumes = np.full(count, volume)
+    return DataFrame(
+        {
+            "time": times,
+            "open": open,
+            "high": np.maximum(open, close) * (1 + rng.uniform(0, 0.004, count)),
+            "low": np.minimum(open, close) * (1 - rng.uniform(0, 0.004, count)),
+            "close": close,
+            "volume": volumes,
+            "close_time": times + 899_999,
+            "quote_asset_volume": volumes * close,
+            "number_of_trades": np.ones(count, dtype=np.int64),
+            "taker_buy_base_asset_volume": volumes / 2,
+            "taker_buy_quote_asset_volume": volumes * close / 2,
+        }
+    )
+
+
+def backtest(path: str, universe: "UniverseFilter | None") -> Backtest:
+    strategy = FuturesStrategy(
+        name="universe",
+        exchange=BacktestExchange(path, quote_asset="USDT", timeframe="15m"),
+        order_value=5,
+        risk_reward_ind=Indicator(Indicator.TYPE_ATR, {"periods": 14}),
+        risk_reward_ratio=2,
+        signals=[
+            Signal(signal_ind=Indicator(Indicator.TYPE_RSI), signal_header="rsi(14)", buy_limit=40, sell_limit=60)
+        ],
+        timeframe="15m",
+        leverage=10,
+        universe=universe,
+    )
+    return Backtest(strategy)
+
+
+def test_universe_selects_traded_symbols(tmp_path):
+    store = CandleStore(str(tmp_path))
+    # Volume of SYM1 drops below SYM0's halfway through the replay
+    store.append("SYM0USDT-15m", klines(1_000, seed=0, volume=100))
+    store.append("SYM1USDT-15m", klines(1_000, seed=1, volume=1_000).iloc[:500])
+    store.append("SYM1USDT-15m", klines(1_000, seed=1, volume=10).iloc[500:])
+    drop = int(klines(1_000, seed=1, volume=10)["close_time"].iat[500])
+    trades = backtest(str(tmp_path), None).run(verbose=False).trades
+    assert set(trades["symbol"]) == {"SYM0USDT", "SYM1USDT"}
+    trades = backtest(str(tmp_path), UniverseFilter(top=1, refresh=15 * 60)).run(verbose=False).trades
+    assert len(trades)
+    # Selected by their volume in the 24h before each candle close
+    assert (trades[trades["symbol"] == "SYM1USDT"]["entry_time"] < drop + 24 * 60 * 60 * 1000).all()
+    assert (trades[trades["symbol"] == "SYM0USDT"]["entry_time"] > drop).all()
+    assert set(trades["symbol"]) == {"SYM0USDT", "SYM1USDT"}
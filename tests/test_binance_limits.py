@@ -0,0 +1,45 @@
+import time
+from email.utils import formatdate
+from scripts.exchanges.binance_limits import RequestLimiter
+
+LIMITS = [{"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 2400}]
+
+
+class FakeResponse:
+    def __init__(self, headers: dict, status_code: int = 200) -> None:
+        self.headers = headers
+        self.status_code = status_code
+
+
+def test_full_window_waits_till_it_ends():
+    limiter = RequestLimiter(LIMITS)
+    now = time.time()
+    # Whole weight used early in the minute
+    limiter.sync(FakeResponse({"Date": formatdate(now, usegmt=True), "X-MBX-USED-WEIGHT-1M": "2400"}))
+    counter = limiter.counters["REQUEST_WEIGHT"]["1M"]
+    server_now = limiter.now()
+    window_end = server_now - server_now % 60 + 60
+    # Nothing is available till the window ends, then the whole limit
+    assert counter.wait_time(1, server_now + 30) == window_end - server_now - 30
+    counter.roll(window_end)
+    assert counter.used == 0
+    assert counter.wait_time(2400, window_end) == 0
+
+
+def test_usage_of_ended_window_is_ignored():
+    limiter = RequestLimiter(LIMITS)
+    now = time.time()
+    counter = limiter.counters["REQUEST_WEIGHT"]["1M"]
+    counter.roll(now + 60)
+    limiter.sync(FakeResponse({"Date": formatdate(now, usegmt=True), "X-MBX-USED-WEIGHT-1M": "2400"}))
+    assert counter.used == 0
+
+
+def test_acquire_blocks_on_full_window():
+    limits = [{"rateLimitType": "REQUEST_WEIGHT", "interval": "SECOND", "intervalNum": 1, "limit": 10}]
+    limiter = RequestLimiter(limits)
+    limiter.acquire(weight=10)
+    start = limiter.now()
+    limiter.acquire(weight=1)
+    # Second request waited for the next window
+    assert limiter.now() - limiter.now() % 1 > start - start % 1
@@ -0,0 +1,42 @@
+import numpy as np
+from pandas import DataFrame
+from scripts.indicator import Indicator
+from scripts.indicators.panel import CandlePanel
+from scripts.indicators.trend.divergence import DivergenceSignal
+
+
+def candles(count: int, seed: int) -> DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    spread = close * rng.uniform(0, 0.01, (2, count))
+    return DataFrame(
+        {"time": np.arange(count), "open": close, "high": close + spread[0], "low": close - spread[1], "close": close}
+    )
+
+
+def frames(history: "dict[str, DataFrame]", end: int, size: int = 200) -> "dict[str, DataFrame]":
+    """Last `size` candles of each symbol up to `end`, keyed as the exchange does"""
+    result = {}
+    for symbol, data in history.items():
+        frame = data.iloc[end - size : end].reset_index(drop=True)
+        frame.attrs["key"] = f"{symbol}-15m"
+        result[symbol] = frame
+    return result
+
+
+def test_panel_views_reuse_trackers():
+    history = {symbol: candles(260, seed) for seed, symbol in enumerate(("BTCUSDT", "ETHUSDT", "XRPUSDT"))}
+    signal = DivergenceSignal(indicator=Indicator(Indicator.TYPE_RSI, {"periods": 14}), indicator_header="rsi(14)")
+    reference = DivergenceSignal(indicator=Indicator(Indicator.TYPE_RSI, {"periods": 14}), indicator_header="rsi(14)")
+    trackers = None
+    for end in range(200, 261):
+        scan = frames(history, end)
+        panel = CandlePanel(scan)
+        for symbol, frame in scan.items():
+            assert signal.emit_signal(panel.view(symbol)) == reference.emit_signal(frame)
+        # One tracker per symbol, updated with each candle instead of rebuilt
+        assert set(key for key, _ in signal.trackers) == {f"{symbol}-15m" for symbol in history}
+        current = [entry[1] for entry in signal.trackers.values()]
+        if trackers is not None:
+            assert all(a is b for a, b in zip(trackers, current))
+        trackers = current
@@ -0,0 +1,44 @@
+from scripts.console import I
+from scripts.exchanges.binance_futures import BinanceFutures
+from scripts.exchanges.symbol_filters import SymbolFilters
+
+BTCUSDT = {
+    "symbol": "BTCUSDT",
+    "filters": [
+        {"filterType": "PRICE_FILTER", "tickSize": "0.10"},
+        {"filterType": "LOT_SIZE", "minQty": "0.001", "maxQty": "1000", "stepSize": "0.001"},
+    ],
+}
+
+
+class FakeOrderClient:
+    """Order endpoints, the batch request fails without a response"""
+
+    def __init__(self) -> None:
+        self.orders = []
+
+    def cancel_open_orders(self, symbol: str) -> None:
+        pass
+
+    def change_leverage(self, symbol: str, leverage: int) -> None:
+        pass
+
+    def new_order(self, **kwargs) -> dict:
+        self.orders.append(kwargs)
+        return {"orderId": len(self.orders), "origQty": kwargs.get("quantity"), "stopPrice": kwargs.get("stopPrice")}
+
+    def new_batch_order(self, batchOrders: "list[dict]") -> list:
+        raise ConnectionError("Read timed out")
+
+
+def test_protective_orders_placed_when_batch_fails():
+    exchange = BinanceFutures.__new__(BinanceFutures)
+    exchange.client = FakeOrderClient()
+    exchange.leverages = {}
+    exchange.filters = SymbolFilters([BTCUSDT])
+    response = exchange.create_order(
+        symbol="BTCUSDT", direction=1, qty=0.01, price=30000, trailing=False, sl=29000, tp=32000, leverage=10
+    )
+    assert I.CROSS not in response
+    assert [order["type"] for order in exchange.client.orders] == ["MARKET", "STOP_MARKET", "TAKE_PROFIT_MARKET"]
+    assert "Price 29000.0" in response and "Price 32000.0" in response
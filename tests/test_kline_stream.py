@@ -0,0 +1,112 @@
+from scripts.exchanges.binance_stream import KlineStream
+
+
+def kline(symbol: str, time: int, closed: bool = True) -> dict:
+    """Message of the combined kline streams"""
+    return {
+        "stream": f"{symbol.lower()}@kline_1m",
+        "data": {
+            "e": "kline",
+            "s": symbol,
+            "k": {
+                "t": time,
+                "T": time + 59_999,
+                "o": "1.0",
+                "h": "1.2",
+                "l": "0.9",
+                "c": "1.1",
+                "v": "10",
+                "q": "11",
+                "n": 5,
+                "V": "5",
+                "Q": "5.5",
+                "x": closed,
+            },
+        },
+    }
+
+
+class FakeExchange:
+    """Exchange recording the candles merged and the ones requested"""
+
+    streams_per_connection = 2
+
+    def __init__(self, merges: bool) -> None:
+        self.merges = merges
+        self.merged: list[str] = []
+        self.requests: list[list[str]] = []
+
+    def add_closed_candle(self, symbol: str, timeframe: str, candle: dict) -> bool:
+        if self.merges:
+            self.merged.append(symbol)
+        return self.merges
+
+    def get_data_for_symbols(self, symbols: "list[str]", timeframe: str, concurrency: int = 1) -> dict:
+        self.requests.append(list(symbols))
+        return {}
+
+
+class ReplayClient:
+    """Websocket client replaying recorded messages to the subscriptions"""
+
+    def __init__(self) -> None:
+        self.subscriptions: list[tuple[list[str], object]] = []
+
+    def live_subscribe(self, stream: "list[str]", id: int, callback) -> None:
+        self.subscriptions.append((stream, callback))
+
+    def replay(self, messages: "list[dict]") -> None:
+        for message in messages:
+            for streams, callback in self.subscriptions:
+                if message["stream"] in streams:
+                    callback(message)
+
+    def close(self) -> None:
+        self.subscriptions = []
+
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT"]
+RECORDED = [kline("BTCUSDT", 0, closed=False), *(kline(symbol, 0) for symbol in SYMBOLS)]
+
+
+def test_streamed_candles_are_merged():
+    exchange = FakeExchange(merges=True)
+    client = ReplayClient()
+    stream = KlineStream(exchange, "1m", client=client, batch_delay=0.01)
+    stream.start(SYMBOLS)
+    # Subscriptions split by the streams per connection
+    assert [len(streams) for streams, _ in client.subscriptions] == [2, 1]
+    client.replay(RECORDED)
+    assert list(stream.closed_symbols(timeout=0.01)) == SYMBOLS
+    assert exchange.merged == SYMBOLS
+    # Only the history was requested
+    assert exchange.requests == [SYMBOLS]
+
+
+def test_stale_symbols_are_requested_together():
+    exchange = FakeExchange(merges=False)
+    client = ReplayClient()
+    stream = KlineStream(exchange, "1m", client=client, batch_delay=0.01)
+    stream.start(SYMBOLS)
+    client.replay(RECORDED)
+    assert list(stream.closed_symbols(timeout=0.01)) == SYMBOLS
+    assert exchange.requests == [SYMBOLS, SYMBOLS]
+    stream.stop()
+
+
+def test_unselected_stale_symbols_are_not_requested():
+    exchange = FakeExchange(merges=False)
+    client = ReplayClient()
+    stream = KlineStream(exchange, "1m", client=client, batch_delay=0.01)
+    stream.start(SYMBOLS)
+    client.replay(RECORDED)
+    stream.wait()
+    selected = {"ETHUSDT"}
+    assert list(stream.closed_symbols(selected=selected.__contains__, timeout=0.01)) == ["ETHUSDT"]
+    assert exchange.requests == [SYMBOLS, ["ETHUSDT"]]
+    # The others are requested once a scan selects them
+    assert stream.stale == {"BTCUSDT", "BNBUSDT"}
+    client.replay([kline("BTCUSDT", 60_000)])
+    assert list(stream.closed_symbols(timeout=0.01)) == ["BTCUSDT"]
+    assert exchange.requests == [SYMBOLS, ["ETHUSDT"], ["BTCUSDT"]]
+    stream.stop()
@@ -0,0 +1,47 @@
+import time
+import numpy as np
+from pandas import DataFrame
+from scripts.candles.klines import KLINE_COLUMNS
+from scripts.candles.resample import CandleResampler
+from scripts.common import timeframe_to_ms
+
+
+class FakeExchange:
+    """Klines of a constant price, counting the requests"""
+
+    def __init__(self) -> None:
+        self.requests = 0
+
+    def get_candlestick_data(self, _symbol, _timeframe, _qty, _start_time=None) -> DataFrame:
+        self.requests += 1
+        interval = timeframe_to_ms(_timeframe)
+        now = int(time.time() * 1000)
+        end = now - now % interval
+        start = end - (_qty - 1) * interval if _start_time is None else _start_time
+        times = np.arange(start, end + 1, interval)[:_qty]
+        data = {name: np.ones(len(times), dtype=dtype) for name, dtype in KLINE_COLUMNS.items()}
+        data["time"] = times
+        data["close_time"] = times + interval - 1
+        return DataFrame(data)
+
+
+def test_timeframes_over_the_page_budget_are_not_resampled():
+    resampler = CandleResampler(FakeExchange(), base_timeframe="5m", candle_count=1000)
+    assert resampler.resamples("1h")
+    # 288k base candles per symbol
+    assert not resampler.resamples("1d")
+    resampler.set_candle_count(30)
+    assert resampler.resamples("1d")
+
+
+def test_base_window_follows_candle_count():
+    exchange = FakeExchange()
+    resampler = CandleResampler(exchange, base_timeframe="5m", candle_count=100)
+    assert len(resampler.candles("BTCUSDT", "1h")) == 100
+    assert len(resampler.base_cache.candles["BTCUSDT-5m"]) == 1200
+    assert exchange.requests == 2
+    # Indicators need fewer candles
+    resampler.set_candle_count(50)
+    assert resampler.base_cache.candle_count == 600
+    assert len(resampler.candles("BTCUSDT", "1h")) == 50
+    assert len(resampler.base_cache.candles["BTCUSDT-5m"]) == 600
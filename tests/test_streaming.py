@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from pandas import DataFrame
+from scripts.indicator import Indicator
+from scripts.indicators.streaming import IndicatorStreams
+
+KWARGS = {
+    Indicator.TYPE_DEMA: {"periods": 20},
+    Indicator.TYPE_EMA: {"periods": 20},
+    Indicator.TYPE_SMA: {"periods": 20},
+}
+
+
+def candles(count: int, seed: int = 0) -> DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    spread = close * rng.uniform(0, 0.01, (2, count))
+    return DataFrame({"time": np.arange(count), "close": close, "high": close + spread[0], "low": close - spread[1]})
+
+
+def difference(expected: np.ndarray, values: np.ndarray) -> float:
+    """Max difference relative to the expected values, NaNs must match too"""
+    assert np.array_equal(np.isnan(expected), np.isnan(values))
+    both = ~np.isnan(expected)
+    if not both.any():
+        return 0.0
+    return float(np.max(np.abs(expected[both] - values[both]) / np.maximum(np.abs(expected[both]), 1)))
+
+
+def stream(history: DataFrame, indicator_type: str, frame_size: int) -> "list[tuple[int, DataFrame, list[str]]]":
+    """Frames of `frame_size` candles streamed one closed candle at a time"""
+    streams = IndicatorStreams(Indicator.stream_classes)
+    kwargs = KWARGS.get(indicator_type, {})
+    frames = []
+    for end in range(frame_size, len(history) + 1):
+        frame = history.iloc[end - frame_size : end].copy()
+        frame.attrs["key"] = "TEST"
+        headers = streams.analyze(frame, indicator_type, kwargs)
+        frames.append((end, frame, headers))
+    return frames
+
+
+@pytest.mark.parametrize("indicator_type", list(Indicator.stream_classes))
+@pytest.mark.parametrize("frame_size", [50, 300])
+def test_streamed_values_match_whole_history(indicator_type, frame_size):
+    history = candles(frame_size + 200)
+    f = Indicator.functions[indicator_type]
+    for end, frame, headers in stream(history, indicator_type, frame_size):
+        expected = history.iloc[:end].copy()
+        f(expected, **KWARGS.get(indicator_type, {}))
+        for header in headers:
+            diff = difference(expected[header].to_numpy()[-frame_size:], frame[header].to_numpy())
+            assert diff < 1e-9, f"{header} differs by {diff} at {end}"
+
+
+@pytest.mark.parametrize("indicator_type", list(Indicator.stream_classes))
+def test_streamed_values_within_tolerance_of_the_lookback(indicator_type):
+    tolerance = 1e-6
+    lookback = Indicator(indicator_type, KWARGS.get(indicator_type)).lookback(tolerance)
+    if lookback is None:
+        pytest.skip("Needs the whole frame")
+    history = candles(lookback + 100)
+    f = Indicator.functions[indicator_type]
+    # Signals read the last two rows
+    for end, frame, headers in stream(history, indicator_type, lookback + 1):
+        expected = frame[["time", "close", "high", "low"]].copy()
+        f(expected, **KWARGS.get(indicator_type, {}))
+        for header in headers:
+            diff = difference(expected[header].to_numpy()[-2:], frame[header].to_numpy()[-2:])
+            assert diff < 2 * tolerance, f"{header} differs by {diff} at {end}"
@@ -0,0 +1,175 @@
+import threading
+import pytest
+from scripts.exchanges.binance_futures import BinanceFutures
+from scripts.exchanges.binance_spot import BinanceSpot
+from scripts.exchanges.binance_user_stream import UserDataStream
+
+OPEN_BTC = {
+    "e": "ACCOUNT_UPDATE",
+    "T": 1,
+    "a": {
+        "B": [{"a": "USDT", "wb": "990", "cw": "990"}],
+        "P": [{"s": "BTCUSDT", "pa": "0.01", "ep": "30000", "up": "5"}],
+    },
+}
+CLOSE_BTC = {
+    "e": "ACCOUNT_UPDATE",
+    "T": 2,
+    "a": {"B": [{"a": "USDT", "wb": "1005", "cw": "1005"}], "P": [{"s": "BTCUSDT", "pa": "0", "ep": "0", "up": "0"}]},
+}
+SPOT_BALANCE = {"e": "outboundAccountPosition", "B": [{"a": "BTC", "f": "0.5", "l": "0"}]}
+
+
+class FakeRestClient:
+    """REST endpoints used by the user data stream, counting the account snapshots"""
+
+    def __init__(self) -> None:
+        self.snapshots = 0
+
+    def new_listen_key(self) -> dict:
+        return {"listenKey": f"key{self.snapshots}"}
+
+    def renew_listen_key(self, listenKey: str) -> None:
+        pass
+
+    def account(self) -> dict:
+        self.snapshots += 1
+        return {
+            "canTrade": True,
+            "assets": [
+                {
+                    "asset": "USDT",
+                    "crossWalletBalance": "1000",
+                    "crossUnPnl": "0",
+                    "availableBalance": "1000",
+                    "updateTime": 0,
+                }
+            ],
+            "positions": [],
+            "balances": [{"asset": "USDT", "free": "1000", "locked": "0"}],
+        }
+
+    def ticker_price(self) -> list:
+        return [{"symbol": "BTCUSDT", "price": "30100"}]
+
+    def get_open_orders(self) -> list:
+        return []
+
+
+class FakeFactory:
+    def buildProtocol(self, addr):
+        return object()
+
+
+class FakeWebsocketClient:
+    """Feeds recorded events to the subscriptions, as the connector's thread does"""
+
+    def __init__(self) -> None:
+        self.factories: dict[str, FakeFactory] = {}
+        self.callbacks = {}
+
+    def user_data(self, listen_key: str, id: int, callback) -> None:
+        self.callbacks[listen_key] = callback
+        self.factories[listen_key] = FakeFactory()
+
+    def stop_socket(self, listen_key: str) -> None:
+        self.callbacks.pop(listen_key, None)
+        self.factories.pop(listen_key, None)
+
+    def connect(self) -> None:
+        """Opens the sockets, again after a drop"""
+        for factory in self.factories.values():
+            factory.buildProtocol(None)
+
+    def feed(self, *events: dict) -> None:
+        for callback in self.callbacks.values():
+            for event in events:
+                callback(event)
+
+
+def futures_exchange() -> "tuple[BinanceFutures, FakeWebsocketClient]":
+    """Exchange with its REST and websocket clients replaced by fakes"""
+    exchange = BinanceFutures.__new__(BinanceFutures)
+    exchange.client = FakeRestClient()
+    exchange.quote_asset = "USDT"
+    exchange.account = {}
+    exchange.positions = {}
+    exchange.leverages = {}
+    exchange.account_lock = threading.Lock()
+    websocket = FakeWebsocketClient()
+    exchange.user_stream = UserDataStream(exchange=exchange, client=websocket)
+    return exchange, websocket
+
+
+def test_events_update_positions_without_snapshots():
+    exchange, websocket = futures_exchange()
+    exchange.update_account_data()
+    exchange.leverages["BTCUSDT"] = 10
+    websocket.connect()
+    websocket.feed(OPEN_BTC)
+    # Wallet balance + unrealized profit - initial margin, at the entry price
+    assert exchange.account["availableBalance"] == pytest.approx(990 + 5 - 0.01 * 30500 / 10)
+    exchange.update_account_data()
+    assert exchange.client.snapshots == 1
+    assert exchange.positions["BTCUSDT"]["positionAmount"] == 0.01
+    assert exchange.positions["BTCUSDT"]["markPrice"] == 30100
+    assert exchange.account["crossWalletBalance"] == 990
+    # At the mark price
+    assert exchange.account["availableBalance"] == pytest.approx(990 + 1 - 0.01 * 30100 / 10)
+    websocket.feed(CLOSE_BTC)
+    exchange.update_account_data()
+    assert exchange.client.snapshots == 1
+    assert exchange.positions == {}
+    assert exchange.account["availableBalance"] == 1005
+    exchange.user_stream.stop()
+
+
+def test_reconnect_takes_snapshot():
+    exchange, websocket = futures_exchange()
+    exchange.update_account_data()
+    websocket.connect()
+    assert exchange.user_stream.synced
+    # Dropped and reconnected by the connector, events in between are lost
+    websocket.connect()
+    assert not exchange.user_stream.synced
+    exchange.update_account_data()
+    assert exchange.client.snapshots == 2
+    assert exchange.user_stream.synced
+    exchange.user_stream.stop()
+
+
+def test_events_applied_while_updating_mark_prices():
+    exchange, websocket = futures_exchange()
+    exchange.update_account_data()
+    websocket.connect()
+    websocket.feed(OPEN_BTC)
+
+    def feed() -> None:
+        for _ in range(2000):
+            websocket.feed(CLOSE_BTC, OPEN_BTC)
+        websocket.feed(CLOSE_BTC)
+
+    thread = threading.Thread(target=feed)
+    thread.start()
+    while thread.is_alive():
+        exchange.update_mark_prices()
+    thread.join()
+    exchange.update_mark_prices()
+    assert exchange.positions == {}
+    exchange.user_stream.stop()
+
+
+def test_spot_event_before_snapshot():
+    exchange = BinanceSpot.__new__(BinanceSpot)
+    exchange.client = FakeRestClient()
+    exchange.quote_asset = "USDT"
+    exchange.account = {}
+    exchange.balance = {}
+    exchange.positions = {}
+    exchange.account_lock = threading.Lock()
+    websocket = FakeWebsocketClient()
+    exchange.user_stream = UserDataStream(exchange=exchange, client=websocket)
+    # Subscribed before the snapshot, so events may arrive first
+    websocket.user_data(listen_key="key", id=1, callback=exchange.user_stream.handle_message)
+    websocket.feed(SPOT_BALANCE)
+    assert exchange.balance["BTC"]["free"] == 0.5